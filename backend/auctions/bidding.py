@@ -0,0 +1,66 @@
+"""
+Приём ставок.
+
+current_bid меняется одним условным UPDATE (аукцион активен и ставка не ниже
+минимальной) в той же транзакции, что и запись Bid: из двух одновременных
+ставок проходит только та, что успела первой, а более низкая не может
+затереть более высокую.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import events
+from .models import Auction, Bid
+
+ACTIVE = 2
+
+BID_SQL = """
+UPDATE {table}
+SET current_bid = %(amount)s
+WHERE id = %(id)s AND status = {active}
+  AND start_time <= %(now)s AND end_time > %(now)s
+  AND GREATEST(starting_price, current_bid + bid_step) <= %(amount)s
+RETURNING current_bid
+"""
+
+
+class BidRejected(Exception):
+    """Ставка не принята; code — inactive или outbid."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def min_bid(auction):
+    return max(auction.starting_price, auction.current_bid + auction.bid_step)
+
+
+def place_bid(auction, user, amount):
+    """
+    Принимает ставку или бросает BidRejected. Возвращает созданный Bid;
+    auction.current_bid обновляется на месте.
+    """
+    table = connection.ops.quote_name(Auction._meta.db_table)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                BID_SQL.format(table=table, active=ACTIVE),
+                {"id": auction.pk, "amount": amount, "now": timezone.now()},
+            )
+            accepted = cursor.fetchone() is not None
+        if accepted:
+            auction.current_bid = amount
+            bid = Bid.objects.create(auction=auction, user=user, amount=amount)
+            events.publish(
+                events.BID_PLACED, auction.pk, bid=bid.pk, amount=amount,
+                user_email=user.email, created_at=bid.created_at,
+            )
+            return bid
+
+    # Перечитываем, чтобы объяснить причину отказа по актуальному состоянию
+    auction.refresh_from_db(fields=["status", "start_time", "end_time", "current_bid"])
+    if not auction.is_active():
+        raise BidRejected("Аукцион не активен", "inactive")
+    raise BidRejected(f"Ставку перебили: минимальная ставка теперь {min_bid(auction)}", "outbid")
@@ -0,0 +1,48 @@
+"""
+События аукционов для клиентов (см. stream.py): публикуются в канал Redis
+после фиксации транзакции, чтобы подписчики не увидели откатившуюся ставку.
+"""
+import json
+import logging
+
+import redis
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "auctions:events"
+
+BID_PLACED = "bid-placed"
+AUCTION_STARTED = "auction-started"
+AUCTION_EXTENDED = "auction-extended"
+AUCTION_CLOSED = "auction-closed"
+
+
+def _send(*messages):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(CHANNEL, message)
+        pipe.execute()
+    except redis.RedisError:
+        # Без Redis клиенты просто не получат push — ставки и задачи не падают
+        logger.warning("Не удалось опубликовать событие аукциона", exc_info=True)
+
+
+def _encode(event, auction_id, data):
+    return json.dumps({"event": event, "auction": auction_id, **data}, cls=DjangoJSONEncoder)
+
+
+def publish(event, auction_id, **data):
+    message = _encode(event, auction_id, data)
+    transaction.on_commit(lambda: _send(message))
+
+
+def publish_many(items):
+    """items — (событие, id аукциона, данные); уходят одним конвейером Redis."""
+    messages = [_encode(event, auction_id, data) for event, auction_id, data in items]
+    if messages:
+        transaction.on_commit(lambda: _send(*messages))
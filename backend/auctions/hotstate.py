@@ -0,0 +1,327 @@
+"""
+Горячее состояние активных аукционов в Redis (AUCTION_HOT_STATE).
+
+Текущая цена, лидер, число ставок и время окончания лежат в хеше
+auctions:hot:<id>. Ставку проверяет и принимает Lua-скрипт — атомарно и без
+обращения к Postgres, — а принятая ставка дописывается в поток auctions:bids.
+Поток переносится в auctions_bid пачками (persist_hot_bids) с id записи
+потока в Bid.stream_id, поэтому повторная доставка не создаёт дублей.
+Перед закрытием аукционов поток дочитывается (drain), после — reconcile
+сверяет Redis с базой.
+
+Суммы в Redis — в копейках (целые), время — в миллисекундах эпохи по часам Redis.
+"""
+import logging
+import os
+import socket
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+import redis
+from django.db import connection, transaction
+from django.db.models import Count
+
+from backend import metrics
+from backend.cache import bump
+from backend.redis_client import get_redis
+from . import events
+from .models import Auction, Bid
+
+logger = logging.getLogger(__name__)
+
+STATE_KEY = "auctions:hot:{}"
+STREAM = "auctions:bids"
+GROUP = "bid-persisters"
+BATCH_SIZE = 1000
+CLAIM_IDLE_MS = 60_000  # записи упавшего обработчика забираем через минуту
+CLOSED_TTL = 24 * 3600  # после закрытия хеш хранится для сверки
+
+ACTIVE = 2
+
+BID_LUA = """
+local state = KEYS[1]
+if redis.call('EXISTS', state) == 0 then return {'missing'} end
+local f = redis.call('HMGET', state, 'status', 'start', 'end', 'starting', 'step', 'current', 'count')
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+if tonumber(f[1]) ~= tonumber(ARGV[5]) or now < tonumber(f[2]) or now >= tonumber(f[3]) then
+    return {'inactive'}
+end
+local amount = tonumber(ARGV[1])
+local minimum = math.max(tonumber(f[4]), tonumber(f[6]) + tonumber(f[5]))
+if amount < minimum then return {'outbid', tostring(minimum), f[6]} end
+redis.call('HSET', state, 'current', amount, 'leader', ARGV[2], 'leader_email', ARGV[3],
+    'count', tonumber(f[7]) + 1)
+local id = redis.call('XADD', KEYS[2], '*', 'auction', ARGV[4], 'user', ARGV[2], 'amount', amount, 'ts', now)
+return {'ok', id, tostring(now)}
+"""
+
+# Загрузка из базы — только если хеша ещё нет (его мог создать другой процесс)
+LOAD_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# Правка аукциона (статус, время, шаг) — без текущей цены и лидера
+SYNC_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+PERSIST_SQL = """
+INSERT INTO {bid} (stream_id, auction_id, user_id, amount, created_at)
+SELECT * FROM unnest(%s::varchar[], %s::bigint[], %s::bigint[], %s::numeric[], %s::timestamptz[])
+ON CONFLICT (stream_id) DO NOTHING
+"""
+
+CURRENT_BID_SQL = """
+UPDATE {auction} AS a SET current_bid = v.amount
+FROM (SELECT auction_id, max(amount) AS amount FROM unnest(%s::bigint[], %s::numeric[]) AS t(auction_id, amount)
+      GROUP BY auction_id) AS v
+WHERE a.id = v.auction_id AND a.current_bid < v.amount
+"""
+
+_scripts = {}
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def to_cents(amount):
+    return int(Decimal(amount) * 100)
+
+
+def from_cents(value):
+    return (Decimal(int(value)) / 100).quantize(Decimal("0.01"))
+
+
+def epoch_ms(value):
+    return int(value.timestamp() * 1000)
+
+
+def from_epoch_ms(value):
+    return datetime.fromtimestamp(int(value) / 1000, tz=dt_timezone.utc)
+
+
+def _settings_fields(auction):
+    return [
+        "status", auction.status, "start", epoch_ms(auction.start_time), "end", epoch_ms(auction.end_time),
+        "starting", to_cents(auction.starting_price), "step", to_cents(auction.bid_step),
+    ]
+
+
+def load(auction_id):
+    """Создаёт хеш по базе; сначала дочитывает поток, чтобы база была полной."""
+    drain()
+    auction = Auction.objects.get(pk=auction_id)
+    leader = (
+        Bid.objects.filter(auction_id=auction_id).order_by("-amount", "created_at")
+        .values_list("user_id", "user__email").first()
+    )
+    fields = _settings_fields(auction) + [
+        "current", to_cents(auction.current_bid),
+        "count", Bid.objects.filter(auction_id=auction_id).count(),
+        "leader", leader[0] if leader else "", "leader_email", leader[1] if leader else "",
+    ]
+    _script(LOAD_LUA)(keys=[STATE_KEY.format(auction_id)], args=fields)
+
+
+def sync(auction):
+    """Переносит в хеш правку аукциона; закрытый хеш живёт CLOSED_TTL для сверки."""
+    key = STATE_KEY.format(auction.pk)
+    try:
+        if _script(SYNC_LUA)(keys=[key], args=_settings_fields(auction)) and auction.status != ACTIVE:
+            get_redis().expire(key, CLOSED_TTL)
+    except redis.RedisError:
+        # Хеш устарел; без Redis ставки в горячем режиме всё равно не принимаются
+        logger.warning("Не удалось обновить горячее состояние аукциона %s", auction.pk, exc_info=True)
+
+
+def close(auction_ids):
+    """Помечает аукционы закрытыми: Lua-скрипт перестаёт принимать ставки."""
+    pipe = get_redis().pipeline(transaction=False)
+    for auction_id in auction_ids:
+        key = STATE_KEY.format(auction_id)
+        pipe.eval(SYNC_LUA, 1, key, "status", 3)
+        pipe.expire(key, CLOSED_TTL)
+    try:
+        pipe.execute()
+    except redis.RedisError:
+        # Ставки после end_time скрипт всё равно отклонит по времени
+        logger.warning("Не удалось закрыть горячее состояние аукционов", exc_info=True)
+
+
+def place_bid(auction, user, amount):
+    """
+    Принимает ставку в Redis. Возвращает несохранённый Bid (id появится после
+    записи в базу) или бросает BidRejected; auction.current_bid обновляется на месте.
+    """
+    from .bidding import BidRejected
+
+    args = [to_cents(amount), user.pk, user.email, auction.pk, ACTIVE]
+    keys = [STATE_KEY.format(auction.pk), STREAM]
+    result = _script(BID_LUA)(keys=keys, args=args)
+    if result[0] == b"missing":
+        load(auction.pk)
+        result = _script(BID_LUA)(keys=keys, args=args)
+
+    outcome = result[0].decode()
+    if outcome == "inactive":
+        raise BidRejected("Аукцион не активен", "inactive")
+    if outcome == "outbid":
+        auction.current_bid = from_cents(result[2])
+        raise BidRejected(f"Ставку перебили: минимальная ставка теперь {from_cents(result[1])}", "outbid")
+    if outcome != "ok":
+        # Хеш так и не появился (например, аукциона нет в базе)
+        raise BidRejected("Аукцион не активен", "inactive")
+
+    created_at = from_epoch_ms(result[2])
+    auction.current_bid = Decimal(amount)
+    bump("auctions")
+    events.publish(
+        events.BID_PLACED, auction.pk, bid=None, amount=amount,
+        user_email=user.email, created_at=created_at,
+    )
+    return Bid(auction=auction, user=user, amount=amount, created_at=created_at)
+
+
+def read_states(auction_ids):
+    """{id: {current_bid, bids_count, leader_email}} для аукционов с горячим состоянием."""
+    pipe = get_redis().pipeline(transaction=False)
+    for auction_id in auction_ids:
+        pipe.hmget(STATE_KEY.format(auction_id), "current", "count", "leader_email")
+    states = {}
+    for auction_id, (current, count, leader_email) in zip(auction_ids, pipe.execute()):
+        if current is not None:
+            states[auction_id] = {
+                "current_bid": from_cents(current),
+                "bids_count": int(count),
+                "leader_email": leader_email.decode() or None,
+            }
+    return states
+
+
+# --- Перенос ставок в базу ---
+
+def persist(entries):
+    """entries — [(id записи, поля)] из потока. Идемпотентно по stream_id."""
+    if not entries:
+        return 0
+    columns = ([], [], [], [], [])
+    for entry_id, fields in entries:
+        columns[0].append(entry_id.decode())
+        columns[1].append(int(fields[b"auction"]))
+        columns[2].append(int(fields[b"user"]))
+        columns[3].append(from_cents(fields[b"amount"]))
+        columns[4].append(from_epoch_ms(fields[b"ts"]))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(PERSIST_SQL.format(bid=connection.ops.quote_name(Bid._meta.db_table)), list(columns))
+        inserted = cursor.rowcount
+        cursor.execute(
+            CURRENT_BID_SQL.format(auction=connection.ops.quote_name(Auction._meta.db_table)),
+            [columns[1], columns[3]],
+        )
+        if inserted:
+            # Списки ставок, лидеры и снимки читают базу: их ETag должен смениться,
+            # когда ставка в ней появилась, а не только когда её принял Redis
+            bump("auctions")
+    metrics.incr("auction_hot_bids_persisted_total", amount=inserted)
+    return inserted
+
+
+def drain():
+    """Переносит в базу всё, что есть в потоке, не дожидаясь обработчика."""
+    redis = get_redis()
+    total = 0
+    start = "-"
+    while True:
+        entries = redis.xrange(STREAM, min=start, count=BATCH_SIZE)
+        if not entries:
+            return total
+        total += persist(entries)
+        redis.xdel(STREAM, *[entry_id for entry_id, _ in entries])
+        start = "(" + entries[-1][0].decode()
+
+
+def ensure_group():
+    try:
+        get_redis().xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consume(max_batches=10):
+    """Читает поток группой обработчиков и переносит ставки в базу. Возвращает число записей."""
+    ensure_group()
+    redis = get_redis()
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    # Сначала — записи обработчика, который упал, не подтвердив их
+    _, claimed, *_ = redis.xautoclaim(STREAM, GROUP, consumer, CLAIM_IDLE_MS, count=BATCH_SIZE)
+    batches = [claimed] if claimed else []
+    total = 0
+    for _ in range(max_batches):
+        if not batches:
+            response = redis.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=BATCH_SIZE)
+            if not response:
+                break
+            batches = [response[0][1]]
+        entries = batches.pop()
+        persist(entries)
+        ids = [entry_id for entry_id, _ in entries]
+        redis.xack(STREAM, GROUP, *ids)
+        redis.xdel(STREAM, *ids)
+        total += len(entries)
+    return total
+
+
+# --- Сверка ---
+
+def hot_ids(closed_only=True):
+    """id аукционов с хешем в Redis (по умолчанию — только закрытых)."""
+    redis = get_redis()
+    ids = [int(key.rsplit(b":", 1)[1]) for key in redis.scan_iter(match=STATE_KEY.format("*"), count=1000)]
+    if not closed_only:
+        return ids
+    pipe = redis.pipeline(transaction=False)
+    for auction_id in ids:
+        pipe.hget(STATE_KEY.format(auction_id), "status")
+    return [auction_id for auction_id, status in zip(ids, pipe.execute()) if status and int(status) != ACTIVE]
+
+
+def reconcile(auction_ids):
+    """
+    Расхождения Redis и базы: [(id, поле, redis, база)]. Пустой список —
+    состояния совпадают. Вызывать после drain (или закрытия аукционов).
+    """
+    states = read_states(list(auction_ids))
+    db = {
+        row["id"]: row for row in Auction.objects.filter(pk__in=states)
+        .annotate(bids_count=Count("bids")).values("id", "current_bid", "bids_count")
+    }
+    # Лидеры всех аукционов одним запросом (DISTINCT ON auction_id)
+    leaders = dict(
+        Bid.objects.filter(auction_id__in=states).order_by("auction_id", "-amount", "created_at")
+        .distinct("auction_id").values_list("auction_id", "user__email")
+    )
+    mismatches = []
+    for auction_id, state in states.items():
+        row = db.get(auction_id)
+        if row is None:
+            mismatches.append((auction_id, "auction", "есть", "нет"))
+            continue
+        expected = {
+            "current_bid": row["current_bid"], "bids_count": row["bids_count"], "leader_email": leaders[auction_id],
+        }
+        for field, value in expected.items():
+            if state[field] != value:
+                mismatches.append((auction_id, field, state[field], value))
+    if mismatches:
+        metrics.incr("auction_hot_state_mismatch_total", amount=len(mismatches))
+        logger.error("Горячее состояние аукционов расходится с базой: %s", mismatches)
+    return mismatches
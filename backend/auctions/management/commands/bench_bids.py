@@ -0,0 +1,166 @@
+"""
+Нагрузочная проверка ставок: несколько процессов без пауз ставят на один
+аукцион, как в последние секунды торгов.
+
+    python manage.py bench_bids --processes 8 --duration 10
+    python manage.py bench_bids --legacy      # прежняя схема: чтение, проверка, save()
+    python manage.py bench_bids --hot         # ставки через Redis (hotstate.py)
+    python manage.py bench_bids --cleanup
+
+После прогона проверяется, что current_bid равна максимальной ставке и что
+каждая следующая ставка выше предыдущей. Данные создаются с префиксом
+bench-bids и только для разработческой базы.
+"""
+import multiprocessing
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max
+from django.utils import timezone
+
+from auctions import hotstate
+from auctions.bidding import BidRejected, min_bid, place_bid
+from auctions.models import Auction, Bid
+from books.models import Book, Publisher
+from backend.redis_client import get_redis
+from users.models import CustomUser
+
+BENCH_PREFIX = "bench-bids"
+
+
+def legacy_bid(auction, user, amount):
+    """Прежняя логика BidSerializer — для сравнения."""
+    auction.refresh_from_db()
+    if not auction.is_active() or amount < min_bid(auction):
+        raise BidRejected("Ставка ниже минимальной", "outbid")
+    bid = Bid.objects.create(user=user, auction=auction, amount=amount)
+    auction.current_bid = amount
+    auction.save(update_fields=["current_bid"])
+    return bid
+
+
+def worker(args):
+    auction_id, user_id, duration, mode, seed = args
+    # Соединение родителя не переиспользуем после fork
+    connections.close_all()
+    rng = random.Random(seed)
+    bid = BID_FUNCTIONS[mode]
+    auction = Auction.objects.get(pk=auction_id)
+    user = CustomUser.objects.get(pk=user_id)
+    accepted = rejected = 0
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        # Ставим от последней известной цены: отказ обновит её через refresh
+        amount = min_bid(auction) + auction.bid_step * rng.randint(0, 2)
+        started = time.perf_counter()
+        try:
+            bid(auction, user, amount)
+            accepted += 1
+        except BidRejected:
+            rejected += 1
+        latencies.append(time.perf_counter() - started)
+    connections.close_all()
+    return accepted, rejected, latencies
+
+
+BID_FUNCTIONS = {"cas": place_bid, "legacy": legacy_bid, "hot": hotstate.place_bid}
+MODE_TITLES = {"cas": "условный UPDATE", "legacy": "прежняя схема", "hot": "Redis"}
+
+
+class Command(BaseCommand):
+    help = "Параллельные ставки на один аукцион: пропускная способность и корректность"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=8)
+        parser.add_argument("--duration", type=float, default=10, help="Секунд на прогон")
+        parser.add_argument("--legacy", action="store_true", help="Ставить по прежней схеме без условного UPDATE")
+        parser.add_argument("--hot", action="store_true", help="Ставить через горячее состояние в Redis")
+        parser.add_argument("--cleanup", action="store_true", help="Удалить тестовые данные")
+
+    def handle(self, *args, processes, duration, legacy, hot, cleanup, **options):
+        if cleanup:
+            self.cleanup()
+            return
+
+        mode = "legacy" if legacy else "hot" if hot else "cas"
+        auction = self.create_auction()
+        users = [self.get_user(i) for i in range(processes)]
+        self.stdout.write(
+            f"Аукцион {auction.pk}: {processes} процессов, {duration:g} с, "
+            f"{MODE_TITLES[mode]}"
+        )
+
+        connections.close_all()
+        jobs = [(auction.pk, user.pk, duration, mode, i) for i, user in enumerate(users)]
+        started = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(processes) as pool:
+            results = pool.map(worker, jobs)
+        elapsed = time.perf_counter() - started
+
+        accepted = sum(r[0] for r in results)
+        rejected = sum(r[1] for r in results)
+        latencies = sorted(latency for r in results for latency in r[2])
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+        self.stdout.write(
+            f"Попыток: {accepted + rejected} ({(accepted + rejected) / elapsed:.0f}/с), "
+            f"принято: {accepted} ({accepted / elapsed:.0f}/с), отклонено: {rejected}"
+        )
+        if latencies:
+            self.stdout.write(
+                f"Задержка: медиана {statistics.median(latencies) * 1000:.1f} мс, p99 {p99 * 1000:.1f} мс"
+            )
+        if hot:
+            hotstate.drain()
+        self.check_consistency(auction)
+        if hot:
+            mismatches = hotstate.reconcile([auction.pk])
+            self.stdout.write(f"Расхождений Redis и базы: {len(mismatches)}")
+
+    def check_consistency(self, auction):
+        auction.refresh_from_db()
+        amounts = list(Bid.objects.filter(auction=auction).order_by("id").values_list("amount", flat=True))
+        highest = Bid.objects.filter(auction=auction).aggregate(m=Max("amount"))["m"]
+        not_increasing = sum(1 for prev, cur in zip(amounts, amounts[1:]) if cur < prev + auction.bid_step)
+        self.stdout.write(
+            f"current_bid: {auction.current_bid}, максимальная ставка: {highest}, "
+            f"ставок не выше предыдущей на шаг: {not_increasing}"
+        )
+        if auction.current_bid != highest or not_increasing:
+            self.stderr.write(self.style.ERROR("Нарушена согласованность ставок"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Ставки согласованы"))
+
+    def get_user(self, index):
+        user, _ = CustomUser.objects.get_or_create(
+            email=f"{BENCH_PREFIX}-{index}@example.com",
+            defaults={"first_name": "Бенч", "last_name": "Ставки", "password": "!"},
+        )
+        return user
+
+    def create_auction(self):
+        publisher, _ = Publisher.objects.get_or_create(name=BENCH_PREFIX)
+        book = Book.objects.create(
+            title=BENCH_PREFIX, year=1900, publisher=publisher, condition=1,
+            description="", price=1000, status=1, quantity=1,
+        )
+        now = timezone.now()
+        return Auction.objects.create(
+            product=book, starting_price=100, bid_step=10, status=2,
+            start_time=now - timedelta(minutes=1), end_time=now + timedelta(hours=1),
+        )
+
+    def cleanup(self):
+        auctions = Auction.objects.filter(product__publisher__name=BENCH_PREFIX)
+        keys = [hotstate.STATE_KEY.format(pk) for pk in auctions.values_list("pk", flat=True)]
+        if keys:
+            get_redis().delete(*keys)
+        auctions.delete()
+        Book.objects.filter(publisher__name=BENCH_PREFIX).delete()
+        Publisher.objects.filter(name=BENCH_PREFIX).delete()
+        CustomUser.objects.filter(email__startswith=f"{BENCH_PREFIX}-").delete()
+        self.stdout.write("Тестовые данные удалены")
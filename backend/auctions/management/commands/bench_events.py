@@ -0,0 +1,161 @@
+"""
+Нагрузочная проверка push-канала: много простаивающих SSE-подписчиков на
+один ASGI-процесс и задержка доставки событий.
+
+    python manage.py bench_events --subscribers 5000 --events 20
+    python manage.py bench_events --url http://127.0.0.1:8001   # уже запущенный сервер
+
+Без --url команда сама поднимает uvicorn backend.asgi:application (один
+процесс) и показывает его память до и после подключения подписчиков.
+События публикуются прямо в канал Redis с несуществующими id аукционов,
+база не меняется.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.events import CHANNEL
+from backend.redis_client import get_redis
+
+AUCTIONS = 10
+FAKE_ID_BASE = 10 ** 12
+DELIVERY_TIMEOUT = 30
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+async def wait_port(host, port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise CommandError(f"Сервер на {host}:{port} не поднялся")
+
+
+class Subscriber:
+    def __init__(self, host, port, ids):
+        self.host, self.port, self.ids = host, port, ids
+        self.latencies = []
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        query = f"?ids={','.join(map(str, self.ids))}" if self.ids else ""
+        self.writer.write(
+            f"GET /auctions/events/{query} HTTP/1.1\r\nHost: {self.host}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await self.writer.drain()
+        status = await self.reader.readline()
+        if b" 200 " not in status:
+            raise CommandError(f"Ответ сервера: {status!r}")
+        # Заголовки, затем первый кусок потока с retry: подписка уже оформлена
+        while not (await self.reader.readline()).startswith(b"retry:"):
+            pass
+
+    async def read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            # Строки chunked-кодирования без "data:" просто пропускаем
+            if line.startswith(b"data: "):
+                sent = json.loads(line[6:])["sent"]
+                self.latencies.append(time.time() - sent)
+
+    def close(self):
+        self.writer.close()
+
+
+class Command(BaseCommand):
+    help = "Держит тысячи SSE-подписок на один ASGI-процесс и замеряет доставку событий"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=2000)
+        parser.add_argument("--events", type=int, default=20)
+        parser.add_argument("--url", help="Уже запущенный ASGI-сервер; без него поднимается свой")
+        parser.add_argument("--port", type=int, default=8765)
+
+    def handle(self, *args, subscribers, events, url, port, **options):
+        server = None
+        if url:
+            parts = urlsplit(url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            host = "127.0.0.1"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "backend.asgi:application",
+                 "--host", host, "--port", str(port), "--log-level", "warning", "--no-access-log"],
+                env=os.environ.copy(),
+            )
+        try:
+            asyncio.run(self.run(host, port, subscribers, events, server))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    async def run(self, host, port, count, events, server):
+        await wait_port(host, port)
+        if server is not None:
+            self.stdout.write(f"uvicorn pid {server.pid}: {rss_mb(server.pid):.1f} МБ до подписок")
+
+        # Каждый второй — на общую ленту, остальные — на один из AUCTIONS аукционов
+        subs = [
+            Subscriber(host, port, [] if i % 2 else [FAKE_ID_BASE + i % AUCTIONS])
+            for i in range(count)
+        ]
+        started = time.perf_counter()
+        for batch in range(0, count, 500):
+            await asyncio.gather(*(sub.connect() for sub in subs[batch:batch + 500]))
+        self.stdout.write(f"Подключено {count} подписчиков за {time.perf_counter() - started:.1f} с")
+        readers = [asyncio.create_task(sub.read()) for sub in subs]
+
+        if server is not None:
+            await asyncio.sleep(1)
+            memory = rss_mb(server.pid)
+            self.stdout.write(f"Память сервера: {memory:.1f} МБ")
+
+        redis = get_redis()
+        for i in range(events):
+            auction = FAKE_ID_BASE + i % AUCTIONS
+            message = {"event": "bid-placed", "auction": auction, "amount": i, "sent": time.time()}
+            await asyncio.to_thread(redis.publish, CHANNEL, json.dumps(message))
+            await asyncio.sleep(0.05)
+
+        # Событие получают все подписчики ленты и подписчики его аукциона
+        expected = sum(
+            1 for i in range(events) for sub in subs
+            if not sub.ids or sub.ids == [FAKE_ID_BASE + i % AUCTIONS]
+        )
+        deadline = time.monotonic() + DELIVERY_TIMEOUT
+        while sum(len(sub.latencies) for sub in subs) < expected and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+
+        for sub in subs:
+            sub.close()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+        latencies = sorted(latency for sub in subs for latency in sub.latencies)
+        self.stdout.write(f"Доставлено {len(latencies)} из {expected}")
+        if latencies:
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            self.stdout.write(
+                f"Задержка: медиана {statistics.median(latencies) * 1000:.1f} мс, "
+                f"p99 {p99 * 1000:.1f} мс, максимум {latencies[-1] * 1000:.1f} мс"
+            )
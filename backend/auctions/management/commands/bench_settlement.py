@@ -0,0 +1,171 @@
+"""
+Замер закрытия аукционов: прежний цикл по одному аукциону и пакетное
+settle_auctions на одновременно закончившихся лотах.
+
+    python manage.py bench_settlement --auctions 10000 --bids 5
+    python manage.py bench_settlement --cleanup
+
+Каждый вариант выполняется в транзакции, которая затем откатывается, поэтому
+оба закрывают одни и те же аукционы. Данные создаются с префиксом
+bench-settlement и только для разработческой базы.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from auctions.models import Auction
+from auctions.settlement import settle_auctions
+from orders.models import Order, OrderItem
+
+BENCH_PREFIX = "bench-settlement"
+BIDDERS = 200
+
+
+class Rollback(Exception):
+    pass
+
+
+class QueryCounter:
+    """Счётчик запросов без журнала (CaptureQueriesContext хранит не больше 9000)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def legacy_settlement(now):
+    """Прежний цикл из update_auction_status — для сравнения."""
+    for auction in Auction.objects.filter(status=2, end_time__lte=now):
+        auction.status = 3
+        auction.save(update_fields=['status'])
+        winning_bid = auction.bids.order_by('-amount', 'created_at').first()
+        if winning_bid:
+            book = auction.product
+            order = Order.objects.create(
+                user=winning_bid.user, payment=Order.Payment.HANDS,
+                status=Order.Status.PENDING, amount=winning_bid.amount,
+            )
+            OrderItem.objects.create(order=order, book=book, price=winning_bid.amount, quantity=1)
+            book.quantity -= 1
+            if book.quantity <= 0:
+                book.quantity = 0
+                book.status = 2
+            book.save(update_fields=['quantity', 'status'])
+
+
+class Command(BaseCommand):
+    help = "Сравнивает закрытие множества аукционов по одному и пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--auctions", type=int, default=10000)
+        parser.add_argument("--bids", type=int, default=5, help="Ставок на аукцион")
+        parser.add_argument("--skip-legacy", action="store_true", help="Не замерять прежний цикл (он долгий)")
+        parser.add_argument("--cleanup", action="store_true", help="Удалить тестовые данные")
+
+    def handle(self, *args, auctions, bids, skip_legacy, cleanup, **options):
+        if cleanup:
+            self.cleanup()
+            return
+        self.seed(auctions, bids)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT now()")
+            now = cursor.fetchone()[0]
+
+        variants = [("bulk", lambda now: settle_auctions(now=now))]
+        if not skip_legacy:
+            variants.insert(0, ("legacy", legacy_settlement))
+        for name, func in variants:
+            queries = QueryCounter()
+            try:
+                with transaction.atomic():
+                    with connection.execute_wrapper(queries):
+                        started = time.perf_counter()
+                        func(now)
+                        elapsed = time.perf_counter() - started
+                    closed = Auction.objects.filter(product__title=BENCH_PREFIX, status=3).count()
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f"{name:7} закрыто: {closed}  запросов: {queries.count:6}  "
+                f"время: {elapsed * 1000:9.1f} мс"
+            )
+
+    @transaction.atomic
+    def seed(self, auctions, bids):
+        self.stdout.write(f"Создаём {auctions} завершившихся аукционов по {bids} ставок...")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO users_customuser (email, first_name, last_name, password, status,
+                    is_admin, is_active, is_staff, is_superuser, created_at)
+                SELECT %s || i || '@example.com', 'Бенч', 'Закрытие', '!', 1, false, true, false, false, now()
+                FROM generate_series(1, %s) i
+                ON CONFLICT (email) DO NOTHING
+                """,
+                [BENCH_PREFIX + "-", BIDDERS],
+            )
+            cursor.execute("SELECT id FROM users_customuser WHERE email LIKE %s", [BENCH_PREFIX + "-%"])
+            user_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("INSERT INTO books_publisher (name) VALUES (%s) RETURNING id", [BENCH_PREFIX])
+            publisher_id = cursor.fetchone()[0]
+            # По книге на аукцион, у каждой десятой — два экземпляра
+            cursor.execute(
+                """
+                INSERT INTO books_book (title, year, publisher_id, condition, description, price,
+                    status, created_at, updated_at, quantity)
+                SELECT %s, 1900, %s, 1, '', 1000, 1, now(), now(), CASE WHEN i %% 10 = 0 THEN 2 ELSE 1 END
+                FROM generate_series(1, %s) i
+                RETURNING id
+                """,
+                [BENCH_PREFIX, publisher_id, auctions],
+            )
+            book_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                INSERT INTO auctions_auction (product_id, starting_price, bid_step, start_time, end_time,
+                    status, current_bid)
+                SELECT b, 100, 10, now() - interval '1 hour', now() - interval '1 second', 2, 100 + 10 * %s
+                FROM unnest(%s::bigint[]) b
+                """,
+                [bids, book_ids],
+            )
+            cursor.execute(
+                """
+                INSERT INTO auctions_bid (auction_id, user_id, amount, created_at)
+                SELECT a.id, (%s::bigint[])[1 + (a.id * 7 + k) %% %s], 100 + 10 * k, now() - interval '1 minute'
+                FROM auctions_auction a CROSS JOIN generate_series(1, %s) k
+                WHERE a.product_id = ANY(%s)
+                """,
+                [user_ids, len(user_ids), bids, book_ids],
+            )
+            cursor.execute("ANALYZE auctions_auction; ANALYZE auctions_bid")
+
+    @transaction.atomic
+    def cleanup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT id FROM books_book WHERE publisher_id IN (SELECT id FROM books_publisher WHERE name = %s)",
+                [BENCH_PREFIX],
+            )
+            book_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "DELETE FROM auctions_bid WHERE auction_id IN (SELECT id FROM auctions_auction WHERE product_id = ANY(%s))",
+                [book_ids],
+            )
+            cursor.execute("DELETE FROM auctions_auction WHERE product_id = ANY(%s)", [book_ids])
+            cursor.execute(
+                "DELETE FROM orders_orderitem WHERE book_id = ANY(%s)", [book_ids]
+            )
+            cursor.execute(
+                "DELETE FROM orders_order WHERE user_id IN (SELECT id FROM users_customuser WHERE email LIKE %s)",
+                [BENCH_PREFIX + "-%"],
+            )
+            cursor.execute("DELETE FROM books_book WHERE id = ANY(%s)", [book_ids])
+            cursor.execute("DELETE FROM books_publisher WHERE name = %s", [BENCH_PREFIX])
+            cursor.execute("DELETE FROM users_customuser WHERE email LIKE %s", [BENCH_PREFIX + "-%"])
+        self.stdout.write("Тестовые данные удалены")
@@ -0,0 +1,29 @@
+"""
+Сверка горячего состояния аукционов в Redis с базой (AUCTION_HOT_STATE).
+
+    python manage.py reconcile_hot_state          # закрытые аукционы
+    python manage.py reconcile_hot_state --all    # и идущие (после переноса потока)
+
+Перед сверкой поток ставок переносится в базу. Код возврата 1 — есть расхождения.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions import hotstate
+
+
+class Command(BaseCommand):
+    help = "Проверяет, что цена, лидер и число ставок в Redis совпадают с базой"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Сверять и активные аукционы")
+
+    def handle(self, *args, all, **options):
+        persisted = hotstate.drain()
+        ids = hotstate.hot_ids(closed_only=not all)
+        mismatches = hotstate.reconcile(ids)
+        self.stdout.write(f"Перенесено ставок: {persisted}, проверено аукционов: {len(ids)}")
+        for auction_id, field, in_redis, in_db in mismatches:
+            self.stdout.write(f"Аукцион {auction_id}: {field} в Redis {in_redis}, в базе {in_db}")
+        if mismatches:
+            raise CommandError(f"Расхождений: {len(mismatches)}")
+        self.stdout.write(self.style.SUCCESS("Redis и база совпадают"))
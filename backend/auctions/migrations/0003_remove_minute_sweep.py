@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def remove_minute_sweep(apps, schema_editor):
+    # DatabaseScheduler хранит задачи из CELERY_BEAT_SCHEDULE в базе и
+    # не удаляет переименованные: старая ежеминутная проверка осталась бы
+    PeriodicTask = apps.get_model("django_celery_beat", "PeriodicTask")
+    PeriodicTask.objects.filter(name="update-auction-status-every-minute").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auctions", "0002_initial"),
+        ("django_celery_beat", "0019_alter_periodictasks_options"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_minute_sweep, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0003_remove_minute_sweep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='stream_id',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True, unique=True),
+        ),
+    ]
@@ -43,9 +43,16 @@ class Bid(models.Model):
     auction = models.ForeignKey(Auction, on_delete=models.CASCADE, related_name='bids')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
+    # id записи в потоке Redis для ставок, принятых в горячем режиме (auctions/hotstate.py)
+    stream_id = models.CharField(max_length=32, null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Ставки аукциона по лидерству и история пользователя — курсором без сортировки
+            models.Index(fields=["auction", "-amount", "created_at"], name="bid_auction_leader_idx"),
+            models.Index(fields=["user", "-created_at"], name="bid_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.email} -> {self.auction.id}: {self.amount}"
\ No newline at end of file
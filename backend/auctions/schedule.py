@@ -0,0 +1,47 @@
+"""
+Планирование открытия и закрытия аукционов ETA-задачами Celery.
+
+Задача ставится при создании и правке аукциона, если переход наступит в
+пределах SCHEDULE_HORIZON; более дальние подхватывает периодическая проверка
+(update_auction_status), которая запускается чаще, чем длится горизонт.
+Горизонт много меньше visibility_timeout Redis-брокера (1 час): дальние ETA
+он доставлял бы повторно. Задачи идемпотентны — каждая несёт ожидаемое время
+перехода и ничего не делает, если аукцион уже перенесён или закрыт.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Auction
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_HORIZON = timedelta(minutes=15)
+
+
+def schedule_transitions(auction, now=None):
+    """Ставит ETA-задачи на ближайшие переходы аукциона."""
+    from .tasks import close_auction, open_auction
+
+    horizon = (now or timezone.now()) + SCHEDULE_HORIZON
+    try:
+        if auction.status == 1 and auction.start_time <= horizon:
+            open_auction.apply_async((auction.pk, auction.start_time.isoformat()), eta=auction.start_time)
+        if auction.status in (1, 2) and auction.end_time <= horizon:
+            close_auction.apply_async((auction.pk, auction.end_time.isoformat()), eta=auction.end_time)
+    except Exception:
+        # Брокер недоступен — переход выполнит периодическая проверка
+        logger.warning("Не удалось запланировать переходы аукциона %s", auction.pk, exc_info=True)
+
+
+def schedule_upcoming(now=None):
+    """Задачи на все переходы в пределах горизонта; повторная постановка безвредна."""
+    now = now or timezone.now()
+    horizon = now + SCHEDULE_HORIZON
+    upcoming = Auction.objects.filter(
+        Q(status=1, start_time__lte=horizon) | Q(status__in=(1, 2), end_time__lte=horizon)
+    ).only('id', 'status', 'start_time', 'end_time')
+    for auction in upcoming:
+        schedule_transitions(auction, now)
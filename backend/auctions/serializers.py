@@ -1,8 +1,22 @@
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from . import hotstate
+from .bidding import BidRejected, min_bid, place_bid
 from .models import Auction, Bid
 from books.models import Book
 
 
+class AuctionListSerializer(serializers.ListSerializer):
+    """В горячем режиме читает текущие цены всей страницы одним конвейером Redis."""
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.hot_states = hotstate.read_states([item.pk for item in items]) if settings.AUCTION_HOT_STATE else {}
+        return super().to_representation(items)
+
+
 class AuctionSerializer(serializers.ModelSerializer):
     product_title = serializers.CharField(source='product.title', read_only=True)
     status_display = serializers.CharField(read_only=True)
@@ -23,10 +37,22 @@ class AuctionSerializer(serializers.ModelSerializer):
             "current_bid",
             "is_active_now",
         ]
+        list_serializer_class = AuctionListSerializer
 
     def get_is_active_now(self, obj):
         return obj.is_active()
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if settings.AUCTION_HOT_STATE:
+            # В базе current_bid отстаёт на время переноса ставок из Redis
+            states = getattr(self.parent, "hot_states", None)
+            if states is None:
+                states = hotstate.read_states([instance.pk])
+            if instance.pk in states:
+                data["current_bid"] = self.fields["current_bid"].to_representation(states[instance.pk]["current_bid"])
+        return data
+
 class BidSerializer(serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     auction_status = serializers.CharField(source='auction.status_display', read_only=True)
@@ -44,16 +70,18 @@ class BidSerializer(serializers.ModelSerializer):
         if not auction.is_active():
             raise serializers.ValidationError("Аукцион не активен")
 
-        min_bid = max(auction.starting_price, auction.current_bid + auction.bid_step)
-        if amount < min_bid:
-            raise serializers.ValidationError(f"Ставка должна быть не меньше {min_bid}")
+        minimum = min_bid(auction)
+        if amount < minimum:
+            raise serializers.ValidationError(f"Ставка должна быть не меньше {minimum}")
 
         return data
 
     def create(self, validated_data):
+        # Проверка в validate() — по уже прочитанному аукциону; окончательно
+        # ставку принимает условный UPDATE в place_bid (в горячем режиме — скрипт в Redis)
         user = self.context['request'].user
-        bid = Bid.objects.create(user=user, **validated_data)
-        auction = bid.auction
-        auction.current_bid = bid.amount
-        auction.save(update_fields=['current_bid'])
-        return bid
\ No newline at end of file
+        place = hotstate.place_bid if settings.AUCTION_HOT_STATE else place_bid
+        try:
+            return place(validated_data['auction'], user, validated_data['amount'])
+        except BidRejected as e:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [e.message]}, code=e.code)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Закрытие завершившихся аукционов пачками.
+
+На пачку — одна транзакция и постоянное число запросов, сколько бы
+аукционов ни закончилось одновременно: статус меняется одним UPDATE
+с RETURNING, победители выбираются одним DISTINCT ON, заказы и позиции
+создаются bulk_create, остаток книг списывается одним UPDATE.
+
+Параллельные запуски безопасны: строки захватываются SELECT ... FOR UPDATE
+SKIP LOCKED и статус меняется в той же транзакции, поэтому два обработчика
+не закроют один аукцион дважды, а берут разные строки, не ожидая друг друга.
+Шардирование по id (mod(id, shards) = shard) раскладывает закрытие по
+нескольким воркерам (settle_shard).
+
+В горячем режиме (hotstate.py) сначала дочитывается поток ставок Redis.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from backend.cache import bump
+from books.models import Book
+from orders.models import Order, OrderItem
+from . import events, hotstate
+from .models import Auction, Bid
+
+ACTIVE = 2
+CLOSED = 3
+SOLD = 2
+BATCH_SIZE = 500
+
+CLAIM_SQL = """
+UPDATE {auction} AS a SET status = {closed}
+FROM (
+    SELECT id FROM {auction}
+    WHERE status = {active} AND end_time <= %(now)s {filters}
+    ORDER BY id LIMIT %(limit)s
+    FOR UPDATE {skip_locked}
+) AS due
+WHERE a.id = due.id
+RETURNING a.id, a.product_id, a.current_bid
+"""
+
+# Лучшая ставка, при равных суммах — более ранняя
+WINNERS_SQL = """
+SELECT DISTINCT ON (auction_id) auction_id, user_id, amount
+FROM {bid}
+WHERE auction_id = ANY(%s)
+ORDER BY auction_id, amount DESC, created_at
+"""
+
+# Книги блокируются в порядке id, как при оформлении заказа: параллельные пачки
+# с общими книгами не попадут в дедлок
+LOCK_BOOKS_SQL = """
+SELECT id FROM {book} WHERE id = ANY(%s) ORDER BY id FOR UPDATE
+"""
+
+STOCK_SQL = """
+UPDATE {book} AS b
+SET quantity = GREATEST(b.quantity - v.qty, 0),
+    status = CASE WHEN b.quantity - v.qty <= 0 THEN {sold} ELSE b.status END
+FROM (SELECT book_id, count(*) AS qty FROM unnest(%s::bigint[]) AS book_id GROUP BY book_id) AS v
+WHERE b.id = v.book_id
+"""
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def claim_sql(ids=None, shards=1):
+    filters = []
+    if ids is not None:
+        filters.append("AND id = ANY(%(ids)s)")
+    if shards > 1:
+        filters.append("AND mod(id, %(shards)s) = %(shard)s")
+    return CLAIM_SQL.format(
+        auction=_table(Auction), active=ACTIVE, closed=CLOSED, filters=" ".join(filters),
+        # Закрытие конкретного аукциона ждёт блокировку (например, ставки в процессе),
+        # обход просроченных — пропускает занятые строки: их закроет другой обработчик
+        skip_locked="" if ids is not None else "SKIP LOCKED",
+    )
+
+
+def settle_batch(now, ids=None, limit=BATCH_SIZE, shard=0, shards=1):
+    """Закрывает до limit просроченных аукционов (или из ids). Возвращает число закрытых."""
+    params = {"now": now, "limit": limit, "ids": ids, "shard": shard, "shards": shards}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(claim_sql(ids, shards), params)
+        closed = cursor.fetchall()
+        if not closed:
+            return 0
+        products = {auction_id: product_id for auction_id, product_id, _ in closed}
+
+        cursor.execute(WINNERS_SQL.format(bid=_table(Bid)), [list(products)])
+        winners = cursor.fetchall()
+
+        orders = Order.objects.bulk_create([
+            Order(user_id=user_id, payment=Order.Payment.HANDS, status=Order.Status.PENDING, amount=amount)
+            for _, user_id, amount in winners
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, book_id=products[auction_id], price=amount, quantity=1)
+            for order, (auction_id, _, amount) in zip(orders, winners)
+        ])
+        if winners:
+            # Аукцион — на один экземпляр; несколько лотов одной книги списываются вместе
+            sold = [products[auction_id] for auction_id, _, _ in winners]
+            cursor.execute(LOCK_BOOKS_SQL.format(book=_table(Book)), [sold])
+            cursor.execute(STOCK_SQL.format(book=_table(Book), sold=SOLD), [sold])
+
+        # bulk-операции и UPDATE не вызывают сигналы — кэш и события вручную
+        bump("auctions", "books", *{f"orders:user:{user_id}" for _, user_id, _ in winners})
+        events.publish_many(
+            (events.AUCTION_CLOSED, auction_id, {"status": CLOSED, "current_bid": current_bid})
+            for auction_id, _, current_bid in closed
+        )
+        if settings.AUCTION_HOT_STATE:
+            transaction.on_commit(lambda: hotstate.close(list(products)))
+    return len(closed)
+
+
+def settle_auctions(ids=None, now=None, batch_size=BATCH_SIZE, shard=0, shards=1):
+    """
+    Закрывает просроченные аукционы (все, только из ids или только шарда
+    shard из shards) пачками по batch_size. Возвращает число закрытых.
+    """
+    now = now or timezone.now()
+    if settings.AUCTION_HOT_STATE:
+        # Ставки из Redis должны попасть в базу до выбора победителей
+        hotstate.drain()
+    total = 0
+    while True:
+        closed = settle_batch(now, ids, batch_size, shard, shards)
+        total += closed
+        if closed < batch_size:
+            return total
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from backend.cache import bump
+from . import events, hotstate
+from .models import Auction, Bid
+from .schedule import schedule_transitions
+
+
+@receiver(post_save, sender=Auction)
+@receiver(post_delete, sender=Auction)
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def invalidate_auctions_cache(sender, **kwargs):
+    bump("auctions")
+
+
+
+# --- События для подписчиков и ETA-задачи: переходы, сделанные через save() ---
+
+def auction_state(instance):
+    # __dict__: отложенное поле (only/defer) не должно вызывать запрос
+    return tuple(instance.__dict__.get(name) for name in ("status", "start_time", "end_time"))
+
+
+@receiver(post_init, sender=Auction)
+def remember_auction_state(sender, instance, **kwargs):
+    instance._loaded_state = auction_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Auction)
+def auction_state_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded, instance._loaded_state = instance._loaded_state, auction_state(instance)
+    if created or loaded is None:
+        transaction.on_commit(lambda: schedule_transitions(instance))
+        return
+    status, start_time, end_time = loaded
+    if instance.status != status and instance.status == 2:
+        events.publish(events.AUCTION_STARTED, instance.pk, end_time=instance.end_time)
+    elif instance.status != status and instance.status in (3, 4):
+        events.publish(
+            events.AUCTION_CLOSED, instance.pk, status=instance.status, current_bid=instance.current_bid
+        )
+    elif end_time is not None and instance.end_time > end_time:
+        events.publish(events.AUCTION_EXTENDED, instance.pk, end_time=instance.end_time)
+    # Время или статус поменяли — старые задачи станут пустыми, ставим новые
+    if (instance.start_time, instance.end_time) != (start_time, end_time) or instance.status != status:
+        transaction.on_commit(lambda: schedule_transitions(instance))
+    if settings.AUCTION_HOT_STATE:
+        # Lua-скрипт ставок проверяет статус, время и шаг по хешу в Redis
+        transaction.on_commit(lambda: hotstate.sync(instance))
@@ -0,0 +1,131 @@
+"""
+Сводка по нескольким аукционам за постоянное число запросов:
+состояние аукциона, лидер, топ-K ставок и лучшая ставка пользователя.
+leaderboard — то же для одного аукциона без состояния, одним запросом.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Auction, Bid
+from .serializers import AuctionSerializer
+
+DEFAULT_TOP = 10
+MAX_TOP = 50
+MAX_IDS = 100
+
+# Порядок лидерства тот же, что у списка ставок аукциона
+BID_ORDER = [F("amount").desc(), F("created_at").asc(), F("id").asc()]
+
+# Топ-N и лучшая ставка пользователя с местом — одним запросом по индексу
+# (auction, -amount, created_at): место — число ставок впереди, а не нумерация всех ставок
+LEADERBOARD_SQL = """
+WITH top AS (
+    SELECT id, user_id, amount, created_at FROM {bid}
+    WHERE auction_id = %(auction)s
+    ORDER BY amount DESC, created_at, id LIMIT %(top)s
+), mine AS (
+    SELECT id, user_id, amount, created_at FROM {bid}
+    WHERE auction_id = %(auction)s AND user_id = %(user)s
+    ORDER BY amount DESC, created_at, id LIMIT 1
+)
+SELECT t.id, u.email, t.user_id, t.amount, t.created_at,
+       row_number() OVER (ORDER BY t.amount DESC, t.created_at, t.id), false
+FROM top t JOIN {user} u ON u.id = t.user_id
+UNION ALL
+SELECT m.id, u.email, m.user_id, m.amount, m.created_at, 1 + (
+    SELECT count(*) FROM {bid} b WHERE b.auction_id = %(auction)s AND b.amount > m.amount
+) + (
+    SELECT count(*) FROM {bid} b
+    WHERE b.auction_id = %(auction)s AND b.amount = m.amount AND (b.created_at, b.id) < (m.created_at, m.id)
+), true
+FROM mine m JOIN {user} u ON u.id = m.user_id
+"""
+
+
+def ranked_bids(auction_ids, user, top):
+    """
+    Одним запросом: первые top ставок каждого аукциона и лучшая ставка
+    пользователя, даже если она ниже top. rank — место ставки в аукционе.
+    """
+    bids = Bid.objects.filter(auction_id__in=auction_ids).annotate(
+        rank=Window(RowNumber(), partition_by=[F("auction_id")], order_by=BID_ORDER),
+        user_rank=Window(RowNumber(), partition_by=[F("auction_id"), F("user_id")], order_by=BID_ORDER),
+        bids_count=Window(Count("id"), partition_by=[F("auction_id")]),
+    )
+    condition = Q(rank__lte=top)
+    if user.is_authenticated:
+        condition |= Q(user_id=user.pk, user_rank=1)
+    return bids.filter(condition).select_related("user").order_by("auction_id", "rank")
+
+
+def serialize_bid(bid, user):
+    return {
+        "id": bid.id,
+        "user_email": bid.user.email,
+        "amount": str(bid.amount),
+        "created_at": bid.created_at,
+        "rank": bid.rank,
+        "is_mine": bid.user_id == user.pk,
+    }
+
+
+def leaderboard(auction_id, user, top=DEFAULT_TOP):
+    """Первые top ставок аукциона и лучшая ставка пользователя с её местом."""
+    sql = LEADERBOARD_SQL.format(
+        bid=connection.ops.quote_name(Bid._meta.db_table),
+        user=connection.ops.quote_name(get_user_model()._meta.db_table),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"auction": auction_id, "top": top, "user": user.pk})
+        rows = cursor.fetchall()
+    result = {"top_bids": [], "my_bid": None}
+    for bid_id, email, user_id, amount, created_at, rank, is_best_own in rows:
+        data = {
+            "id": bid_id,
+            "user_email": email,
+            "amount": str(amount),
+            "created_at": created_at,
+            "rank": rank,
+            "is_mine": user_id == user.pk,
+        }
+        if is_best_own:
+            result["my_bid"] = data
+        else:
+            result["top_bids"].append(data)
+    result["leader"] = result["top_bids"][0] if result["top_bids"] else None
+    return result
+
+
+def auction_snapshots(auctions, user, top=DEFAULT_TOP, context=None):
+    """auctions — queryset аукционов; возвращает список сводок в его порядке."""
+    auctions = list(auctions.select_related("product"))
+    by_auction = {auction.id: {"top_bids": [], "my_bid": None, "bids_count": 0} for auction in auctions}
+
+    for bid in ranked_bids(list(by_auction), user, top):
+        entry = by_auction[bid.auction_id]
+        data = serialize_bid(bid, user)
+        entry["bids_count"] = bid.bids_count
+        if bid.rank <= top:
+            entry["top_bids"].append(data)
+        if data["is_mine"] and bid.user_rank == 1:
+            entry["my_bid"] = data
+
+    serialized = AuctionSerializer(auctions, many=True, context=context or {}).data
+    result = []
+    for auction, auction_data in zip(auctions, serialized):
+        entry = by_auction[auction.id]
+        result.append({
+            "auction": auction_data,
+            "leader": entry["top_bids"][0] if entry["top_bids"] else None,
+            "my_bid": entry["my_bid"],
+            "top_bids": entry["top_bids"],
+            "bids_count": entry["bids_count"],
+        })
+    return result
+
+
+def user_auctions(user):
+    """Аукционы, в которых пользователь делал ставки."""
+    return Auction.objects.filter(id__in=Bid.objects.filter(user=user).values("auction_id"))
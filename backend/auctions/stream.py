@@ -0,0 +1,197 @@
+"""
+Push-канал событий аукционов (Server-Sent Events) для ASGI-сервера.
+
+backend/asgi.py отдаёт EVENTS_PATH этому приложению напрямую, минуя
+middleware Django: соединение живёт часами, и каждый синхронный слой на
+подключении стоил бы переключения в поток.
+
+На процесс одна подписка на канал Redis; пришедшее сообщение раскладывается
+по очередям подписчиков нужного аукциона и общей ленты. Ожидающий клиент —
+это только очередь и корутина, без потока и соединения с Redis, поэтому
+процесс держит тысячи простаивающих подписок.
+"""
+import asyncio
+import json
+import logging
+from urllib.parse import parse_qs
+
+import redis.asyncio as aioredis
+from django.conf import settings
+
+from .events import CHANNEL
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = "/auctions/events/"
+HEARTBEAT = 15  # секунд — комментарий, чтобы прокси не закрывали соединение
+QUEUE_SIZE = 100
+MAX_STREAM_IDS = 100
+RECONNECT_DELAY = 1
+RETRY_MS = 3000  # через сколько браузер переподключится сам
+
+
+class Broker:
+    """Раздаёт сообщения канала локальным подписчикам. Ключ None — все аукционы."""
+
+    def __init__(self, url=None, channel=CHANNEL):
+        self.url = url or settings.REDIS_URL
+        self.channel = channel
+        self.subscribers = {}
+        self.listener = None
+
+    def subscribe(self, auction_ids=None):
+        queue = asyncio.Queue(QUEUE_SIZE)
+        for key in auction_ids or [None]:
+            self.subscribers.setdefault(key, set()).add(queue)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.get_running_loop().create_task(self.listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        for key in list(self.subscribers):
+            self.subscribers[key].discard(queue)
+            if not self.subscribers[key]:
+                del self.subscribers[key]
+
+    @property
+    def count(self):
+        return len({queue for queues in self.subscribers.values() for queue in queues})
+
+    def dispatch(self, raw):
+        try:
+            auction_id = json.loads(raw)["auction"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Некорректное событие аукциона: %r", raw)
+            return
+        queues = self.subscribers.get(auction_id, set()) | self.subscribers.get(None, set())
+        for queue in queues:
+            try:
+                queue.put_nowait(raw)
+            except asyncio.QueueFull:
+                # Медленный клиент: закрываем поток, он переподключится и перечитает состояние
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def listen(self):
+        while self.subscribers:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    while self.subscribers:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT)
+                        if message is not None:
+                            self.dispatch(message["data"].decode())
+            except aioredis.RedisError:
+                logger.warning("Подписка на события аукционов прервана", exc_info=True)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = Broker()
+    return _broker
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def event_stream(auction_ids=None, broker=None):
+    """Асинхронный генератор SSE; при отключении клиента снимает подписку."""
+    broker = broker or get_broker()
+    queue = broker.subscribe(auction_ids)
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            try:
+                raw = await asyncio.wait_for(queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if raw is None:
+                return
+            yield sse(json.loads(raw)["event"], raw)
+    finally:
+        broker.unsubscribe(queue)
+
+
+def parse_ids(query_string):
+    """?ids=1,2 → [1, 2]; без ids — None (все аукционы)."""
+    raw = ",".join(parse_qs(query_string.decode()).get("ids", []))
+    try:
+        ids = sorted({int(part) for part in raw.split(",") if part.strip()})
+    except ValueError:
+        raise ValueError("Ожидается список id через запятую")
+    if len(ids) > MAX_STREAM_IDS:
+        raise ValueError(f"Не больше {MAX_STREAM_IDS} аукционов на поток")
+    return ids or None
+
+
+def cors_headers(scope):
+    origin = dict(scope["headers"]).get(b"origin", b"").decode()
+    if origin not in settings.CORS_ALLOWED_ORIGINS:
+        return []
+    return [(b"access-control-allow-origin", origin.encode()), (b"access-control-allow-credentials", b"true")]
+
+
+async def send_text(send, status, text):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+    await send({"type": "http.response.body", "body": text.encode()})
+
+
+async def sse_app(scope, receive, send, broker=None):
+    """
+    ASGI-приложение потока: ?ids=1,2 — только эти аукционы, без ids — все.
+    События: bid-placed, auction-started, auction-extended, auction-closed.
+    """
+    if scope["method"] != "GET":
+        await send_text(send, 405, "Только GET")
+        return
+    try:
+        ids = parse_ids(scope["query_string"])
+    except ValueError as e:
+        await send_text(send, 400, str(e))
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),  # nginx не должен копить поток
+            *cors_headers(scope),
+        ],
+    })
+
+    stream = event_stream(ids, broker)
+
+    async def pump():
+        async for chunk in stream:
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+    async def wait_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(wait_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await stream.aclose()
+    if not tasks[1].cancelled():
+        return  # клиент ушёл сам
+    await send({"type": "http.response.body", "body": b""})
@@ -1,48 +1,85 @@
+from datetime import datetime
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
+from . import hotstate
 from .models import Auction
-from orders.models import Order, OrderItem
+from .schedule import schedule_upcoming
+from .settlement import settle_auctions
+
+
+def _expected(value):
+    return datetime.fromisoformat(value)
+
+
+@shared_task(bind=True)
+def open_auction(self, auction_id, expected_start):
+    """
+    Открывает аукцион в start_time (ETA-задача). Повтор, устаревшая задача
+    после переноса времени или отмены ничего не делают.
+    """
+    expected = _expected(expected_start)
+    if expected > timezone.now():
+        # Сработала раньше срока — ставим заново на нужное время
+        # (в eager-режиме ждать нельзя: переход выполнит периодическая проверка)
+        if not self.request.is_eager:
+            open_auction.apply_async((auction_id, expected_start), eta=expected)
+        return
+    with transaction.atomic():
+        auction = Auction.objects.select_for_update().filter(pk=auction_id, status=1, start_time=expected).first()
+        if auction is None:
+            return
+        auction.status = 2  # Активен; auction-started публикует сигнал
+        auction.save(update_fields=['status'])
+
+
+@shared_task(bind=True)
+def close_auction(self, auction_id, expected_end):
+    """Закрывает аукцион в end_time (ETA-задача) и оформляет заказ победителю."""
+    expected = _expected(expected_end)
+    if expected > timezone.now():
+        if not self.request.is_eager:
+            close_auction.apply_async((auction_id, expected_end), eta=expected)
+        return
+    # Блокировка строки: ставка, пришедшая одновременно, дождётся закрытия и не пройдёт.
+    # Если окончание перенесли, end_time ещё впереди и задача ничего не сделает
+    settle_auctions(ids=[auction_id])
+
+
+@shared_task
+def settle_shard(shard, shards):
+    """Закрывает просроченные аукционы своего шарда; шарды можно раздать разным воркерам."""
+    return settle_auctions(shard=shard, shards=shards)
+
 
 @shared_task
 def update_auction_status():
+    """
+    Страховка к ETA-задачам (раз в 5 минут, см. CELERY_BEAT_SCHEDULE): доводит
+    просроченные переходы, если задача потерялась, и ставит задачи на ближайший
+    горизонт.
+    """
     now = timezone.now()
 
     # 1. Запланированные аукционы -> активные
-    Auction.objects.filter(status=1, start_time__lte=now).update(status=2)
+    for pk, start_time in Auction.objects.filter(status=1, start_time__lte=now).values_list('id', 'start_time'):
+        open_auction(pk, start_time.isoformat())
 
-    # 2. Активные аукционы -> завершённые
-    auctions_to_close = Auction.objects.filter(status=2, end_time__lte=now)
-    
-    for auction in auctions_to_close:
-        auction.status = 3  # Завершён
-        auction.save(update_fields=['status'])
+    # 2. Активные аукционы -> завершённые (пачками, с заказами победителям)
+    shards = settings.AUCTION_SETTLEMENT_SHARDS
+    if shards > 1:
+        for shard in range(shards):
+            settle_shard.delay(shard, shards)
+    else:
+        settle_auctions(now=now)
+
+    # 3. Переходы в пределах горизонта — ETA-задачами
+    schedule_upcoming(now)
 
-        # 3. Создаём заказ только если есть ставки
-        winning_bid = auction.bids.order_by('-amount', 'created_at').first()
-        if winning_bid:
-            user = winning_bid.user
-            book = auction.product
-            qty = 1  # обычно аукцион на 1 книгу
-
-            # Создаём заказ
-            order = Order.objects.create(
-                user=user,
-                payment=Order.Payment.HANDS,  # можно менять по логике
-                status=Order.Status.PENDING,
-                amount=winning_bid.amount
-            )
-
-            # Создаём элемент заказа
-            OrderItem.objects.create(
-                order=order,
-                book=book,
-                price=winning_bid.amount,
-                quantity=qty
-            )
-
-            # Уменьшаем количество книг
-            book.quantity -= qty
-            if book.quantity <= 0:
-                book.quantity = 0
-                book.status = 2  # Продано
-            book.save(update_fields=['quantity', 'status'])
\ No newline at end of file
+
+@shared_task
+def persist_hot_bids():
+    """Переносит ставки, принятые в Redis, в auctions_bid (горячий режим, раз в 2 секунды)."""
+    return hotstate.consume()
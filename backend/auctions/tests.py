@@ -1,7 +1,27 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from threading import Barrier
+from unittest import mock
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from .models import CustomUser
+from users.models import CustomUser
+from books.models import Book, Publisher
+from backend.redis_client import get_redis
+from . import events, hotstate
+from .bidding import BidRejected, place_bid
+from orders.models import Order, OrderItem
+from .models import Auction, Bid
+from .stream import Broker, sse_app
+from .settlement import settle_auctions
+from .tasks import close_auction, open_auction, update_auction_status
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
@@ -121,3 +141,561 @@ class UserTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIn("detail", response.data)
+
+
+class AuctionTestMixin:
+
+    def create_user(self, email):
+        return CustomUser.objects.create_user(
+            email=email, first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+
+    def create_auction(self, title="Лот", **extra):
+        publisher, _ = Publisher.objects.get_or_create(name="Азбука")
+        book = Book.objects.create(
+            title=title, year=1900, publisher=publisher, condition=1,
+            description="", price=1000, status=1, quantity=1,
+        )
+        now = timezone.now()
+        fields = dict(
+            product=book, starting_price=100, bid_step=10, status=2,
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        fields.update(extra)
+        return Auction.objects.create(**fields)
+
+
+class AuctionSnapshotTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.me = self.create_user("me@mail.ru")
+        self.other = self.create_user("other@mail.ru")
+        self.first = self.create_auction("Первый")
+        self.second = self.create_auction("Второй")
+        self.foreign = self.create_auction("Чужой")
+        for amount in (100, 120, 140):
+            Bid.objects.create(auction=self.first, user=self.other, amount=amount)
+        Bid.objects.create(auction=self.first, user=self.me, amount=110)
+        Bid.objects.create(auction=self.second, user=self.me, amount=200)
+        Bid.objects.create(auction=self.foreign, user=self.other, amount=300)
+        self.url = reverse("snapshot")
+
+    def test_mine(self):
+        """Без ids — все аукционы со ставками пользователя, за постоянное число запросов"""
+        self.client.force_authenticate(self.me)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"top": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        snapshots = {item["auction"]["id"]: item for item in response.data}
+        self.assertEqual(set(snapshots), {self.first.id, self.second.id})
+
+        first = snapshots[self.first.id]
+        self.assertEqual(first["bids_count"], 4)
+        self.assertEqual([bid["amount"] for bid in first["top_bids"]], ["140.00", "120.00"])
+        self.assertEqual(first["leader"]["user_email"], "other@mail.ru")
+        # Своя ставка ниже топа всё равно попадает в сводку вместе с местом
+        self.assertEqual(first["my_bid"]["amount"], "110.00")
+        self.assertEqual(first["my_bid"]["rank"], 3)
+
+        second = snapshots[self.second.id]
+        self.assertTrue(second["leader"]["is_mine"])
+        self.assertEqual(second["my_bid"]["rank"], 1)
+
+    def test_by_ids(self):
+        """Сводка по явному списку id доступна и без авторизации"""
+        response = self.client.get(self.url, {"ids": f"{self.foreign.id},{self.second.id}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(all(item["my_bid"] is None for item in response.data))
+
+    def test_mine_requires_auth(self):
+        """Без ids и без авторизации — 401"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_ids(self):
+        """Некорректный список id — 400"""
+        response = self.client.get(self.url, {"ids": "1,abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BidListTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.me = self.create_user("me@mail.ru")
+        self.other = self.create_user("other@mail.ru")
+        self.auction = self.create_auction()
+        for i in range(25):
+            Bid.objects.create(auction=self.auction, user=self.other, amount=100 + 10 * (i % 10))
+        Bid.objects.create(auction=self.auction, user=self.me, amount=150)
+
+    def collect(self, url):
+        bids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 10)
+            bids += response.data["results"]
+            url = response.data["next"]
+        return bids
+
+    def test_auction_bids_cursor(self):
+        """Ставки аукциона отдаются страницами в порядке лидерства без пропусков и повторов"""
+        bids = self.collect(f"/auctions/{self.auction.id}/bids/?page_size=10")
+        expected = list(
+            Bid.objects.filter(auction=self.auction).order_by("-amount", "created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual([bid["id"] for bid in bids], expected)
+
+    def test_user_history_cursor(self):
+        """История пользователя — только свои ставки, новые первыми"""
+        self.client.force_authenticate(self.other)
+        bids = self.collect("/auctions/bids/history/?page_size=10")
+        self.assertEqual(len(bids), 25)
+        self.assertEqual([bid["id"] for bid in bids], sorted((bid["id"] for bid in bids), reverse=True))
+
+    def test_leaderboard(self):
+        """Топ-N и место пользователя — одним запросом; при равной сумме выше более ранняя ставка"""
+        self.client.force_authenticate(self.me)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/auctions/{self.auction.id}/leaderboard/", {"top": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([bid["amount"] for bid in response.data["top_bids"]], ["190.00", "190.00", "180.00"])
+        self.assertEqual([bid["rank"] for bid in response.data["top_bids"]], [1, 2, 3])
+        # Впереди по две ставки 160..190 и две более ранние по 150
+        self.assertEqual(response.data["my_bid"]["amount"], "150.00")
+        self.assertEqual(response.data["my_bid"]["rank"], 11)
+        self.assertTrue(response.data["my_bid"]["is_mine"])
+
+        anonymous = APIClient().get(f"/auctions/{self.auction.id}/leaderboard/")
+        self.assertIsNone(anonymous.data["my_bid"])
+        self.assertEqual(anonymous.data["leader"]["amount"], "190.00")
+
+
+class BidPlacementTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user("bidder@mail.ru")
+        self.client.force_authenticate(self.user)
+        self.auction = self.create_auction()
+        self.url = reverse("bid-create")
+
+    def bid(self, amount, auction=None):
+        return self.client.post(self.url, {"auction": (auction or self.auction).id, "amount": amount})
+
+    def test_accepted(self):
+        """Принятая ставка обновляет current_bid"""
+        response = self.bid(100)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, 100)
+        self.assertEqual(self.bid(120).status_code, status.HTTP_201_CREATED)
+
+    def test_outbid_stale_read(self):
+        """Ставка по устаревшей цене отклоняется как outbid и не затирает большую"""
+        stale = Auction.objects.get(pk=self.auction.pk)
+        Auction.objects.filter(pk=self.auction.pk).update(current_bid=500)
+        with self.assertRaises(BidRejected) as ctx:
+            place_bid(stale, self.user, 200)
+        self.assertEqual(ctx.exception.code, "outbid")
+        self.assertIn("510", ctx.exception.message)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, 500)
+        self.assertFalse(Bid.objects.exists())
+
+    def test_low_bid(self):
+        """Ставка ниже минимальной — 400 в non_field_errors"""
+        self.bid(100)
+        response = self.bid(105)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("110", response.data["non_field_errors"][0])
+
+    def test_finished_auction(self):
+        """На завершившийся аукцион ставку не принять"""
+        finished = self.create_auction("Прошедший", end_time=timezone.now() - timedelta(minutes=1))
+        with self.assertRaises(BidRejected) as ctx:
+            place_bid(finished, self.user, 100)
+        self.assertEqual(ctx.exception.code, "inactive")
+        self.assertEqual(self.bid(100, finished).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BidConcurrencyTests(AuctionTestMixin, TransactionTestCase):
+    BIDDERS = 8
+
+    def test_single_winner_per_price(self):
+        """Из одновременных ставок одной суммы проходит одна, current_bid — максимум"""
+        auction = self.create_auction()
+        users = [self.create_user(f"bidder{i}@mail.ru") for i in range(self.BIDDERS)]
+        barrier = Barrier(self.BIDDERS)
+
+        def bid(args):
+            user, amount = args
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                return client.post("/auctions/bids/", {"auction": auction.id, "amount": amount}).status_code
+            finally:
+                connection.close()
+
+        # Половина ставит 100, половина — 150: порядок решает, пройдёт ли одна или две
+        amounts = [100 if i % 2 else 150 for i in range(self.BIDDERS)]
+        with ThreadPoolExecutor(self.BIDDERS) as pool:
+            codes = list(pool.map(bid, zip(users, amounts)))
+
+        accepted = list(Bid.objects.filter(auction=auction).order_by("id").values_list("amount", flat=True))
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), len(accepted))
+        self.assertIn(accepted, ([150], [100, 150]))
+        auction.refresh_from_db()
+        self.assertEqual(auction.current_bid, 150)
+
+
+class AuctionEventsTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user("bidder@mail.ru")
+        self.auction = self.create_auction()
+
+    def published(self, action):
+        """События, отправленные в Redis после фиксации транзакции"""
+        with mock.patch.object(events, "_send") as send, \
+                mock.patch.object(open_auction, "apply_async"), mock.patch.object(close_auction, "apply_async"):
+            with self.captureOnCommitCallbacks(execute=True):
+                action()
+        return [json.loads(message) for call in send.call_args_list for message in call.args]
+
+    def test_bid_placed(self):
+        """Принятая ставка публикуется, отклонённая — нет"""
+        sent = self.published(lambda: place_bid(self.auction, self.user, Decimal("100.00")))
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0]["event"], events.BID_PLACED)
+        self.assertEqual((sent[0]["auction"], sent[0]["amount"]), (self.auction.id, "100.00"))
+        self.assertEqual(sent[0]["user_email"], "bidder@mail.ru")
+
+        def rejected():
+            with self.assertRaises(BidRejected):
+                place_bid(self.auction, self.user, 100)
+        self.assertEqual(self.published(rejected), [])
+
+    def test_extended_and_closed(self):
+        """Перенос окончания и закрытие задачей дают auction-extended и auction-closed"""
+        def extend():
+            self.auction.end_time += timedelta(minutes=5)
+            self.auction.save()
+        self.assertEqual([e["event"] for e in self.published(extend)], [events.AUCTION_EXTENDED])
+
+        Auction.objects.filter(pk=self.auction.pk).update(end_time=timezone.now() - timedelta(seconds=1))
+        sent = self.published(update_auction_status)
+        self.assertEqual([(e["event"], e["status"]) for e in sent], [(events.AUCTION_CLOSED, 3)])
+
+    def test_started(self):
+        """Запуск запланированного аукциона задачей (через update) тоже публикуется"""
+        planned = self.create_auction("Будущий", status=1)
+        sent = self.published(update_auction_status)
+        self.assertEqual([(e["event"], e["auction"]) for e in sent], [(events.AUCTION_STARTED, planned.id)])
+
+
+class AuctionStreamTests(SimpleTestCase):
+    CHANNEL = "auctions:events:test"
+
+    async def open_stream(self, query):
+        """Запускает sse_app и ждёт первый кусок потока (подписка оформлена)"""
+        self.broker = Broker(channel=self.CHANNEL)
+        self.chunks = asyncio.Queue()
+        self.disconnect = asyncio.Event()
+
+        async def receive():
+            await self.disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            await self.chunks.put(message)
+
+        scope = {"type": "http", "method": "GET", "path": "/auctions/events/",
+                 "query_string": query, "headers": []}
+        self.app = asyncio.create_task(sse_app(scope, receive, send, broker=self.broker))
+        start = await self.chunks.get()
+        if start["status"] == 200:
+            await self.chunks.get()  # retry:
+        return start
+
+    async def next_event(self):
+        # Подписка в Redis оформляется в фоне — публикуем, пока не дойдёт
+        for _ in range(50):
+            await asyncio.to_thread(get_redis().publish, self.CHANNEL, json.dumps(
+                {"event": "bid-placed", "auction": 1, "amount": "100.00"}
+            ))
+            try:
+                return (await asyncio.wait_for(self.chunks.get(), 0.1))["body"].decode()
+            except asyncio.TimeoutError:
+                continue
+
+    async def test_stream(self):
+        """Событие аукциона доходит до подписчика, чужое — нет; отключение снимает подписку"""
+        start = await self.open_stream(b"ids=1")
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream; charset=utf-8"), start["headers"])
+        body = await self.next_event()
+        self.assertTrue(body.startswith("event: bid-placed\ndata: "))
+
+        self.broker.dispatch(json.dumps({"event": "bid-placed", "auction": 2}))
+        self.assertTrue(self.chunks.empty())
+
+        self.disconnect.set()
+        await self.app
+        self.assertEqual(self.broker.count, 0)
+        self.broker.listener.cancel()
+
+    async def test_invalid_ids(self):
+        """Некорректный список id — 400"""
+        start = await self.open_stream(b"ids=1,abc")
+        self.assertEqual(start["status"], 400)
+        await self.app
+
+
+class AuctionScheduleTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(close_auction, "apply_async")
+        self.close_async = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(open_auction, "apply_async")
+        self.open_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scheduled(self, task_async):
+        return [(call.args[0], call.kwargs["eta"]) for call in task_async.call_args_list]
+
+    def test_schedule_on_create_and_edit(self):
+        """ETA-задача ставится при создании и заново при переносе; дальние — не ставятся"""
+        soon = timezone.now() + timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            auction = self.create_auction(end_time=soon)
+            self.create_auction("Дальний", end_time=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.scheduled(self.close_async), [((auction.pk, soon.isoformat()), soon)])
+
+        later = soon + timedelta(minutes=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            auction.end_time = later
+            auction.save()
+        self.assertEqual(self.scheduled(self.close_async)[-1], ((auction.pk, later.isoformat()), later))
+
+    def test_open_and_close(self):
+        """Задачи открывают и закрывают аукцион; повтор и устаревшая задача ничего не делают"""
+        start = timezone.now() - timedelta(seconds=1)
+        auction = self.create_auction(status=1, start_time=start)
+        open_auction(auction.pk, (start - timedelta(minutes=1)).isoformat())  # до переноса старта
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, 1)
+        open_auction(auction.pk, start.isoformat())
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, 2)
+
+        Bid.objects.create(auction=auction, user=self.create_user("winner@mail.ru"), amount=150)
+        end = timezone.now() - timedelta(seconds=1)
+        Auction.objects.filter(pk=auction.pk).update(end_time=end)
+        close_auction(auction.pk, end.isoformat())
+        close_auction(auction.pk, end.isoformat())
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, 3)
+        self.assertEqual(Order.objects.filter(user__email="winner@mail.ru").count(), 1)
+
+    def test_early_fire(self):
+        """Задача, сработавшая раньше срока, переставляется на нужное время"""
+        auction = self.create_auction()
+        close_auction(auction.pk, auction.end_time.isoformat())
+        auction.refresh_from_db()
+        self.assertEqual(auction.status, 2)
+        self.assertEqual(self.scheduled(self.close_async), [((auction.pk, auction.end_time.isoformat()), auction.end_time)])
+
+    def test_sweep(self):
+        """Проверка закрывает просроченные и ставит задачи на ближайшие переходы"""
+        overdue = self.create_auction("Просроченный", end_time=timezone.now() - timedelta(minutes=1))
+        soon = self.create_auction("Скоро", status=1, start_time=timezone.now() + timedelta(minutes=10))
+        update_auction_status()
+        overdue.refresh_from_db()
+        self.assertEqual(overdue.status, 3)
+        self.assertEqual([args[0] for args, _ in self.scheduled(self.open_async)], [soon.pk])
+
+
+class SettlementTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.first = self.create_user("first@mail.ru")
+        self.second = self.create_user("second@mail.ru")
+
+    def ended(self, title, book=None):
+        auction = self.create_auction(title, **({"product": book} if book else {}))
+        Auction.objects.filter(pk=auction.pk).update(end_time=timezone.now() - timedelta(seconds=1))
+        return auction
+
+    def test_settle(self):
+        """Победитель — наибольшая и более ранняя ставка; остаток книги списывается"""
+        lot = self.ended("Лот")
+        Bid.objects.create(auction=lot, user=self.first, amount=200)
+        Bid.objects.create(auction=lot, user=self.second, amount=200)
+        empty = self.ended("Без ставок")
+        running = self.create_auction("Идёт")
+        Bid.objects.create(auction=running, user=self.first, amount=300)
+
+        with mock.patch.object(events, "_send"):
+            self.assertEqual(settle_auctions(), 2)
+
+        statuses = dict(Auction.objects.values_list("id", "status"))
+        self.assertEqual((statuses[lot.id], statuses[empty.id], statuses[running.id]), (3, 3, 2))
+        order = Order.objects.get()
+        self.assertEqual((order.user, order.amount, order.status), (self.first, 200, Order.Status.PENDING))
+        self.assertEqual(order.items.get().book, lot.product)
+        lot.product.refresh_from_db()
+        self.assertEqual((lot.product.quantity, lot.product.status), (0, 2))
+        # Повторный запуск ничего не делает
+        self.assertEqual(settle_auctions(), 0)
+
+    def test_same_book(self):
+        """Два лота одной книги списываются одним UPDATE, не уходя в минус"""
+        first = self.ended("Книга")
+        second = self.ended("Книга", book=first.product)
+        Bid.objects.create(auction=first, user=self.first, amount=150)
+        Bid.objects.create(auction=second, user=self.second, amount=160)
+        settle_auctions()
+        first.product.refresh_from_db()
+        self.assertEqual((first.product.quantity, first.product.status), (0, 2))
+        self.assertEqual(OrderItem.objects.filter(book=first.product).count(), 2)
+
+    def test_constant_queries(self):
+        """Число запросов не зависит от числа закрываемых аукционов"""
+        def settle(count):
+            for i in range(count):
+                auction = self.ended(f"Лот {i}")
+                Bid.objects.create(auction=auction, user=self.first, amount=100 + i)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(settle_auctions(), count)
+            return len(queries)
+        self.assertEqual(settle(2), settle(6))
+
+    def test_shard(self):
+        """Шард закрывает только свои id"""
+        auctions = [self.ended(f"Лот {i}") for i in range(4)]
+        self.assertEqual(settle_auctions(shard=0, shards=2), 2)
+        closed = set(Auction.objects.filter(status=3).values_list("id", flat=True))
+        self.assertEqual(closed, {a.id for a in auctions if a.id % 2 == 0})
+
+
+class SettlementConcurrencyTests(AuctionTestMixin, TransactionTestCase):
+    WORKERS = 4
+    AUCTIONS = 24
+
+    def test_parallel_sweeps(self):
+        """Перекрывающиеся запуски делят аукционы и не создают лишних заказов"""
+        winner = self.create_user("winner@mail.ru")
+        book = self.create_auction("Общая книга").product
+        Book.objects.filter(pk=book.pk).update(quantity=self.AUCTIONS)
+        for i in range(self.AUCTIONS):
+            auction = self.create_auction(f"Лот {i}", product=book)
+            Bid.objects.create(auction=auction, user=winner, amount=100 + i)
+        Auction.objects.update(end_time=timezone.now() - timedelta(seconds=1))
+        barrier = Barrier(self.WORKERS)
+
+        def sweep(_):
+            try:
+                barrier.wait()
+                return settle_auctions(batch_size=3)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            closed = list(pool.map(sweep, range(self.WORKERS)))
+
+        self.assertEqual(sum(closed), self.AUCTIONS + 1)
+        self.assertEqual(Order.objects.count(), self.AUCTIONS)
+        book.refresh_from_db()
+        self.assertEqual((book.quantity, book.status), (0, 2))
+
+
+
+@override_settings(AUCTION_HOT_STATE=True)
+class HotStateTests(AuctionTestMixin, APITestCase):
+
+    def setUp(self):
+        self.first = self.create_user("first@mail.ru")
+        self.second = self.create_user("second@mail.ru")
+        self.auction = self.create_auction()
+        self.redis = get_redis()
+        self.redis.delete(hotstate.STREAM)
+        self.addCleanup(self.redis.delete, hotstate.STREAM, hotstate.STATE_KEY.format(self.auction.pk))
+
+    def bid(self, user, amount):
+        self.client.force_authenticate(user)
+        return self.client.post(reverse("bid-create"), {"auction": self.auction.id, "amount": amount})
+
+    def test_write_behind(self):
+        """Ставка принимается в Redis, цена сразу видна в API, а в базу ставка попадает обработчиком"""
+        Bid.objects.create(auction=self.auction, user=self.first, amount=100)
+        Auction.objects.filter(pk=self.auction.pk).update(current_bid=100)
+
+        response = self.bid(self.second, 110)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data["id"])
+        self.assertEqual(Bid.objects.count(), 1)
+        detail = self.client.get(f"/auctions/{self.auction.id}/")
+        self.assertEqual(detail.data["current_bid"], "110.00")
+        listing = self.client.get("/auctions/history/")
+        self.assertEqual(listing.data[0]["current_bid"], "110.00")
+
+        low = self.bid(self.first, 115)
+        self.assertEqual(low.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("120", low.data["non_field_errors"][0])
+
+        entries = self.redis.xrange(hotstate.STREAM)
+        bids_url = f"/auctions/{self.auction.id}/bids/"
+        etag = self.client.get(bids_url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(hotstate.consume(), 1)
+        # Ставка дошла до базы — закэшированный клиентом список устарел
+        response = self.client.get(bids_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+        # Повторная доставка той же записи не создаёт дубль
+        self.assertEqual(hotstate.persist(entries), 0)
+        bid = Bid.objects.get(stream_id__isnull=False)
+        self.assertEqual((bid.user, bid.amount), (self.second, 110))
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.current_bid, 110)
+        self.assertEqual(hotstate.reconcile([self.auction.pk]), [])
+
+    def test_settle_and_reconcile(self):
+        """Закрытие дочитывает поток, выбирает победителя из Redis-ставок и сверяется с базой"""
+        hotstate.place_bid(self.auction, self.first, Decimal("100"))
+        hotstate.place_bid(self.auction, self.second, Decimal("150"))
+        Auction.objects.filter(pk=self.auction.pk).update(end_time=timezone.now() - timedelta(seconds=1))
+
+        with mock.patch.object(events, "_send"), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(settle_auctions(), 1)
+
+        order = Order.objects.get()
+        self.assertEqual((order.user, order.amount), (self.second, 150))
+        self.assertEqual(hotstate.reconcile([self.auction.pk]), [])
+        # Закрытый аукцион не принимает ставки и в Redis
+        with self.assertRaises(BidRejected) as ctx:
+            hotstate.place_bid(self.auction, self.first, Decimal("500"))
+        self.assertEqual(ctx.exception.code, "inactive")
+
+        self.redis.hset(hotstate.STATE_KEY.format(self.auction.pk), "count", 5)
+        self.assertEqual(hotstate.reconcile([self.auction.pk]), [(self.auction.pk, "bids_count", 5, 2)])
+
+    def test_reconcile_many(self):
+        """Сверка нескольких аукционов — постоянное число запросов, лидер у каждого свой"""
+        other = self.create_auction(title="Второй лот")
+        self.addCleanup(self.redis.delete, hotstate.STATE_KEY.format(other.pk))
+        hotstate.place_bid(self.auction, self.first, Decimal("100"))
+        hotstate.place_bid(other, self.first, Decimal("100"))
+        hotstate.place_bid(other, self.second, Decimal("120"))
+        hotstate.drain()
+
+        with self.assertNumQueries(2):
+            self.assertEqual(hotstate.reconcile([self.auction.pk, other.pk]), [])
+        self.redis.hset(hotstate.STATE_KEY.format(other.pk), "leader_email", "first@mail.ru")
+        self.assertEqual(
+            hotstate.reconcile([self.auction.pk, other.pk]),
+            [(other.pk, "leader_email", "first@mail.ru", "second@mail.ru")],
+        )
@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import AuctionListView, AuctionDetailView, BidCreateView, UserBidListView, AuctionBidListView
+from .views import (
+    AuctionListView, AuctionDetailView, BidCreateView, UserBidListView, AuctionBidListView,
+    AuctionLeaderboardView, AuctionSnapshotView,
+)
 
 urlpatterns = [
     path('history/', AuctionListView.as_view(), name='list'),
@@ -7,4 +10,6 @@ urlpatterns = [
     path('bids/', BidCreateView.as_view(), name='bid-create'),
     path('bids/history/', UserBidListView.as_view(), name='bid-history'),
     path('<int:auction_id>/bids/', AuctionBidListView.as_view(), name='auction-bids'), 
+    path('<int:auction_id>/leaderboard/', AuctionLeaderboardView.as_view(), name='auction-leaderboard'),
+    path('snapshot/', AuctionSnapshotView.as_view(), name='snapshot'),
 ]
\ No newline at end of file
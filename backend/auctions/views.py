@@ -1,22 +1,50 @@
 from rest_framework import generics, permissions
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from rest_framework.response import Response
+from backend.cache import CachedResponseMixin
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import KeysetPagination
 from .models import Auction, Bid
 from .serializers import AuctionSerializer, BidSerializer
+from .snapshots import DEFAULT_TOP, MAX_IDS, MAX_TOP, auction_snapshots, leaderboard, user_auctions
 
 
-class AuctionListView(generics.ListAPIView):
+class BidPagination(KeysetPagination):
+    """Курсор по сортировке представления (cursor_ordering); ?total=estimate — число ставок."""
+    page_size = 20
+    max_page_size = 100
+
+
+def parse_top(request):
+    try:
+        top = int(request.query_params.get("top", DEFAULT_TOP))
+    except ValueError:
+        raise ValidationError({"top": "Ожидается число"})
+    return min(max(top, 1), MAX_TOP)
+
+
+class AuctionListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
     """
     Список всех аукционов
     """
     queryset = Auction.objects.all().prefetch_related('product')
+    cache_namespaces = ("auctions",)
+    # is_active_now зависит от времени — держим копию недолго
+    cache_timeout = 30
+    cache_fresh_timeout = 10
     serializer_class = AuctionSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class AuctionDetailView(generics.RetrieveAPIView):
+class AuctionDetailView(ConditionalGetMixin, CachedResponseMixin, generics.RetrieveAPIView):
     """
     Подробная информация по аукциону
     """
     queryset = Auction.objects.all().prefetch_related('product')
+    cache_namespaces = ("auctions",)
+    # is_active_now зависит от времени — держим копию недолго
+    cache_timeout = 30
+    cache_fresh_timeout = 10
     serializer_class = AuctionSerializer
     permission_classes = [permissions.AllowAny]
 
@@ -27,6 +55,9 @@ class BidCreateView(generics.CreateAPIView):
     """
     serializer_class = BidSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_cost = 2
+    # Высший приоритет: ставки не ждут мест (backend/concurrency.py)
+    concurrency_class = "bidding"
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -34,24 +65,71 @@ class BidCreateView(generics.CreateAPIView):
         return context
 
 
-class UserBidListView(generics.ListAPIView):
+class UserBidListView(ConditionalGetMixin, generics.ListAPIView):
     """
-    История ставок пользователя
+    История ставок пользователя (новые первыми, страницами по курсору)
     """
+    etag_namespaces = ("auctions",)
     serializer_class = BidSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = BidPagination
+    cursor_ordering = ('-created_at',)
 
     def get_queryset(self):
         return Bid.objects.filter(user=self.request.user).select_related('auction', 'auction__product')
 
 
-class AuctionBidListView(generics.ListAPIView):
+class AuctionBidListView(ConditionalGetMixin, generics.ListAPIView):
     """
-    Список ставок для конкретного аукциона
+    Список ставок для конкретного аукциона (лидер первым, страницами по курсору)
     """
+    etag_namespaces = ("auctions",)
     serializer_class = BidSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = BidPagination
+    cursor_ordering = ('-amount', 'created_at')
 
     def get_queryset(self):
         auction_id = self.kwargs['auction_id']
-        return Bid.objects.filter(auction_id=auction_id).select_related('user').order_by('-amount', 'created_at')
\ No newline at end of file
+        return Bid.objects.filter(auction_id=auction_id).select_related('user', 'auction', 'auction__product')
+
+
+class AuctionLeaderboardView(ConditionalGetMixin, generics.GenericAPIView):
+    """
+    Лидеры аукциона: ?top= первых ставок и лучшая ставка пользователя с местом
+    """
+    etag_namespaces = ("auctions",)
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, auction_id, *args, **kwargs):
+        return Response(leaderboard(auction_id, request.user, parse_top(request)))
+
+
+class AuctionSnapshotView(ConditionalGetMixin, generics.GenericAPIView):
+    """
+    Сводка по нескольким аукционам: ?ids=1,2,3 или (без ids) все аукционы,
+    где пользователь делал ставки. ?top= — сколько лучших ставок вернуть.
+    """
+    etag_namespaces = ("auctions",)
+    permission_classes = [permissions.AllowAny]
+
+    def parse_ids(self):
+        raw = ",".join(self.request.query_params.getlist("ids"))
+        try:
+            ids = sorted({int(part) for part in raw.split(",") if part.strip()})
+        except ValueError:
+            raise ValidationError({"ids": "Ожидается список id через запятую"})
+        if len(ids) > MAX_IDS:
+            raise ValidationError({"ids": f"Не больше {MAX_IDS} аукционов за запрос"})
+        return ids
+
+    def get(self, request, *args, **kwargs):
+        ids = self.parse_ids()
+        top = parse_top(request)
+        if ids:
+            auctions = Auction.objects.filter(id__in=ids)
+        elif request.user.is_authenticated:
+            auctions = user_auctions(request.user)
+        else:
+            raise NotAuthenticated()
+        return Response(auction_snapshots(auctions, request.user, top, self.get_serializer_context()))
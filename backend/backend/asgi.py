@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модулю нужны settings
+from auctions.stream import EVENTS_PATH, sse_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Поток событий аукционов обслуживается без middleware Django (см. auctions/stream.py)
+    if scope["type"] == "http" and scope["path"] == EVENTS_PATH:
+        await sse_app(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,203 @@
+"""
+Кэш ответов публичных эндпоинтов.
+
+Ключ = имя представления + версии пространств имён + нормализованная строка запроса.
+Запись в модели увеличивает версию пространства (bump), и старые ключи просто
+перестают читаться (истекают по TTL). Пересчёт после промаха выполняет один
+процесс (single-flight через cache.add), остальные ждут или отдают устаревшую копию.
+"""
+import hashlib
+import json
+import logging
+import time
+import uuid
+from urllib.parse import urlencode
+
+import redis
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from . import metrics
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "cachever:{}"
+MODIFIED_KEY = "cachets:{}"
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+# Параметры, не влияющие на набор книг
+NON_FILTER_PARAMS = {"page", "page_size", "ordering", "cursor", "pagination", "total", "format"}
+
+
+def _initial_version():
+    # После сброса Redis версия не должна совпасть со старой — начинаем от времени
+    return int(time.time() * 1000)
+
+
+def get_versions(namespaces):
+    keys = [VERSION_KEY.format(ns) for ns in namespaces]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def get_last_modified(namespaces):
+    """Время последней записи (unix-время) по пространствам или None."""
+    stamps = cache.get_many([MODIFIED_KEY.format(ns) for ns in namespaces])
+    return max(stamps.values()) if stamps else None
+
+
+def _bump(namespaces):
+    # Одним конвейером: пачка может менять сотни пространств (например,
+    # истории заказов всех победителей аукционов). Ключи — как у django cache:
+    # целые числа RedisCache хранит как есть, поэтому cache.get их прочитает
+    now = int(time.time())
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for ns in namespaces:
+            key = cache.make_key(VERSION_KEY.format(ns))
+            pipe.set(key, _initial_version(), nx=True)
+            pipe.incr(key)
+            pipe.set(cache.make_key(MODIFIED_KEY.format(ns)), now)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Не удалось сменить версии кэша %s", ", ".join(namespaces), exc_info=True)
+
+
+def bump(*namespaces):
+    """
+    Инвалидирует пространства имён. Версия меняется сразу и ещё раз после
+    коммита: иначе параллельный читатель мог бы закэшировать данные
+    до коммита под уже новой версией.
+    """
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def normalized_query(params, ignore=()):
+    """Строка запроса с отсортированными ключами и значениями."""
+    items = []
+    for key in sorted(params.keys()):
+        if key in ignore:
+            continue
+        for value in sorted(params.getlist(key)):
+            items.append((key, value))
+    return urlencode(items)
+
+
+def fingerprint(params):
+    """Нормализованный отпечаток фильтров: порядок параметров и значений не важен."""
+    normalized = {}
+    for key in sorted(params.keys()):
+        if key in NON_FILTER_PARAMS:
+            continue
+        values = sorted(
+            v.strip() for value in params.getlist(key) for v in value.split(",") if v.strip()
+        )
+        if values:
+            normalized[key] = values
+    return hashlib.sha1(json.dumps(normalized, ensure_ascii=False).encode()).hexdigest()
+
+
+def make_key(prefix, namespaces, query):
+    versions = ".".join(str(v) for v in get_versions(namespaces))
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    return f"{prefix}:{versions}:{digest}"
+
+
+def get_or_compute(key, compute, timeout, fresh_timeout, metric_name):
+    """
+    Значение из кэша или compute(). compute может вернуть None — тогда ничего
+    не кэшируется. Возвращает (значение, источник: 'hit' | 'stale' | 'miss').
+
+    В кэше лежит (значение, свежо_до). После fresh_timeout один процесс
+    пересчитывает значение заранее, остальные продолжают отдавать старое.
+    """
+    lock_key = key + ":lock"
+    # Блокировку снимает только тот, кто её взял: ожидающий, не дождавшийся
+    # значения, считает сам, но чужую блокировку не трогает
+    token = uuid.uuid4().hex
+    acquired = False
+    try:
+        entry = cache.get(key)
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() < fresh_until or not cache.add(lock_key, token, LOCK_TIMEOUT):
+                metrics.incr("response_cache_total", {"view": metric_name, "result": "hit"})
+                return value, "hit"
+            acquired = True
+            source = "stale"
+        else:
+            acquired = cache.add(lock_key, token, LOCK_TIMEOUT)
+            if not acquired:
+                deadline = time.time() + LOCK_WAIT
+                while time.time() < deadline:
+                    time.sleep(LOCK_POLL)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        metrics.incr("response_cache_total", {"view": metric_name, "result": "hit"})
+                        return entry[0], "hit"
+            source = "miss"
+    except redis.RedisError:
+        logger.warning("Кэш недоступен, считаем без него", exc_info=True)
+        return compute(), "miss"
+
+    metrics.incr("response_cache_total", {"view": metric_name, "result": source})
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, (value, time.time() + fresh_timeout), timeout)
+    finally:
+        # Если расчёт шёл дольше LOCK_TIMEOUT, блокировка уже может быть чужой
+        try:
+            if acquired and cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except redis.RedisError:
+            pass
+    return value, source
+
+
+class CachedResponseMixin:
+    """
+    Кэширует GET-ответы представлений с AllowAny: результат не зависит от пользователя.
+    cache_namespaces — пространства, запись в которые делает ответ устаревшим.
+    """
+    cache_namespaces = ()
+    cache_timeout = 600
+    cache_fresh_timeout = 60
+
+    def get_cache_prefix(self):
+        return "resp:" + self.__class__.__name__
+
+    def get_cache_key(self, request):
+        query = request.path + "?" + normalized_query(request.query_params)
+        return make_key(self.get_cache_prefix(), self.cache_namespaces, query)
+
+    def get(self, request, *args, **kwargs):
+        computed = {}
+
+        def compute():
+            response = super(CachedResponseMixin, self).get(request, *args, **kwargs)
+            computed["response"] = response
+            if response.status_code != 200:
+                return None
+            return response.data
+
+        try:
+            key = self.get_cache_key(request)
+        except redis.RedisError:
+            logger.warning("Кэш недоступен, считаем без него", exc_info=True)
+            return super().get(request, *args, **kwargs)
+
+        data, source = get_or_compute(
+            key, compute, self.cache_timeout, self.cache_fresh_timeout, self.__class__.__name__
+        )
+        response = computed.get("response") or Response(data)
+        response["X-Cache"] = source.upper()
+        return response
@@ -0,0 +1,216 @@
+"""
+Ограничение одновременных запросов по классам приоритета.
+
+Каждое представление относится к классу (атрибут concurrency_class, по
+умолчанию CONCURRENCY_DEFAULT_CLASS): bidding > checkout > catalog > reports.
+Для класса в CONCURRENCY_CLASSES заданы:
+  local  — сколько его запросов одновременно выполняет один процесс;
+  fleet  — сколько во всех процессах (семафор в Redis, 0 — без ограничения);
+  budget — сколько секунд запрос может ждать места.
+Не дождался — 503 с Retry-After: отчёты и админка уступают потоки ставкам,
+а не стоят в очереди вместе с ними. Класс без ограничений (ставки)
+проходит без ожидания.
+
+Место освобождается, когда представление вернуло ответ: потоковая выгрузка
+отдаёт данные уже без него. Пока запрос выполняется, фоновый поток продлевает
+аренду его места в Redis (CONCURRENCY_LEASE), поэтому долгий отчёт не теряет
+место; аренда истекает, только если процесс перестал её продлевать (упал).
+
+Время ожидания пишется в гистограмму concurrency_queue_seconds, отказы —
+в concurrency_shed_total. Redis недоступен — действует только ограничение
+процесса.
+"""
+import logging
+import threading
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.http import JsonResponse
+
+from . import metrics
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+SLOTS_KEY = "concurrency:{}"
+POLL_INTERVAL = 0.02
+
+# KEYS[1] — занятые места (ZSET токен → время захвата); ARGV: лимит, аренда в мс, токен.
+# Место процесса, упавшего с захваченным местом, освобождается через аренду
+ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local lease = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - lease)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('PEXPIRE', KEYS[1], lease)
+return 1
+"""
+
+# KEYS[1] — занятые места; ARGV: аренда в мс, токены мест процесса. Освобождённые
+# за это время места (их уже нет в ZSET) не возвращаются — ZADD XX
+RENEW_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+for i = 2, #ARGV do
+    redis.call('ZADD', KEYS[1], 'XX', now, ARGV[i])
+end
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[1]))
+return 1
+"""
+
+_lock = threading.Lock()
+_limiters = {}
+_scripts = {}
+# Места этого процесса в Redis: имя класса → токены; их продлевает _renew_loop
+_held = {}
+_renewer = None
+
+
+def _script(source):
+    if source not in _scripts:
+        _scripts[source] = get_redis().register_script(source)
+    return _scripts[source]
+
+
+def _acquire_script():
+    return _script(ACQUIRE_LUA)
+
+
+def renew_leases():
+    """Продлевает аренду всех мест, которые процесс держит в Redis."""
+    with _lock:
+        held = {name: list(tokens) for name, tokens in _held.items() if tokens}
+    lease = int(settings.CONCURRENCY_LEASE * 1000)
+    for name, tokens in held.items():
+        try:
+            _script(RENEW_LUA)(keys=[SLOTS_KEY.format(name)], args=[lease] + tokens)
+        except redis.RedisError:
+            logger.warning("Аренда мест класса %s в Redis не продлена", name, exc_info=True)
+
+
+def _renew_loop():
+    while True:
+        # Треть аренды: даже пропустив продление из-за сбоя Redis, место не теряем
+        time.sleep(settings.CONCURRENCY_LEASE / 3)
+        renew_leases()
+
+
+def _hold(name, token):
+    global _renewer
+    with _lock:
+        _held.setdefault(name, set()).add(token)
+        # После fork поток родителя не работает — запускаем свой
+        if _renewer is None or not _renewer.is_alive():
+            _renewer = threading.Thread(target=_renew_loop, name="concurrency-lease", daemon=True)
+            _renewer.start()
+
+
+def _unhold(name, token):
+    with _lock:
+        _held.get(name, set()).discard(token)
+
+
+class Slot:
+    """Занятое место; release() — по завершении запроса."""
+
+    def __init__(self, limiter, token=None):
+        self.limiter = limiter
+        self.token = token
+
+    def release(self):
+        if self.token is not None:
+            _unhold(self.limiter.name, self.token)
+            try:
+                get_redis().zrem(SLOTS_KEY.format(self.limiter.name), self.token)
+            except redis.RedisError:
+                logger.warning("Место класса %s в Redis не освобождено", self.limiter.name, exc_info=True)
+        if self.limiter.local is not None:
+            self.limiter.local.release()
+
+
+class Limiter:
+
+    def __init__(self, name, local=0, fleet=0, budget=0):
+        self.name = name
+        self.local = threading.BoundedSemaphore(local) if local else None
+        self.fleet = fleet
+        self.budget = budget
+
+    @property
+    def unlimited(self):
+        return self.local is None and not self.fleet
+
+    def acquire(self):
+        """Slot или None, если место не освободилось за budget секунд."""
+        deadline = time.monotonic() + self.budget
+        if self.local is not None and not self.local.acquire(timeout=self.budget):
+            return None
+        slot = Slot(self)
+        if not self.fleet:
+            return slot
+        token = uuid.uuid4().hex
+        lease = int(settings.CONCURRENCY_LEASE * 1000)
+        try:
+            while not _acquire_script()(keys=[SLOTS_KEY.format(self.name)], args=[self.fleet, lease, token]):
+                if time.monotonic() + POLL_INTERVAL > deadline:
+                    slot.release()
+                    return None
+                time.sleep(POLL_INTERVAL)
+        except redis.RedisError:
+            logger.warning("Семафор класса %s в Redis недоступен", self.name, exc_info=True)
+            return slot
+        slot.token = token
+        _hold(self.name, token)
+        return slot
+
+
+def get_limiter(name):
+    config = settings.CONCURRENCY_CLASSES[name]
+    key = (name, tuple(sorted(config.items())))
+    with _lock:
+        if key not in _limiters:
+            _limiters[key] = Limiter(name, **config)
+        return _limiters[key]
+
+
+def concurrency_class(view_func):
+    # APIView.as_view() задаёт view_class, ViewSet.as_view() — cls
+    view = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None)
+    return getattr(view, "concurrency_class", settings.CONCURRENCY_DEFAULT_CLASS)
+
+
+class ConcurrencyLimitMiddleware:
+    """Место занимается перед представлением и освобождается, когда ответ готов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.concurrency_slot = None
+        try:
+            return self.get_response(request)
+        finally:
+            if request.concurrency_slot is not None:
+                request.concurrency_slot.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = concurrency_class(view_func)
+        limiter = get_limiter(name)
+        if limiter.unlimited:
+            return None
+        started = time.monotonic()
+        slot = limiter.acquire()
+        metrics.observe("concurrency_queue_seconds", time.monotonic() - started, {"class": name})
+        if slot is None:
+            metrics.incr("concurrency_shed_total", {"class": name})
+            response = JsonResponse({"detail": "Сервер перегружен, повторите попытку позже"}, status=503)
+            response["Retry-After"] = str(settings.CONCURRENCY_RETRY_AFTER)
+            return response
+        request.concurrency_slot = slot
+        return None
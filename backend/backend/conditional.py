@@ -0,0 +1,65 @@
+"""
+Условные GET-запросы (ETag / Last-Modified / 304) для generic-представлений DRF.
+
+Валидаторы строятся из версий пространств имён кэша (см. backend.cache):
+тело ответа для них не сериализуется и база не читается.
+"""
+import hashlib
+import logging
+
+import redis
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_last_modified, get_versions, normalized_query
+
+logger = logging.getLogger(__name__)
+
+
+class ConditionalGetMixin:
+    """
+    Отдаёт 304, если клиент прислал актуальный If-None-Match / If-Modified-Since.
+    Пространства имён берутся из etag_namespaces или cache_namespaces;
+    для данных конкретного пользователя переопределите get_etag_namespaces().
+    """
+    etag_namespaces = None
+
+    def get_etag_namespaces(self):
+        if self.etag_namespaces is not None:
+            return self.etag_namespaces
+        return getattr(self, "cache_namespaces", ())
+
+    def get_validators(self, request):
+        namespaces = list(self.get_etag_namespaces())
+        versions = get_versions(namespaces)
+        last_modified = get_last_modified(namespaces)
+        # Пользователь в составе ETag: одинаковый URL у разных пользователей — разные данные
+        parts = [
+            self.__class__.__name__,
+            request.path,
+            normalized_query(request.query_params),
+            str(getattr(request.user, "pk", None)),
+        ] + [f"{ns}={v}" for ns, v in zip(namespaces, versions)]
+        etag = quote_etag(hashlib.sha1("|".join(parts).encode()).hexdigest()[:32])
+        return etag, int(last_modified) if last_modified else None
+
+    def get(self, request, *args, **kwargs):
+        try:
+            etag, last_modified = self.get_validators(request)
+        except redis.RedisError:
+            logger.warning("Версии недоступны, отвечаем без валидаторов", exc_info=True)
+            return super().get(request, *args, **kwargs)
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+            # Браузер обязан перепроверять копию каждый раз (а не угадывать срок жизни)
+            patch_cache_control(response, no_cache=True, private=True)
+        return response
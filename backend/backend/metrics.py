@@ -0,0 +1,80 @@
+"""
+Простые счётчики и гистограммы, общие для всех процессов (хранятся в Redis),
+и их выдача в текстовом формате Prometheus на /metrics/.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "metrics:counters"
+# Имена гистограмм: их ряды _bucket/_sum/_count лежат среди счётчиков
+HISTOGRAMS_KEY = "metrics:histograms"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    body = ",".join(f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f"{name}{{{body}}}"
+
+
+def incr(name, labels=None, amount=1):
+    """Увеличивает счётчик; ошибки Redis не должны ломать запрос."""
+    try:
+        get_redis().hincrbyfloat(COUNTERS_KEY, _series(name, labels), amount)
+    except redis.RedisError:
+        logger.warning("Не удалось обновить метрику %s", name, exc_info=True)
+
+
+def observe(name, value, labels=None, buckets=DEFAULT_BUCKETS):
+    """Добавляет наблюдение в гистограмму (секунды, байты...) одним обращением к Redis."""
+    labels = labels or {}
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.sadd(HISTOGRAMS_KEY, name)
+        for bound in buckets:
+            if value <= bound:
+                pipe.hincrbyfloat(COUNTERS_KEY, _series(f"{name}_bucket", {**labels, "le": bound}), 1)
+        pipe.hincrbyfloat(COUNTERS_KEY, _series(f"{name}_bucket", {**labels, "le": "+Inf"}), 1)
+        pipe.hincrbyfloat(COUNTERS_KEY, _series(f"{name}_sum", labels), value)
+        pipe.hincrbyfloat(COUNTERS_KEY, _series(f"{name}_count", labels), 1)
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Не удалось обновить метрику %s", name, exc_info=True)
+
+
+def _family(series_name, histograms):
+    for suffix in ("_bucket", "_sum", "_count"):
+        if series_name.endswith(suffix) and series_name[:-len(suffix)] in histograms:
+            return series_name[:-len(suffix)], "histogram"
+    return series_name, "counter"
+
+
+def render():
+    client = get_redis()
+    counters = client.hgetall(COUNTERS_KEY)
+    histograms = {name.decode() for name in client.smembers(HISTOGRAMS_KEY)}
+    lines = []
+    typed = set()
+    for series, value in sorted((k.decode(), v.decode()) for k, v in counters.items()):
+        name, kind = _family(series.split("{", 1)[0], histograms)
+        if name not in typed:
+            lines.append(f"# TYPE {name} {kind}")
+            typed.add(name)
+        lines.append(f"{series} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    # Без настроенного токена не отдаём: метрики раскрывают нагрузку и пути API
+    if not token or request.headers.get("X-Metrics-Token") != token:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4")
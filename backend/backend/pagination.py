@@ -0,0 +1,339 @@
+import base64
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+# Ниже этого порога оценка планировщика заменяется точным COUNT(*) — он дешёвый
+EXACT_COUNT_THRESHOLD = 1000
+COUNT_CACHE_TIMEOUT = 60
+
+
+def estimate_count(queryset):
+    """
+    Быстрое количество строк: оценка планировщика (EXPLAIN) для больших выборок,
+    точный COUNT для маленьких. Возвращает (количество, оценка ли это).
+    Результат кэшируется по тексту SQL.
+    """
+    sql, params = queryset.query.sql_with_params()
+    key = "count-estimate:" + hashlib.sha1(
+        json.dumps([sql, params], cls=DjangoJSONEncoder, default=str).encode()
+    ).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    count, is_estimate = int(plan[0]["Plan"]["Plan Rows"]), True
+    if count < EXACT_COUNT_THRESHOLD:
+        count, is_estimate = queryset.count(), False
+
+    cache.set(key, (count, is_estimate), COUNT_CACHE_TIMEOUT)
+    return count, is_estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, у которого count берётся из estimate_count вместо COUNT(*)."""
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        count, self.count_is_estimate = estimate_count(self.object_list)
+        return count
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Время в курсоре — с микросекундами: DjangoJSONEncoder обрезает их до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная (keyset) пагинация: WHERE (поле, id) > (значение, id) вместо OFFSET,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+
+    Сортировка берётся из OrderingFilter представления (если он подключён),
+    иначе из `cursor_ordering` представления или `ordering` пагинатора.
+    К ней всегда добавляется уникальный `tiebreak_field`.
+    Параметр ?total=estimate добавляет в ответ приблизительное количество.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    ordering = ('-id',)
+    tiebreak_field = 'id'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.current_ordering = self.get_ordering(request, queryset, view)
+
+        values, reverse = self.decode_cursor(request, queryset)
+        ordering = self.current_ordering
+        if reverse:
+            ordering = [self._invert(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        self.count = None
+        if request.query_params.get(self.total_query_param) == 'estimate':
+            self.count, self.count_is_estimate = estimate_count(queryset)
+
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if not ordering:
+            ordering = getattr(view, 'cursor_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+
+        ordering = [f for f in ordering if f.lstrip('-') != self.tiebreak_field]
+        # Направление уникального поля совпадает с первым полем,
+        # чтобы составной индекс (поле, id) читался в одну сторону
+        descending = bool(ordering) and ordering[0].startswith('-')
+        return ordering + [('-' if descending else '') + self.tiebreak_field]
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else '-' + field
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """(a, b, id) > (va, vb, vid) с учётом направления каждого поля."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = '__lt' if field.startswith('-') else '__gt'
+            condition |= equal & Q(**{name + lookup: value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _position(obj, ordering):
+        position = []
+        for field in ordering:
+            value = obj
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    @staticmethod
+    def _field(queryset, path):
+        """Поле модели (или аннотации) по пути сортировки вида 'publisher__name'."""
+        if path in queryset.query.annotations:
+            return queryset.query.annotations[path].output_field
+        model = queryset.model
+        for name in path.split('__'):
+            field = model._meta.get_field(name)
+            model = field.related_model
+        return field
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values, reverse, ordering = data['v'], bool(data['r']), data['o']
+            # Сортировку сменили — курсор от другой последовательности, начинаем сначала
+            if len(values) != len(ordering) or ordering != self.current_ordering:
+                return None, False
+            # Значения — из рук клиента: неверный тип должен давать 404, а не ошибку запроса
+            values = [
+                self._field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, obj, reverse):
+        data = {
+            'v': self._position(obj, self.current_ordering),
+            'r': int(reverse),
+            'o': self.current_ordering,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(data, cls=CursorEncoder).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+        ])
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = self.count_is_estimate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы (из ссылок next/previous)',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Размер страницы',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.total_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "'estimate' — добавить приблизительное количество записей",
+                'schema': {'type': 'string', 'enum': ['estimate']},
+            },
+        ]
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Номера страниц по умолчанию (совместимость со старыми клиентами)
+    и курсоры, когда передан ?cursor= или ?pagination=cursor.
+    В режиме страниц ?total=estimate заменяет COUNT(*) приблизительным количеством
+    и, как в курсорном режиме, добавляет count_is_estimate.
+    """
+    cursor_pagination_class = KeysetPagination
+    mode_query_param = 'pagination'
+
+    def use_cursor(self, request):
+        cursor_param = self.cursor_pagination_class.cursor_query_param
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or cursor_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            self.cursor_paginator.page_size = self.page_size
+            self.cursor_paginator.max_page_size = self.max_page_size
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+
+        total_param = self.cursor_pagination_class.total_query_param
+        if request.query_params.get(total_param) == 'estimate':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        paginator = self.page.paginator
+        if isinstance(paginator, EstimatedCountPaginator):
+            payload = OrderedDict()
+            for key, value in response.data.items():
+                payload[key] = value
+                if key == 'count':
+                    payload['count_is_estimate'] = paginator.count_is_estimate
+            response.data = payload
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_estimate'] = {'type': 'boolean'}
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        names = {p['name'] for p in parameters}
+        parameters += [
+            p for p in self.cursor_pagination_class().get_schema_operation_parameters(view)
+            if p['name'] not in names
+        ]
+        parameters.append({
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': "'cursor' — курсорная пагинация вместо номеров страниц",
+            'schema': {'type': 'string', 'enum': ['cursor']},
+        })
+        return parameters
@@ -22,6 +22,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/books_photos/'  # URL для доступа к медиа
 MEDIA_ROOT = os.path.join(BASE_DIR, 'books_photos') 
 
+# Файлы фоновых отчётов: не в MEDIA_ROOT — тот раздаётся без авторизации
+REPORTS_ROOT = os.getenv("REPORTS_ROOT", default=os.path.join(BASE_DIR, 'reports'))
+REPORT_JOB_TTL = timedelta(hours=int(os.getenv("REPORT_JOB_TTL_HOURS", default=24)))
+# Задача дольше этого в очереди или в работе считается потерянной (воркер упал) и завершается ошибкой
+REPORT_JOB_STALE = timedelta(minutes=int(os.getenv("REPORT_JOB_STALE_MINUTES", default=30)))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
@@ -38,18 +44,56 @@ DEBUG = True
 ALLOWED_HOSTS = []
 AUTH_USER_MODEL = "users.CustomUser"
 
+# Redis для кэша, счётчиков и прочего (Celery использует базу 0)
+REDIS_URL = os.getenv("REDIS_URL", default="redis://127.0.0.1:6379/1")
+# Отдельная база для тестов, очищается при каждом прогоне (backend/test_runner.py)
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL", default="redis://127.0.0.1:6379/15")
+TEST_RUNNER = "backend.test_runner.RedisTestRunner"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+        "KEY_PREFIX": "rare_book",
+    }
+}
+
+# /metrics/ требует заголовок X-Metrics-Token с этим значением; не задан — метрики закрыты
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", default="")
+
 CELERY_BROKER_URL = 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Irkutsk'
+# На сколько задач делить закрытие просроченных аукционов (по id, см. auctions/settlement.py)
+AUCTION_SETTLEMENT_SHARDS = int(os.getenv("AUCTION_SETTLEMENT_SHARDS", default=1))
+# Текущая цена активных аукционов в Redis, ставки пишутся в базу с задержкой (auctions/hotstate.py)
+AUCTION_HOT_STATE = os.getenv("AUCTION_HOT_STATE", default="0").lower() in ("1", "true", "yes")
+
 CELERY_BEAT_SCHEDULE = {
-    'update-auction-status-every-minute': {
+    # Открытие и закрытие идут ETA-задачами (auctions/schedule.py), здесь — страховка;
+    # запуски могут перекрываться — закрытие захватывает строки с SKIP LOCKED
+    'sweep-auction-status': {
         'task': 'auctions.tasks.update_auction_status',
-        'schedule': 60.0,
+        'schedule': 300.0,
+    },
+    'cleanup-report-jobs-every-hour': {
+        'task': 'orders.tasks.cleanup_report_jobs',
+        'schedule': 3600.0,
+    },
+    # Истёкшие refresh-токены в базе не нужны: отзыв проверяется по Redis (users/blacklist.py)
+    'prune-token-tables': {
+        'task': 'users.tasks.prune_token_tables',
+        'schedule': 3600.0,
     },
 }
+if AUCTION_HOT_STATE:
+    CELERY_BEAT_SCHEDULE['persist-hot-bids'] = {
+        'task': 'auctions.tasks.persist_hot_bids',
+        'schedule': 2.0,
+    }
 
 INSTALLED_APPS = [
     "django.contrib.admin",
@@ -58,6 +102,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "drf_spectacular",
@@ -81,8 +126,25 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "backend.concurrency.ConcurrencyLimitMiddleware",
 ]
 
+# Классы приоритета (backend/concurrency.py): local — мест в процессе, fleet — во всех
+# процессах, budget — сколько секунд ждать места до 503. Лимиты процесса меньше числа
+# его потоков, чтобы ставкам всегда оставались свободные потоки. reports — отчёты по продажам
+# и панель администратора
+CONCURRENCY_CLASSES = {
+    "bidding": {},
+    "checkout": {"local": 6, "budget": 2.0},
+    "catalog": {"local": 4, "budget": 1.0},
+    "reports": {"local": 2, "fleet": int(os.getenv("CONCURRENCY_REPORTS_FLEET", default=4)), "budget": 0.5},
+}
+CONCURRENCY_DEFAULT_CLASS = "catalog"
+CONCURRENCY_RETRY_AFTER = 2
+# Аренда места в Redis: процесс продлевает её каждую треть срока, пока запрос
+# выполняется; место упавшего процесса освобождается не позже чем через этот срок
+CONCURRENCY_LEASE = 120
+
 SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
@@ -96,11 +158,23 @@ SIMPLE_JWT = {
     "AUTH_COOKIE_SAMESITE": "Lax",
 }
 
+# Сколько секунд процесс помнит поколение токенов пользователя: за это время
+# блокировка или смена пароля доходит до всех процессов (users/revocation.py)
+AUTH_REVOCATION_CACHE_TTL = float(os.getenv("AUTH_REVOCATION_CACHE_TTL", default=5))
+
+# Пул процессов для хэширования паролей (users/hashing.py); 0 — считать в процессе запроса.
+# Если заняты все процессы и PASSWORD_HASH_QUEUE мест в очереди, вход и регистрация отвечают 429
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", default=2))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", default=2))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", default=1))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Клиент ждёт столько, сколько велит сервер при 429/503
+CORS_EXPOSE_HEADERS = ["Retry-After"]
 
 ROOT_URLCONF = "backend.urls"
 
@@ -123,11 +197,31 @@ REST_FRAMEWORK = {
     # YOUR SETTINGS
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # Права и отзыв — по данным токена, без чтения пользователя из базы
+        "users.authentication.ClaimsJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Корзины токенов в Redis; стоимость запроса — throttle_cost представления
+    "DEFAULT_THROTTLE_CLASSES": [
+        "backend.throttling.TokenBucketThrottle",
+    ],
+    # Сколько доверенных прокси перед приложением. IP анонима для корзины берётся
+    # из X-Forwarded-For только с их учётом; при 0 — адрес соединения (REMOTE_ADDR),
+    # иначе клиент получал бы новую корзину, подставляя заголовок
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", default=0)),
+}
+# (ёмкость, пополнение в секунду) корзины: отчёт стоит 50, ставка 2, остальное 1
+THROTTLE_BUCKETS = {
+    "user": (
+        int(os.getenv("THROTTLE_USER_CAPACITY", default=600)),
+        float(os.getenv("THROTTLE_USER_RATE", default=10)),
+    ),
+    "anon": (
+        int(os.getenv("THROTTLE_ANON_CAPACITY", default=300)),
+        float(os.getenv("THROTTLE_ANON_RATE", default=5)),
+    ),
 }
 SPECTACULAR_SETTINGS = {
     "TITLE": "Your Project API",
@@ -0,0 +1,39 @@
+"""
+Тесты работают с отдельной базой Redis (REDIS_TEST_URL), как Django — с
+отдельной базой данных: кэш, счётчики, корзины и чёрный список тестов не
+смешиваются с данными разработчика. База очищается до и после прогона.
+"""
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import redis_client
+
+
+class RedisTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        url = settings.REDIS_TEST_URL
+        if url == settings.REDIS_URL:
+            raise ImproperlyConfigured("REDIS_TEST_URL совпадает с REDIS_URL: тесты очистили бы рабочую базу")
+        caches = {alias: {**config, "LOCATION": url} for alias, config in settings.CACHES.items()}
+        self.redis_settings = override_settings(REDIS_URL=url, CACHES=caches)
+        self.redis_settings.enable()
+        # Клиент создаётся при первом обращении — уже с тестовым адресом
+        redis_client._client = None
+        self._flush()
+
+    def teardown_test_environment(self, **kwargs):
+        self._flush()
+        self.redis_settings.disable()
+        redis_client._client = None
+        super().teardown_test_environment(**kwargs)
+
+    def _flush(self):
+        try:
+            redis_client.get_redis().flushdb()
+        except redis.RedisError:
+            pass
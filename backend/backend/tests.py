@@ -0,0 +1,159 @@
+import time
+from unittest import mock
+
+import redis
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from auctions.views import BidCreateView
+from backend import concurrency
+from backend.cache import get_or_compute
+from backend.metrics import COUNTERS_KEY
+from backend.redis_client import get_redis
+from backend.throttling import BUCKET_KEY
+from users.models import CustomUser
+
+
+@override_settings(THROTTLE_BUCKETS={"user": (100, 1), "anon": (3, 1)})
+class ThrottleTests(APITestCase):
+
+    def setUp(self):
+        client = get_redis()
+        keys = client.keys(BUCKET_KEY.format("*"))
+        if keys:
+            client.delete(*keys)
+        self.user = CustomUser.objects.create_user(
+            email="reader@mail.ru", first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+
+    def test_anon_bucket(self):
+        """Аноним по IP: после ёмкости корзины — 429 с Retry-After"""
+        for _ in range(3):
+            self.assertEqual(self.client.get("/books/genres").status_code, status.HTTP_200_OK)
+        response = self.client.get("/books/genres")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_forwarded_for_ignored(self):
+        """Подменённый X-Forwarded-For не даёт новой корзины: без прокси IP берётся из соединения"""
+        for i in range(3):
+            self.client.get("/books/genres", HTTP_X_FORWARDED_FOR=f"10.0.0.{i}")
+        response = self.client.get("/books/genres", HTTP_X_FORWARDED_FOR="10.0.0.99")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_cost(self):
+        """Отчёт списывает 50 токенов; корзины пользователей раздельны"""
+        self.client.force_authenticate(self.user)
+        for _ in range(2):
+            self.assertEqual(self.client.get("/orders/report/analytics/").status_code, status.HTTP_200_OK)
+        response = self.client.get("/orders/report/analytics/")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 49)
+
+        other = CustomUser.objects.create_user(
+            email="other@mail.ru", first_name="Пётр", last_name="Петров", password="securePass123"
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get("/orders/report/analytics/").status_code, status.HTTP_200_OK)
+
+    def test_redis_unavailable(self):
+        """Без Redis запросы не ограничиваются"""
+        with mock.patch("backend.throttling._bucket_script", side_effect=redis.ConnectionError):
+            for _ in range(5):
+                self.assertEqual(self.client.get("/books/genres").status_code, status.HTTP_200_OK)
+
+
+@override_settings(CONCURRENCY_CLASSES={
+    "bidding": {},
+    "checkout": {"local": 2, "budget": 0.1},
+    "catalog": {"local": 2, "budget": 0.1},
+    "reports": {"local": 1, "fleet": 2, "budget": 0.1},
+})
+class ConcurrencyLimitTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="reader@mail.ru", first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+        self.client.force_authenticate(self.user)
+        self.slots_key = concurrency.SLOTS_KEY.format("reports")
+        get_redis().delete(self.slots_key)
+        self.limiter = concurrency.get_limiter("reports")
+
+    def test_shed_low_priority(self):
+        """Все места отчётов заняты — 503 с Retry-After; ставки и каталог не затронуты"""
+        slot = self.limiter.acquire()
+        try:
+            response = self.client.get("/orders/report/analytics/")
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response["Retry-After"], "2")
+            self.assertEqual(self.client.get("/orders/history/").status_code, status.HTTP_200_OK)
+            self.assertEqual(concurrency.concurrency_class(BidCreateView.as_view()), "bidding")
+        finally:
+            slot.release()
+        self.assertEqual(self.client.get("/orders/report/analytics/").status_code, status.HTTP_200_OK)
+
+    def test_fleet_limit(self):
+        """Места в Redis, занятые другими процессами, тоже учитываются"""
+        get_redis().zadd(self.slots_key, {"other-1": 10 ** 13, "other-2": 10 ** 13})
+        response = self.client.get("/orders/report/analytics/")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        # Процесс освободил место — запрос проходит и возвращает своё
+        get_redis().zrem(self.slots_key, "other-1")
+        self.assertEqual(self.client.get("/orders/report/analytics/").status_code, status.HTTP_200_OK)
+        self.assertEqual(get_redis().zcard(self.slots_key), 1)
+
+    def test_lease_renewed(self):
+        """Пока запрос выполняется, аренда его места в Redis продлевается"""
+        slot = self.limiter.acquire()
+        try:
+            acquired = get_redis().zscore(self.slots_key, slot.token)
+            time.sleep(0.01)
+            concurrency.renew_leases()
+            self.assertGreater(get_redis().zscore(self.slots_key, slot.token), acquired)
+        finally:
+            slot.release()
+        # Освобождённое место продление не возвращает
+        concurrency.renew_leases()
+        self.assertIsNone(get_redis().zscore(self.slots_key, slot.token))
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_queue_metrics(self):
+        """Время ожидания места пишется в гистограмму по классу"""
+        series = 'concurrency_queue_seconds_count{class="reports"}'
+        before = float(get_redis().hget(COUNTERS_KEY, series) or 0)
+        self.client.get("/orders/report/analytics/")
+        self.assertEqual(float(get_redis().hget(COUNTERS_KEY, series)), before + 1)
+        body = self.client.get("/metrics/", HTTP_X_METRICS_TOKEN="secret").content.decode()
+        self.assertIn("# TYPE concurrency_queue_seconds histogram", body)
+
+
+class MetricsEndpointTests(APITestCase):
+
+    def test_token_required(self):
+        """/metrics/ отдаётся только с настроенным токеном"""
+        self.assertEqual(self.client.get("/metrics/").status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(METRICS_TOKEN="secret"):
+            self.assertEqual(self.client.get("/metrics/").status_code, status.HTTP_403_FORBIDDEN)
+            response = self.client.get("/metrics/", HTTP_X_METRICS_TOKEN="secret")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ResponseCacheLockTests(APITestCase):
+
+    def setUp(self):
+        cache.delete_many(["lock-test", "lock-test:lock"])
+
+    def test_waiter_keeps_foreign_lock(self):
+        """Не дождавшийся значения считает сам, но чужую блокировку не снимает"""
+        cache.set("lock-test:lock", "other", 10)
+        with mock.patch("backend.cache.LOCK_WAIT", 0.05):
+            value, source = get_or_compute("lock-test", lambda: 1, 60, 60, "LockTest")
+        self.assertEqual((value, source), (1, "miss"))
+        self.assertEqual(cache.get("lock-test:lock"), "other")
+
+    def test_holder_releases_lock(self):
+        """Взявший блокировку снимает её после расчёта"""
+        self.assertEqual(get_or_compute("lock-test", lambda: 1, 60, 60, "LockTest"), (1, "miss"))
+        self.assertIsNone(cache.get("lock-test:lock"))
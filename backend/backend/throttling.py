@@ -0,0 +1,88 @@
+"""
+Ограничение частоты запросов корзиной токенов в Redis, общей для всех процессов.
+
+У каждого пользователя (анонима — по IP, см. NUM_PROXIES) своя корзина: ёмкость capacity,
+пополнение rate токенов в секунду. Запрос списывает throttle_cost
+представления (по умолчанию 1): отчёт по продажам стоит дорого, ставка —
+чуть дороже каталога. Проверка и списание — один Lua-скрипт, поэтому
+параллельные процессы не потратят один токен дважды; время берётся из Redis,
+а не из часов процесса.
+
+Redis недоступен — запрос пропускается: ограничение не должно ронять API.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "throttle:{}"
+
+# KEYS[1] — корзина; ARGV: ёмкость, пополнение в секунду, стоимость.
+# Возвращает {1, 0} или {0, секунд до нужного числа токенов}
+BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed, wait = 0, 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+-- Ключ живёт, пока корзина не наполнится: полная корзина и отсутствие ключа — одно и то же
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+_script = None
+
+
+def _bucket_script():
+    global _script
+    if _script is None:
+        _script = get_redis().register_script(BUCKET_LUA)
+    return _script
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Корзины из settings.THROTTLE_BUCKETS: 'user' — по пользователю, 'anon' — по IP."""
+
+    def get_cost(self, request, view):
+        return getattr(view, "throttle_cost", 1)
+
+    def get_bucket(self, request):
+        if request.user and request.user.is_authenticated:
+            return "user", f"user:{request.user.pk}"
+        return "anon", f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request, view):
+        scope, ident = self.get_bucket(request)
+        capacity, rate = settings.THROTTLE_BUCKETS[scope]
+        # Дороже ёмкости запрос не пройдёт никогда — списываем всю корзину
+        cost = min(self.get_cost(request, view), capacity)
+        try:
+            allowed, wait = _bucket_script()(keys=[BUCKET_KEY.format(ident)], args=[capacity, rate, cost])
+        except redis.RedisError:
+            logger.warning("Ограничение частоты недоступно, запрос пропущен", exc_info=True)
+            return True
+        self.wait_seconds = float(wait)
+        if not allowed:
+            metrics.incr("throttled_requests_total", {"scope": scope, "view": type(view).__name__})
+        return bool(allowed)
+
+    def wait(self):
+        return self.wait_seconds
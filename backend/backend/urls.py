@@ -24,6 +24,7 @@ from drf_spectacular.views import (
 )
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import metrics_view
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
@@ -32,6 +33,7 @@ urlpatterns = [
     path("auctions/", include("auctions.urls")),
     path("books/", include("books.urls")),
     path("dashboard/", include("dashboard.urls")),
+    path("metrics/", metrics_view, name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     # Optional UI:
     path(
@@ -0,0 +1,116 @@
+from django.core.cache import cache
+
+from backend.cache import fingerprint, make_key
+from django.db import connections
+
+from .models import Book
+
+# Границы гистограммы цен (руб.); последняя корзина открыта сверху
+PRICE_BUCKETS = [0, 500, 1000, 2000, 5000, 10000]
+# Запись в каталог сбрасывает кэш сразу (версия books); срок — страховка
+FACETS_CACHE_TIMEOUT = 60
+
+FACETS_SQL = """
+SELECT
+    GROUPING(g.id, a.id, p.id, b.condition, b.status, b.bucket) AS grp,
+    g.id, g.name, a.id, a.name, p.id, p.name, b.condition, b.status, b.bucket,
+    COUNT(DISTINCT b.id)
+FROM (
+    SELECT id, publisher_id, condition, status, width_bucket(price, %s::numeric[]) AS bucket
+    FROM books_book
+    WHERE id IN ({filtered})
+) b
+LEFT JOIN books_book_genres bg ON bg.book_id = b.id
+LEFT JOIN books_genre g ON g.id = bg.genre_id
+LEFT JOIN books_book_authors ba ON ba.book_id = b.id
+LEFT JOIN books_author a ON a.id = ba.author_id
+JOIN books_publisher p ON p.id = b.publisher_id
+GROUP BY GROUPING SETS (
+    (),
+    (g.id, g.name),
+    (a.id, a.name),
+    (p.id, p.name),
+    (b.condition),
+    (b.status),
+    (b.bucket)
+)
+"""
+
+# Битовые маски GROUPING(...): 1 — колонка свёрнута. Порядок как в GROUPING выше.
+_ALL = 0b111111
+GROUP_TOTAL = _ALL
+GROUP_GENRE = _ALL & ~0b100000
+GROUP_AUTHOR = _ALL & ~0b010000
+GROUP_PUBLISHER = _ALL & ~0b001000
+GROUP_CONDITION = _ALL & ~0b000100
+GROUP_STATUS = _ALL & ~0b000010
+GROUP_PRICE = _ALL & ~0b000001
+
+
+def _by_count(entries):
+    return sorted(entries, key=lambda e: (-e["count"], str(e.get("name", e.get("label", "")))))
+
+
+def compute_facets(queryset):
+    """
+    Все фасеты для отфильтрованного набора книг одним запросом (GROUPING SETS):
+    жанры, авторы, издательства, состояния, статусы и гистограмма цен.
+    """
+    filtered_sql, filtered_params = queryset.order_by().values("pk").query.sql_with_params()
+    sql = FACETS_SQL.format(filtered=filtered_sql)
+    params = [[float(edge) for edge in PRICE_BUCKETS]] + list(filtered_params)
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    condition_labels = dict(Book.CONDITION_CHOICES)
+    status_labels = dict(Book.STATUS_CHOICES)
+    price_counts = {}
+    result = {
+        "total": 0, "genres": [], "authors": [], "publishers": [],
+        "conditions": [], "statuses": [], "price": [],
+    }
+    for (grp, genre_id, genre_name, author_id, author_name, publisher_id,
+         publisher_name, condition, book_status, bucket, count) in rows:
+        if grp == GROUP_TOTAL:
+            result["total"] = count
+        elif grp == GROUP_GENRE and genre_id is not None:
+            result["genres"].append({"id": genre_id, "name": genre_name, "count": count})
+        elif grp == GROUP_AUTHOR and author_id is not None:
+            result["authors"].append({"id": author_id, "name": author_name, "count": count})
+        elif grp == GROUP_PUBLISHER:
+            result["publishers"].append({"id": publisher_id, "name": publisher_name, "count": count})
+        elif grp == GROUP_CONDITION:
+            result["conditions"].append({
+                "value": condition, "label": condition_labels.get(condition, str(condition)), "count": count
+            })
+        elif grp == GROUP_STATUS:
+            result["statuses"].append({
+                "value": book_status, "label": status_labels.get(book_status, str(book_status)), "count": count
+            })
+        elif grp == GROUP_PRICE:
+            price_counts[bucket] = count
+
+    for key in ("genres", "authors", "publishers", "conditions", "statuses"):
+        result[key] = _by_count(result[key])
+
+    # width_bucket: i-я корзина — [edges[i-1], edges[i]), последняя — от edges[-1] и выше
+    for i, low in enumerate(PRICE_BUCKETS, start=1):
+        high = PRICE_BUCKETS[i] if i < len(PRICE_BUCKETS) else None
+        result["price"].append({"min": low, "max": high, "count": price_counts.get(i, 0)})
+    return result
+
+
+def cached_facets(params, get_queryset):
+    """
+    Фасеты из кэша по отпечатку фильтров. get_queryset вызывается только при
+    промахе — так попадание в кэш не делает даже запросов валидации фильтров.
+    """
+    # Версия пространства books меняется при любой записи в каталог
+    key = make_key("books:facets", ["books"], fingerprint(params))
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(get_queryset())
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,40 @@
+"""
+Достраивает производные данные книг, которых нет: карточки каталога BookCard
+и поисковый вектор. loaddata сохраняет книги с raw=True, и сигналы их не строят.
+
+    python manage.py backfill_books
+    python manage.py backfill_books --all     # пересобрать у всех книг
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.models import Book
+from books.read_model import refresh_book_cards
+from books.search import update_search_vectors
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Строит недостающие карточки каталога и поисковые векторы (после loaddata)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Пересобрать у всех книг")
+
+    def handle(self, *args, all, **options):
+        books = Book.objects.order_by("pk")
+        started = time.perf_counter()
+        cards = self.backfill(books if all else books.filter(card__isnull=True), refresh_book_cards)
+        vectors = self.backfill(
+            books if all else books.filter(search_vector__isnull=True), update_search_vectors
+        )
+        self.stdout.write(
+            f"Карточек: {cards}, поисковых векторов: {vectors}, {time.perf_counter() - started:.1f} с"
+        )
+
+    def backfill(self, books, refresh):
+        book_ids = list(books.values_list("pk", flat=True))
+        for start in range(0, len(book_ids), BATCH_SIZE):
+            refresh(book_ids[start:start + BATCH_SIZE])
+        return len(book_ids)
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Выражение как у books.search.build_search_vector на момент миграции:
+# миграция не должна зависеть от текущего кода приложения
+AUTHORS_SQL = """
+(SELECT string_agg(a.name, ' ') FROM books_author a
+ JOIN books_book_authors ba ON ba.author_id = a.id WHERE ba.book_id = books_book.id)
+"""
+PART_SQL = """
+setweight(to_tsvector('{config}'::regconfig, coalesce(books_book.title, '')), 'A')
+|| setweight(to_tsvector('{config}'::regconfig, coalesce({authors}, '')), 'B')
+|| setweight(to_tsvector('{config}'::regconfig, coalesce(books_book.description, '')), 'C')
+"""
+FILL_SQL = "UPDATE books_book SET search_vector = {}".format(
+    " || ".join(PART_SQL.format(config=config, authors=AUTHORS_SQL) for config in ("russian", "simple"))
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_donor_book_quantity_book_donor'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='book_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='book_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(FILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def iso_datetime(value):
+    # Как DateTimeField у DRF: в текущем часовом поясе, UTC — с суффиксом Z
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def card_payload(book):
+    # Копия books.read_model.card_payload на момент миграции: миграция
+    # не должна зависеть от текущего кода приложения
+    authors = sorted(book.authors.all(), key=lambda a: a.pk)
+    genres = sorted(book.genres.all(), key=lambda g: g.pk)
+    donor = book.donor
+    return {
+        "authors": [a.pk for a in authors],
+        "genres": [g.pk for g in genres],
+        "authors_list": ", ".join(a.name for a in authors),
+        "genres_list": ", ".join(g.name for g in genres),
+        "publisher": {"id": book.publisher.pk, "name": book.publisher.name} if book.publisher_id else None,
+        "donor": {
+            "id": donor.pk, "name": donor.name, "phone": donor.phone, "email": donor.email,
+            "address": donor.address, "created_at": iso_datetime(donor.created_at),
+        } if donor else None,
+    }
+
+
+def fill_book_cards(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookCard = apps.get_model('books', 'BookCard')
+    books = Book.objects.select_related('publisher', 'donor').prefetch_related('authors', 'genres')
+    BookCard.objects.bulk_create(
+        (BookCard(book=book, **card_payload(book)) for book in books.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_book_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCard',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='books.book')),
+                ('authors', models.JSONField(default=list)),
+                ('genres', models.JSONField(default=list)),
+                ('authors_list', models.TextField(blank=True, default='')),
+                ('genres_list', models.TextField(blank=True, default='')),
+                ('publisher', models.JSONField(null=True)),
+                ('donor', models.JSONField(null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_book_cards, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
 # books/models.py
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 class Author(models.Model):
@@ -63,6 +65,14 @@ class Book(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     donor = models.ForeignKey(Donor, on_delete=models.SET_NULL, null=True, blank=True, related_name="books", verbose_name="Сдатчик")
     quantity = models.PositiveIntegerField(default=1, verbose_name="Количество экземпляров")
+    # Поддерживается сигналами из books/signals.py (название > авторы > описание)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="book_search_vector_gin"),
+            GinIndex(fields=["title"], name="book_title_trgm", opclasses=["gin_trgm_ops"]),
+        ]
 
     def __str__(self):
         return self.title
@@ -90,4 +100,22 @@ class Book(models.Model):
     @property
     def genres_list(self):
         """Возвращает список жанров"""
-        return ", ".join([genre.name for genre in self.genres.all()])
\ No newline at end of file
+        return ", ".join([genre.name for genre in self.genres.all()])
+
+class BookCard(models.Model):
+    """
+    Денормализованная карточка книги для каталога: имена авторов и жанров,
+    издательство и сдатчик в JSON, чтобы страница списка читалась одним запросом.
+    Обновляется сигналами из books/signals.py.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name="card")
+    authors = models.JSONField(default=list)
+    genres = models.JSONField(default=list)
+    authors_list = models.TextField(blank=True, default="")
+    genres_list = models.TextField(blank=True, default="")
+    publisher = models.JSONField(null=True)
+    donor = models.JSONField(null=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Карточка {self.book_id}"
@@ -0,0 +1,37 @@
+from .models import Book, BookCard
+from .serializers import DonorSerializer, PublisherSerializer
+
+CARD_FIELDS = ["authors", "genres", "authors_list", "genres_list", "publisher", "donor"]
+
+
+def card_payload(book):
+    """Данные карточки в том виде, в каком их отдаёт BookSerializer."""
+    authors = sorted(book.authors.all(), key=lambda a: a.pk)
+    genres = sorted(book.genres.all(), key=lambda g: g.pk)
+    return {
+        "authors": [a.pk for a in authors],
+        "genres": [g.pk for g in genres],
+        "authors_list": ", ".join(a.name for a in authors),
+        "genres_list": ", ".join(g.name for g in genres),
+        "publisher": PublisherSerializer(book.publisher).data if book.publisher_id else None,
+        "donor": DonorSerializer(book.donor).data if book.donor_id else None,
+    }
+
+
+def refresh_book_cards(book_ids):
+    """Пересобирает карточки переданных книг (upsert пачкой)."""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    books = (
+        Book.objects.filter(pk__in=book_ids)
+        .select_related("publisher", "donor")
+        .prefetch_related("authors", "genres")
+    )
+    cards = [BookCard(book=book, **card_payload(book)) for book in books]
+    BookCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=["book"],
+        update_fields=CARD_FIELDS + ["refreshed_at"],
+    )
@@ -0,0 +1,67 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+)
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from rest_framework.filters import SearchFilter
+
+from .models import Author, Book
+
+# Русская конфигурация даёт стемминг, simple — точное совпадение слов
+# (фамилии, латиница, аббревиатуры), поэтому индексируем обеими.
+SEARCH_CONFIGS = ("russian", "simple")
+
+
+def build_search_vector():
+    """Выражение tsvector для книги: название (A) > авторы (B) > описание (C)."""
+    authors_names = Subquery(
+        Author.objects.filter(books=OuterRef("pk"))
+        .values("books")
+        .annotate(names=StringAgg("name", delimiter=" "))
+        .values("names")[:1]
+    )
+    vector = None
+    for config in SEARCH_CONFIGS:
+        part = (
+            SearchVector("title", weight="A", config=config)
+            + SearchVector(authors_names, weight="B", config=config)
+            + SearchVector("description", weight="C", config=config)
+        )
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vectors(book_ids):
+    """Пересчитывает search_vector одним UPDATE для переданных книг."""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    Book.objects.filter(pk__in=book_ids).update(
+        search_vector=build_search_vector()
+    )
+
+
+def build_search_query(terms):
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(terms, config=config, search_type="websearch")
+        query = part if query is None else query | part
+    return query
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    Полнотекстовый поиск по GIN-индексу search_vector с запасным
+    триграммным совпадением по названию (опечатки).
+    Добавляет аннотацию relevance для сортировки ?ordering=-relevance.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = " ".join(self.get_search_terms(request))
+        if not terms:
+            return queryset.annotate(relevance=Value(0.0, output_field=FloatField()))
+
+        query = build_search_query(terms)
+        return queryset.annotate(
+            relevance=SearchRank(F("search_vector"), query) + TrigramSimilarity("title", terms)
+        ).filter(Q(search_vector=query) | Q(title__trigram_similar=terms))
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Book, Author, Genre, Publisher, Donor
+from .models import Book, BookCard, Author, Genre, Publisher, Donor
 
 
 class AuthorSerializer(serializers.ModelSerializer):
@@ -27,16 +27,25 @@ class DonorSerializer(serializers.ModelSerializer):
 
 
 class BookSerializer(serializers.ModelSerializer):
+    """
+    Книга каталога. Связанные данные (авторы, жанры, издательство, сдатчик)
+    читаются из денормализованной карточки BookCard, поэтому для страницы
+    списка достаточно Book.objects.select_related('card').
+    """
     condition_display = serializers.CharField(source='get_condition_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
-    publisher = PublisherSerializer(read_only=True)
-    donor = DonorSerializer(read_only=True)
+    authors = serializers.SerializerMethodField()
+    genres = serializers.SerializerMethodField()
+    publisher = serializers.SerializerMethodField()
+    donor = serializers.SerializerMethodField()
     donor_id = serializers.PrimaryKeyRelatedField(
         source='donor',
         queryset=Donor.objects.all(),
         write_only=True,
         required=False
     )
+    authors_list = serializers.SerializerMethodField()
+    genres_list = serializers.SerializerMethodField()
 
     class Meta:
         model = Book
@@ -46,4 +55,34 @@ class BookSerializer(serializers.ModelSerializer):
             'status', 'status_display', 'genres', 'donor', 'donor_id',
             'quantity',  # ✅ добавлено поле quantity
             'created_at', 'updated_at', 'authors_list', 'genres_list'
-        ]
\ No newline at end of file
+        ]
+
+    def get_card(self, obj):
+        try:
+            return obj.card
+        except BookCard.DoesNotExist:
+            pass
+        # Карточка ещё не построена (например, после loaddata — см. backfill_books):
+        # собираем на лету один раз на книгу, а не для каждого поля
+        if not hasattr(obj, "_built_card"):
+            from .read_model import card_payload
+            obj._built_card = BookCard(book=obj, **card_payload(obj))
+        return obj._built_card
+
+    def get_authors(self, obj):
+        return self.get_card(obj).authors
+
+    def get_genres(self, obj):
+        return self.get_card(obj).genres
+
+    def get_publisher(self, obj):
+        return self.get_card(obj).publisher
+
+    def get_donor(self, obj):
+        return self.get_card(obj).donor
+
+    def get_authors_list(self, obj):
+        return self.get_card(obj).authors_list
+
+    def get_genres_list(self, obj):
+        return self.get_card(obj).genres_list
@@ -0,0 +1,119 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from backend.cache import bump
+from .models import Author, Book, Donor, Genre, Publisher
+from .read_model import refresh_book_cards
+from .search import update_search_vectors
+
+
+# Пространства кэша ответов, которые устаревают при записи в модель
+CACHE_NAMESPACES = {
+    Book: ("books", "auctions"),
+    Author: ("authors", "books"),
+    Genre: ("genres", "books"),
+    Publisher: ("publishers", "books"),
+    Donor: ("books",),
+}
+
+
+def invalidate_cache(sender, **kwargs):
+    bump(*CACHE_NAMESPACES[sender])
+
+
+for model in CACHE_NAMESPACES:
+    post_save.connect(invalidate_cache, sender=model, dispatch_uid=f"cache-save-{model.__name__}")
+    post_delete.connect(invalidate_cache, sender=model, dispatch_uid=f"cache-delete-{model.__name__}")
+
+
+def refresh_books(book_ids, search=True):
+    """Пересчитывает производные данные книг: поисковый вектор и карточку каталога."""
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    if search:
+        update_search_vectors(book_ids)
+    refresh_book_cards(book_ids)
+
+
+def remember_books(instance):
+    # После удаления связи уже не прочитать — запоминаем книги заранее
+    instance._affected_book_ids = list(instance.books.values_list("id", flat=True))
+
+
+def remembered_books(instance):
+    return getattr(instance, "_affected_book_ids", [])
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_books(instance.books.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Donor)
+def book_relation_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_books(instance.books.values_list("id", flat=True), search=False)
+
+
+@receiver(post_save, sender=Publisher)
+def publisher_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_books(instance.book_set.values_list("id", flat=True), search=False)
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Donor)
+def book_relation_pre_delete(sender, instance, **kwargs):
+    remember_books(instance)
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    refresh_books(remembered_books(instance))
+
+
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Donor)
+def book_relation_deleted(sender, instance, **kwargs):
+    refresh_books(remembered_books(instance), search=False)
+
+
+def on_books_m2m_changed(instance, action, reverse, pk_set, search):
+    if action.startswith("post_"):
+        bump("books")
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_books([instance.pk], search=search)
+        return
+
+    # author.books.add(...) / remove(...) / clear() и то же для жанров
+    if action == "pre_clear":
+        remember_books(instance)
+    elif action in ("post_add", "post_remove"):
+        refresh_books(pk_set or [], search=search)
+    elif action == "post_clear":
+        refresh_books(remembered_books(instance), search=search)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def book_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    on_books_m2m_changed(instance, action, reverse, pk_set, search=True)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    on_books_m2m_changed(instance, action, reverse, pk_set, search=False)
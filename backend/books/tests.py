@@ -1,3 +1,317 @@
-from django.test import TestCase
+import base64
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework import status
+from users.models import CustomUser
+from .models import Author, Book, BookCard, Donor, Genre, Publisher
+
+
+class BookSearchTests(APITestCase):
+
+    def setUp(self):
+        self.url = "/books/"
+        self.publisher = Publisher.objects.create(name="Азбука")
+        self.bulgakov = Author.objects.create(name="Михаил Булгаков")
+        self.tolstoy = Author.objects.create(name="Лев Толстой")
+        self.master = self.create_book(
+            "Мастер и Маргарита", "Роман о дьяволе в Москве", [self.bulgakov]
+        )
+        self.war = self.create_book(
+            "Война и мир", "Эпопея о войне 1812 года, упомянута Маргарита", [self.tolstoy]
+        )
+
+    def create_book(self, title, description, authors):
+        book = Book.objects.create(
+            title=title, year=1990, publisher=self.publisher, condition=1,
+            description=description, price=100, status=1,
+        )
+        book.authors.set(authors)
+        return book
+
+    def search(self, term, **params):
+        response = self.client.get(self.url, {"search": term, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [b["id"] for b in response.data["results"]]
+
+    def test_search_by_word_form(self):
+        """Поиск находит словоформы (русская морфология)"""
+        self.assertEqual(self.search("мастера"), [self.master.id])
+
+    def test_search_by_author(self):
+        """Поиск по имени автора и обновление при смене авторов"""
+        self.assertEqual(self.search("Булгаков"), [self.master.id])
+        self.war.authors.add(self.bulgakov)
+        self.assertCountEqual(self.search("Булгаков"), [self.master.id, self.war.id])
+
+    def test_search_after_author_rename(self):
+        """Переименование автора пересчитывает поисковый вектор его книг"""
+        self.tolstoy.name = "Лев Николаевич"
+        self.tolstoy.save()
+        self.assertEqual(self.search("Николаевич"), [self.war.id])
+
+    def test_backfill_after_loaddata(self):
+        """Книги без вектора (loaddata) находятся после backfill_books"""
+        Book.objects.update(search_vector=None)
+        self.assertEqual(self.search("Булгаков"), [])
+        call_command("backfill_books", stdout=StringIO())
+        # Другая строка запроса — мимо кэша ответов
+        self.assertEqual(self.search("Булгаков", page=1), [self.master.id])
+
+    def test_search_typo(self):
+        """Опечатка в названии находится через триграммы"""
+        self.assertEqual(self.search("Мастр и Маргарта"), [self.master.id])
+
+    def test_ordering_by_relevance(self):
+        """Совпадение в названии весомее совпадения в описании"""
+        ids = self.search("Маргарита", ordering="-relevance")
+        self.assertEqual(ids, [self.master.id, self.war.id])
+
+    def test_ordering_by_relevance_without_search(self):
+        """Сортировка по релевантности без поиска не ломает список"""
+        response = self.client.get(self.url, {"ordering": "-relevance"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
+
+class BookCursorPaginationTests(APITestCase):
+
+    def setUp(self):
+        self.url = "/books/"
+        publisher = Publisher.objects.create(name="Азбука")
+        prices = [300, 100, 200, 100, 500, 100, 400]
+        self.books = [
+            Book.objects.create(
+                title=f"Книга {i}", year=1990 + i, publisher=publisher, condition=1,
+                description="", price=price, status=1,
+            )
+            for i, price in enumerate(prices)
+        ]
+
+    def walk(self, url, params=None):
+        ids = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [b["id"] for b in response.data["results"]]
+            url, params = response.data["next"], None
+        return ids, response
+
+    def test_cursor_walk_matches_ordering(self):
+        """Курсоры проходят все книги без пропусков и повторов (цена + id)"""
+        ids, _ = self.walk(self.url, {"pagination": "cursor", "ordering": "-price", "page_size": 2})
+        expected = [b.id for b in sorted(self.books, key=lambda b: (-b.price, -b.id))]
+        self.assertEqual(ids, expected)
+
+    def test_previous_link(self):
+        """Ссылка previous возвращает предыдущую страницу"""
+        params = {"pagination": "cursor", "ordering": "price", "page_size": 3}
+        first = self.client.get(self.url, params).data
+        second = self.client.get(first["next"]).data
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(
+            [b["id"] for b in back["results"]], [b["id"] for b in first["results"]]
+        )
+
+    def test_estimated_total(self):
+        """?total=estimate: на маленькой выборке — точный COUNT, и это видно по флагу"""
+        response = self.client.get(self.url, {"pagination": "cursor", "total": "estimate"})
+        self.assertEqual(response.data["count"], len(self.books))
+        self.assertFalse(response.data["count_is_estimate"])
+
+    def test_invalid_cursor(self):
+        """Испорченный курсор — 404, а не ошибка сервера"""
+        for data in ({"v": 1, "r": 0, "o": ["-id"]}, ["v"], "x"):
+            cursor = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+            response = self.client.get(self.url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        """Курсор правильной формы, но со значениями не того типа — 404"""
+        for values in (["abc", 1], [100, "x"], [[1], 1]):
+            data = {"v": values, "r": 0, "o": ["price", "id"]}
+            cursor = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+            response = self.client.get(self.url, {"cursor": cursor, "ordering": "price"})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_kept(self):
+        """Без параметров остаётся постраничный режим с count"""
+        response = self.client.get(self.url, {"page": 2, "page_size": 5})
+        self.assertEqual(response.data["count"], len(self.books))
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertNotIn("count_is_estimate", response.data)
+
+    def test_page_number_estimated_total(self):
+        """?total=estimate в постраничном режиме тоже сообщает, оценка ли count"""
+        response = self.client.get(self.url, {"page": 1, "total": "estimate"})
+        self.assertEqual(response.data["count"], len(self.books))
+        self.assertFalse(response.data["count_is_estimate"])
+
+        with mock.patch("backend.pagination.estimate_count", return_value=(5000, True)):
+            response = self.client.get(self.url, {"page": 2, "total": "estimate"})
+        self.assertEqual(response.data["count"], 5000)
+        self.assertTrue(response.data["count_is_estimate"])
+
+
+class BookCardTests(APITestCase):
+
+    def setUp(self):
+        self.url = "/books/"
+        self.publisher = Publisher.objects.create(name="Азбука")
+        self.donor = Donor.objects.create(name="Пётр Петров")
+        self.author = Author.objects.create(name="Иван Тургенев")
+        self.genre = Genre.objects.create(name="Роман")
+        for i in range(12):
+            book = Book.objects.create(
+                title=f"Книга {i}", year=1990, publisher=self.publisher, condition=1,
+                description="", price=100, status=1, donor=self.donor,
+            )
+            book.authors.add(self.author)
+            book.genres.add(self.genre)
+
+    def test_list_query_count(self):
+        """Страница каталога: COUNT + одна выборка, без запросов на каждую книгу"""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"page_size": 12})
+        book = response.data["results"][0]
+        self.assertEqual(book["authors"], [self.author.id])
+        self.assertEqual(book["authors_list"], "Иван Тургенев")
+        self.assertEqual(book["genres_list"], "Роман")
+        self.assertEqual(book["publisher"], {"id": self.publisher.id, "name": "Азбука"})
+        self.assertEqual(book["donor"]["name"], "Пётр Петров")
+
+    def test_card_follows_related_changes(self):
+        """Карточка обновляется при переименовании связанных объектов"""
+        self.genre.name = "Повесть"
+        self.genre.save()
+        self.publisher.name = "Эксмо"
+        self.publisher.save()
+        self.donor.delete()
+        book = self.client.get(self.url).data["results"][0]
+        self.assertEqual(book["genres_list"], "Повесть")
+        self.assertEqual(book["publisher"]["name"], "Эксмо")
+        self.assertIsNone(book["donor"])
+
+    def test_card_follows_dashboard_write_path(self):
+        """Книга, созданная через админский BookViewSet, сразу видна в каталоге с авторами"""
+        admin = CustomUser.objects.create_user(
+            email="admin@mail.ru", first_name="Админ", last_name="Админов", password="securePass123"
+        )
+        admin.is_staff = True
+        admin.save()
+        self.client.force_authenticate(admin)
+        other = Author.objects.create(name="Антон Чехов")
+        response = self.client.post("/dashboard/books/", {
+            "title": "Новая", "year": 2000, "condition": 1, "description": "-",
+            "price": "10.00", "status": 1, "quantity": 1,
+            "publisher_id": self.publisher.id,
+            "authors_ids": [self.author.id, other.id],
+            "genres_ids": [self.genre.id],
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        book = self.client.get(self.url, {"id": response.data["id"]}).data["results"][0]
+        self.assertEqual(book["authors_list"], "Иван Тургенев, Антон Чехов")
+        self.assertEqual(book["genres"], [self.genre.id])
+
+    def test_missing_cards(self):
+        """Без карточек (после loaddata) страница собирает их на лету, backfill_books их строит"""
+        BookCard.objects.all().delete()
+        # COUNT + выборка + по 4 запроса связей на книгу, а не на каждое поле
+        with self.assertNumQueries(2 + 4 * 12):
+            book = self.client.get(self.url, {"page_size": 12}).data["results"][0]
+        self.assertEqual(book["authors_list"], "Иван Тургенев")
+
+        call_command("backfill_books", stdout=StringIO())
+        self.assertEqual(BookCard.objects.count(), 12)
+        with self.assertNumQueries(2):
+            # Другая строка запроса — мимо кэша ответов
+            self.client.get(self.url, {"page_size": 12, "page": 1})
+
+
+class BookFacetsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.url = "/books/facets"
+        self.azbuka = Publisher.objects.create(name="Азбука")
+        self.eksmo = Publisher.objects.create(name="Эксмо")
+        self.novel = Genre.objects.create(name="Роман")
+        self.poem = Genre.objects.create(name="Поэма")
+        self.pushkin = Author.objects.create(name="Пушкин")
+        self.gogol = Author.objects.create(name="Гоголь")
+        self.create_book(100, self.azbuka, [self.novel, self.poem], [self.pushkin, self.gogol], condition=1)
+        self.create_book(700, self.azbuka, [self.novel], [self.pushkin], condition=2)
+        self.create_book(20000, self.eksmo, [], [self.gogol], condition=2, book_status=3)
+
+    def create_book(self, price, publisher, genres, authors, condition, book_status=1):
+        book = Book.objects.create(
+            title="Книга", year=1900, publisher=publisher, condition=condition,
+            description="", price=price, status=book_status,
+        )
+        book.genres.set(genres)
+        book.authors.set(authors)
+        return book
+
+    @staticmethod
+    def counts(entries, key="id"):
+        return {e[key]: e["count"] for e in entries}
+
+    def test_facet_counts(self):
+        """Все фасеты считаются одним запросом и не задваиваются из-за M2M"""
+        with self.assertNumQueries(1):
+            data = self.client.get(self.url).data
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(self.counts(data["genres"]), {self.novel.id: 2, self.poem.id: 1})
+        self.assertEqual(self.counts(data["authors"]), {self.pushkin.id: 2, self.gogol.id: 2})
+        self.assertEqual(self.counts(data["publishers"]), {self.azbuka.id: 2, self.eksmo.id: 1})
+        self.assertEqual(self.counts(data["conditions"], "value"), {1: 1, 2: 2})
+        self.assertEqual(self.counts(data["statuses"], "value"), {1: 2, 3: 1})
+        self.assertEqual(
+            [(b["min"], b["count"]) for b in data["price"] if b["count"]],
+            [(0, 1), (500, 1), (10000, 1)],
+        )
+
+    def test_facets_respect_filters_and_cache(self):
+        """Фильтры списка применяются; повтор с тем же набором берётся из кэша"""
+        data = self.client.get(self.url, {"publisher": self.azbuka.id, "max_price": 500}).data
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(self.counts(data["genres"]), {self.novel.id: 1, self.poem.id: 1})
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url, {"max_price": 500, "publisher": self.azbuka.id}).data
+        self.assertEqual(again, data)
+
+
+class CatalogCacheTests(APITestCase):
+
+    def setUp(self):
+        self.publisher = Publisher.objects.create(name="Азбука")
+
+    def test_cache_hit_and_invalidation(self):
+        """Повторный запрос берётся из кэша, запись в модель его инвалидирует"""
+        params = {"ordering": "name", "x": self.publisher.id}
+        first = self.client.get("/books/publishers", params)
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.client.get("/books/publishers", {"x": self.publisher.id, "ordering": "name"})
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data, first.data)
+
+        self.publisher.name = "Эксмо"
+        self.publisher.save()
+        third = self.client.get("/books/publishers", params)
+        self.assertEqual(third["X-Cache"], "MISS")
+        self.assertIn("Эксмо", [p["name"] for p in third.data])
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint(self):
+        """Счётчики попаданий и промахов доступны в формате Prometheus"""
+        self.client.get("/books/genres", {"nonce": self.publisher.id})
+        self.client.get("/books/genres", {"nonce": self.publisher.id})
+        body = self.client.get("/metrics/", HTTP_X_METRICS_TOKEN="secret").content.decode()
+        self.assertIn('response_cache_total{result="hit",view="GenreListView"}', body)
+        self.assertIn('response_cache_total{result="miss",view="GenreListView"}', body)
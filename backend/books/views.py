@@ -1,15 +1,24 @@
 from rest_framework import generics, permissions
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from .models import Book, Author, Genre, Publisher, Donor
+from .search import BookSearchFilter
+from .facets import cached_facets
 from .serializers import (
     BookSerializer, PublisherSerializer, AuthorSerializer,
     GenreSerializer, DonorSerializer
 )
 from django_filters.rest_framework import FilterSet, NumberFilter
-from rest_framework.pagination import PageNumberPagination
+from backend.cache import CachedResponseMixin
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import HybridPagination
 
-class StandardResultsSetPagination(PageNumberPagination):
+class StandardResultsSetPagination(HybridPagination):
+    """
+    Номера страниц (как раньше) или курсоры по ?pagination=cursor для бесконечной прокрутки.
+    Курсор работает с любой сортировкой из ordering_fields, с добавлением id.
+    """
     page_size = 12  # стандартное количество записей
     page_size_query_param = 'page_size'  # 👈 позволяет клиенту задавать своё
     max_page_size = 100
@@ -27,19 +36,22 @@ class BookFilter(FilterSet):
             'min_price', 'max_price', 'min_quantity', 'max_quantity'
         ]
 
-class AuthorListView(generics.ListAPIView):
+class AuthorListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    cache_namespaces = ("authors",)
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class GenreListView(generics.ListAPIView):
+class GenreListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    cache_namespaces = ("genres",)
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [permissions.AllowAny]
 
 
-class PublisherListView(generics.ListAPIView):
+class PublisherListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
+    cache_namespaces = ("publishers",)
     queryset = Publisher.objects.all()
     serializer_class = PublisherSerializer
     permission_classes = [permissions.AllowAny]
@@ -67,16 +79,38 @@ class DonorDetailView(generics.RetrieveAPIView):
     permission_classes = [permissions.AllowAny]
 
 
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, CachedResponseMixin, generics.ListAPIView):
     """
     Список книг с возможностью фильтрации по коду, автору, жанру, статусу, состоянию, названию и количеству.
+    Поиск (?search=) — полнотекстовый с триграммным запасом, ?ordering=-relevance сортирует по релевантности.
+    Связанные данные берутся из BookCard: одна выборка на страницу.
     """
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related('card').defer('search_vector')
+    cache_namespaces = ("books",)
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]
     filterset_class = BookFilter
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    search_fields = ['title', 'description']
-    ordering_fields = ['price', 'year', 'title', 'quantity']
+    filter_backends = [DjangoFilterBackend, BookSearchFilter, OrderingFilter]
+    ordering_fields = ['price', 'year', 'title', 'quantity', 'relevance']
     ordering = ['title']
     pagination_class = StandardResultsSetPagination
+
+
+class BookFacetsView(ConditionalGetMixin, generics.GenericAPIView):
+    """
+    Количество книг по жанрам, авторам, издательствам, состояниям, статусам
+    и корзинам цен для тех же фильтров, что и у списка книг (включая ?search=).
+    Считается одним запросом с GROUPING SETS и кэшируется по набору фильтров.
+    """
+    queryset = Book.objects.all()
+    permission_classes = [permissions.AllowAny]
+    filterset_class = BookFilter
+    filter_backends = [DjangoFilterBackend, BookSearchFilter]
+    pagination_class = None
+    etag_namespaces = ("books",)
+
+    def get(self, request, *args, **kwargs):
+        facets = cached_facets(
+            request.query_params, lambda: self.filter_queryset(self.get_queryset())
+        )
+        return Response(facets)
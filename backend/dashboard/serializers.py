@@ -55,7 +55,7 @@ class BookSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Book
-        fields = "__all__"
+        exclude = ["search_vector"]
 
     def validate(self, attrs):
         new_status = attrs.get('status', getattr(self.instance, 'status', None))
@@ -23,18 +23,21 @@ class AuthorViewSet(viewsets.ModelViewSet):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
 
 
 class GenreViewSet(viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
 
 
 class PublisherViewSet(viewsets.ModelViewSet):
     queryset = Publisher.objects.all()
     serializer_class = PublisherSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
 
 
 class DonorViewSet(viewsets.ModelViewSet):
@@ -44,6 +47,7 @@ class DonorViewSet(viewsets.ModelViewSet):
     queryset = Donor.objects.all()
     serializer_class = DonorSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['name', 'email', 'phone']
     search_fields = ['name', 'email', 'phone']
@@ -55,6 +59,7 @@ class BookViewSet(viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'genres', 'condition', 'donor', 'quantity']
     search_fields = ['title', 'authors__name', 'isbn', 'donor__name']
@@ -66,6 +71,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     queryset = Order.objects.prefetch_related('items__book').all()
     serializer_class = OrderSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'payment', 'user']
     search_fields = ['items__book__title', 'user__email']
@@ -116,6 +122,7 @@ class AuctionViewSet(viewsets.ModelViewSet):
     queryset = Auction.objects.all()
     serializer_class = AuctionSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'start_time', 'end_time']
     search_fields = ['product__title']
@@ -127,6 +134,7 @@ class BidViewSet(viewsets.ModelViewSet):
     queryset = Bid.objects.all()
     serializer_class = BidSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['auction', 'user']
     search_fields = ['auction__product__title', 'user__email']
@@ -138,6 +146,7 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [AdminPermission]
+    concurrency_class = "reports"
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
     filterset_fields = ['status', 'is_admin', 'is_staff']
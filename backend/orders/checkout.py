@@ -0,0 +1,66 @@
+"""
+Резервирование экземпляров при оформлении заказа.
+
+Остаток списывается условным UPDATE (quantity >= n) в транзакции заказа:
+две параллельные покупки последнего экземпляра не могут пройти обе.
+Последний экземпляр переводит книгу в «Продано» тем же UPDATE, без сигналов,
+поэтому её прежние продажи в накопителе переносятся здесь (orders/rollup.py).
+"""
+from django.db import connection
+
+from books.models import Book
+from .rollup import apply_items, withdraw_books
+
+AVAILABLE = 1
+SOLD = 2
+
+LOCK_SQL = """
+SELECT id, quantity FROM {table} WHERE id = ANY(%s) ORDER BY id FOR UPDATE
+"""
+
+RESERVE_SQL = """
+UPDATE {table} AS b
+SET quantity = b.quantity - v.qty,
+    status = CASE WHEN b.quantity - v.qty = 0 THEN {sold} ELSE b.status END
+FROM (SELECT unnest(%s::bigint[]) AS id, unnest(%s::int[]) AS qty) AS v
+WHERE b.id = v.id AND b.status = {available} AND b.quantity >= v.qty
+RETURNING b.id, b.price
+"""
+
+
+class OutOfStock(Exception):
+    """Экземпляров не хватило в момент списания."""
+
+
+def reserve_books(lines):
+    """
+    lines — {id книги: количество}. Должна вызываться внутри transaction.atomic().
+    Возвращает {id: цена} для книг, которые удалось списать; если вернулось
+    меньше книг, чем запрошено, вызывающий обязан откатить транзакцию.
+    """
+    table = connection.ops.quote_name(Book._meta.db_table)
+    ids = sorted(lines)
+    with connection.cursor() as cursor:
+        # Блокируем строки в одном порядке, чтобы встречные заказы не попадали в дедлок
+        cursor.execute(LOCK_SQL.format(table=table), [ids])
+        sold_out = [book_id for book_id, quantity in cursor.fetchall() if quantity == lines[book_id]]
+        moved = withdraw_books(sold_out) if sold_out else []
+        cursor.execute(
+            RESERVE_SQL.format(table=table, sold=SOLD, available=AVAILABLE),
+            [ids, [lines[book_id] for book_id in ids]],
+        )
+        reserved = dict(cursor.fetchall())
+    apply_items(moved, 1)
+    return reserved
+
+
+def unavailable_messages(lines, books):
+    """Сообщения в формате unavailable_books для книг, которых не хватает."""
+    messages = []
+    for book_id, quantity in lines.items():
+        book = books.get(book_id)
+        if book is None:
+            messages.append(f"id={book_id} (не существует)")
+        elif book.quantity < quantity or book.status != AVAILABLE:
+            messages.append(f"{book.title} (доступно {book.quantity})")
+    return messages
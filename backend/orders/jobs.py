@@ -0,0 +1,179 @@
+"""
+Фоновые отчёты по продажам: постановка в очередь с дедупликацией и запись
+файла позиций пачками (CSV или Parquet), чтобы память воркера не росла.
+"""
+import csv
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from backend.cache import NON_FILTER_PARAMS, fingerprint
+from .export import CHUNK_SIZE, COLUMNS, export_rows
+from .models import ReportJob
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet — только если установлен pyarrow
+    pyarrow = None
+
+IN_FLIGHT = [ReportJob.Status.PENDING, ReportJob.Status.RUNNING]
+CREATE_ATTEMPTS = 3
+
+
+class JobConflict(APIException):
+    status_code = 409
+    default_detail = "Такой отчёт сейчас создаётся, повторите запрос"
+    default_code = "report_job_conflict"
+
+
+def available_formats():
+    formats = [ReportJob.Format.CSV]
+    if pyarrow is not None:
+        formats.append(ReportJob.Format.PARQUET)
+    return formats
+
+
+def params_to_dict(data):
+    """Фильтры отчёта из QueryDict или JSON в виде {ключ: [значения]}."""
+    lists = data.lists() if hasattr(data, "lists") else data.items()
+    result = {}
+    for key, values in lists:
+        if key in NON_FILTER_PARAMS:
+            continue
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        values = [str(v) for v in values if v not in (None, "")]
+        if values:
+            result[key] = values
+    return result
+
+
+def params_to_querydict(params):
+    query = QueryDict(mutable=True)
+    for key, values in params.items():
+        query.setlist(key, values)
+    return query
+
+
+def job_fingerprint(params, fmt):
+    digest = fingerprint(params_to_querydict(params))
+    return hashlib.sha1(f"{digest}:{fmt}".encode()).hexdigest()
+
+
+def fail_stale_jobs(queryset=None):
+    """
+    Завершает ошибкой задачи, которые дольше REPORT_JOB_STALE ждут в очереди
+    или выполняются: сообщение потерялось или воркер упал. Иначе такая задача
+    до истечения держала бы место одинакового запроса. Возвращает их число.
+    """
+    cutoff = timezone.now() - settings.REPORT_JOB_STALE
+    queryset = ReportJob.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        Q(status=ReportJob.Status.PENDING, created_at__lt=cutoff)
+        | Q(status=ReportJob.Status.RUNNING, started_at__lt=cutoff)
+    ).update(status=ReportJob.Status.FAILED, error="Превышено время выполнения", finished_at=timezone.now())
+
+
+def find_or_create_job(user, params, fmt):
+    """
+    Возвращает (задача, создана ли). Одинаковый запрос, который ещё
+    выполняется или уже готов и не истёк, отдаёт существующую задачу.
+    """
+    digest = job_fingerprint(params, fmt)
+    same = ReportJob.objects.filter(user=user, fingerprint=digest)
+    fail_stale_jobs(same)
+    for _ in range(CREATE_ATTEMPTS):
+        existing = same.filter(
+            status__in=IN_FLIGHT + [ReportJob.Status.DONE], expires_at__gt=timezone.now()
+        ).first()
+        if existing:
+            return existing, False
+        try:
+            with transaction.atomic():
+                job = ReportJob.objects.create(
+                    user=user, params=params, fingerprint=digest, format=fmt,
+                    expires_at=timezone.now() + settings.REPORT_JOB_TTL,
+                )
+        except IntegrityError:
+            # Параллельный такой же запрос успел первым; его задача могла уже
+            # завершиться ошибкой — тогда пробуем создать снова
+            continue
+
+        from .tasks import run_report_job
+        transaction.on_commit(lambda: run_report_job.delay(job.pk))
+        return job, True
+    raise JobConflict()
+
+
+def job_path(job):
+    return os.path.join(settings.REPORTS_ROOT, f"report-{job.pk}.{job.format}")
+
+
+def write_csv(rows, path):
+    names = [name for name, _ in COLUMNS]
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for row in rows:
+            writer.writerow([row[name] for name in names])
+            count += 1
+    return count
+
+
+def parquet_schema():
+    types = {
+        "id": pyarrow.int64(), "order_id": pyarrow.int64(), "book_id": pyarrow.int64(),
+        "quantity": pyarrow.int64(), "order_date": pyarrow.date32(),
+        "price": pyarrow.decimal128(10, 2),
+    }
+    return pyarrow.schema([(name, types.get(name, pyarrow.string())) for name, _ in COLUMNS])
+
+
+def write_parquet(rows, path):
+    schema = parquet_schema()
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CHUNK_SIZE:
+                writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema=schema))
+                count += len(batch)
+                batch = []
+        if batch or not count:
+            writer.write_batch(pyarrow.RecordBatch.from_pylist(batch, schema=schema))
+            count += len(batch)
+    return count
+
+
+WRITERS = {
+    ReportJob.Format.CSV: write_csv,
+    ReportJob.Format.PARQUET: write_parquet,
+}
+
+
+def write_report_file(job, queryset):
+    """Пишет позиции во временный файл и атомарно переименовывает. Возвращает число строк."""
+    os.makedirs(settings.REPORTS_ROOT, exist_ok=True)
+    path = job_path(job)
+    tmp_path = path + ".part"
+    try:
+        rows = WRITERS[job.format](export_rows(queryset), tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path, rows
+
+
+def delete_job_file(job):
+    if job.file and os.path.exists(job.file):
+        os.remove(job.file)
@@ -0,0 +1,206 @@
+"""
+Замер аналитики отчёта по продажам: прежний вариант (отдельный запрос на
+каждый показатель), sales_analytics (один запрос по позициям) и чтение из
+дневного накопителя SalesRollup.
+
+    python manage.py bench_report --seed 1000000
+    python manage.py bench_report --repeat 5
+    python manage.py bench_report --cleanup
+
+Данные создаются от пользователя bench-report@example.com и только для
+разработческой базы.
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Sum
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderItem
+from orders.reports import rollup_analytics, sales_analytics
+from orders.rollup import rebuild_rollup
+from users.models import CustomUser
+
+BENCH_EMAIL = "bench-report@example.com"
+BENCH_PREFIX = "bench-report"
+ITEMS_PER_ORDER = 5
+BOOKS = 20000
+GENRES = 30
+AUTHORS = 500
+
+
+def legacy_analytics(sold_qs):
+    """Прежняя реализация из OrderItemReportView.list — для сравнения."""
+    result = {
+        "total_sold_count": sold_qs.count(),
+        "total_sales_amount": sold_qs.aggregate(total=Sum("price"))["total"] or 0,
+        "average_price": sold_qs.aggregate(avg=Avg("price"))["avg"] or 0,
+    }
+    for name, fields in (
+        ("by_genres", ("book__genres__id", "book__genres__name")),
+        ("by_status", ("book__status",)),
+        ("by_condition", ("book__condition",)),
+        ("by_authors", ("book__authors__id", "book__authors__name")),
+    ):
+        result[name] = list(
+            sold_qs.values(*fields).annotate(count=Count("id"), total=Sum("price"), avg=Avg("price")).order_by("-total")
+        )
+    # Период повторял итоги с теми же фильтрами по дате
+    result["period"] = (sold_qs.count(), sold_qs.aggregate(total=Sum("price")), sold_qs.aggregate(avg=Avg("price")))
+    return result
+
+
+class Command(BaseCommand):
+    help = "Сравнивает число запросов и время расчёта аналитики отчёта по продажам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Создать столько позиций заказов")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--cleanup", action="store_true", help="Удалить тестовые данные")
+
+    def handle(self, *args, seed, repeat, cleanup, **options):
+        if cleanup:
+            self.cleanup()
+            return
+        if seed:
+            self.seed(seed)
+
+        user = CustomUser.objects.filter(email=BENCH_EMAIL).first()
+        if user is None:
+            self.stderr.write("Нет данных: запустите с --seed N")
+            return
+        sold_qs = OrderItem.objects.filter(order__user=user, order__status=Order.Status.ACCEPT).distinct()
+        self.stdout.write(f"Позиций: {OrderItem.objects.filter(order__user=user).count()}")
+
+        variants = (
+            ("legacy", lambda: legacy_analytics(sold_qs)),
+            ("single-pass", lambda: sales_analytics(sold_qs)),
+            ("rollup", lambda: rollup_analytics(user, QueryDict())),
+        )
+        for name, func in variants:
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    func()
+                    timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f"{name:12} запросов: {len(queries.captured_queries):3}  "
+                f"медиана: {statistics.median(timings) * 1000:9.1f} мс  "
+                f"мин: {min(timings) * 1000:9.1f} мс"
+            )
+
+    @transaction.atomic
+    def seed(self, items):
+        orders = max(items // ITEMS_PER_ORDER, 1)
+        self.stdout.write(f"Создаём {orders} заказов и {orders * ITEMS_PER_ORDER} позиций...")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO users_customuser (email, first_name, last_name, password, status,
+                    is_admin, is_active, is_staff, is_superuser, created_at)
+                VALUES (%s, 'Бенч', 'Отчёт', '!', 1, false, true, false, false, now())
+                ON CONFLICT (email) DO NOTHING
+                """,
+                [BENCH_EMAIL],
+            )
+            cursor.execute("SELECT id FROM users_customuser WHERE email = %s", [BENCH_EMAIL])
+            user_id = cursor.fetchone()[0]
+
+            cursor.execute("INSERT INTO books_publisher (name) VALUES (%s) RETURNING id", [BENCH_PREFIX])
+            publisher_id = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO books_genre (name) SELECT %s || i FROM generate_series(1, %s) i RETURNING id",
+                [BENCH_PREFIX, GENRES],
+            )
+            genre_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "INSERT INTO books_author (name) SELECT %s || i FROM generate_series(1, %s) i RETURNING id",
+                [BENCH_PREFIX, AUTHORS],
+            )
+            author_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                INSERT INTO books_book (title, year, publisher_id, condition, description, price,
+                    status, created_at, updated_at, quantity)
+                SELECT %s || i, 1800 + i %% 200, %s, 1 + i %% 3, '', (50 + random() * 9950)::numeric(10, 2),
+                    1 + i %% 4, now(), now(), 1
+                FROM generate_series(1, %s) i
+                RETURNING id
+                """,
+                [BENCH_PREFIX, publisher_id, BOOKS],
+            )
+            book_ids = [row[0] for row in cursor.fetchall()]
+            # У каждой книги до двух жанров и до двух авторов
+            for table, column, ids in (
+                ("books_book_genres", "genre_id", genre_ids),
+                ("books_book_authors", "author_id", author_ids),
+            ):
+                cursor.execute(
+                    f"""
+                    INSERT INTO {table} (book_id, {column})
+                    SELECT DISTINCT b, (%s::bigint[])[1 + (b * k) %% %s]
+                    FROM unnest(%s::bigint[]) b, (VALUES (1), (7)) AS m(k)
+                    """,
+                    [ids, len(ids), book_ids],
+                )
+
+            cursor.execute(
+                """
+                INSERT INTO orders_order (date, status, payment, amount, user_id)
+                SELECT current_date - (i %% 730), CASE WHEN i %% 4 = 0 THEN 'P' ELSE 'A' END, 'C', 0, %s
+                FROM generate_series(1, %s) i
+                """,
+                [user_id, orders],
+            )
+            cursor.execute(
+                """
+                INSERT INTO orders_orderitem (order_id, book_id, price, quantity)
+                SELECT o.id, b.id, b.price, 1
+                FROM orders_order o
+                CROSS JOIN generate_series(1, %s) j
+                JOIN books_book b ON b.id = (%s::bigint[])[1 + (o.id * 31 + j * 17) %% %s]
+                WHERE o.user_id = %s
+                """,
+                [ITEMS_PER_ORDER, book_ids, len(book_ids), user_id],
+            )
+            cursor.execute("ANALYZE orders_orderitem; ANALYZE orders_order; ANALYZE books_book")
+        # Заказы вставлены в обход сигналов — накопитель собираем целиком
+        rebuild_rollup()
+
+    @transaction.atomic
+    def cleanup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                DELETE FROM orders_orderitem WHERE order_id IN (
+                    SELECT o.id FROM orders_order o JOIN users_customuser u ON u.id = o.user_id
+                    WHERE u.email = %s
+                )
+                """,
+                [BENCH_EMAIL],
+            )
+            cursor.execute(
+                "DELETE FROM orders_order WHERE user_id IN (SELECT id FROM users_customuser WHERE email = %s)",
+                [BENCH_EMAIL],
+            )
+            cursor.execute(
+                "DELETE FROM orders_salesrollup WHERE user_id IN (SELECT id FROM users_customuser WHERE email = %s)",
+                [BENCH_EMAIL],
+            )
+            cursor.execute("DELETE FROM users_customuser WHERE email = %s", [BENCH_EMAIL])
+            cursor.execute(
+                "SELECT id FROM books_book WHERE publisher_id IN (SELECT id FROM books_publisher WHERE name = %s)",
+                [BENCH_PREFIX],
+            )
+            book_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DELETE FROM books_book_genres WHERE book_id = ANY(%s)", [book_ids])
+            cursor.execute("DELETE FROM books_book_authors WHERE book_id = ANY(%s)", [book_ids])
+            cursor.execute("DELETE FROM books_book WHERE id = ANY(%s)", [book_ids])
+            cursor.execute("DELETE FROM books_publisher WHERE name = %s", [BENCH_PREFIX])
+            cursor.execute("DELETE FROM books_genre WHERE name LIKE %s", [BENCH_PREFIX + "%"])
+            cursor.execute("DELETE FROM books_author WHERE name LIKE %s", [BENCH_PREFIX + "%"])
+        self.stdout.write("Тестовые данные удалены")
@@ -0,0 +1,36 @@
+"""
+Пересборка накопителя продаж SalesRollup из заказов.
+
+    python manage.py rebuild_sales_rollup
+    python manage.py rebuild_sales_rollup --from 2024-01-01 --to 2024-12-31
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from orders.models import SalesRollup
+from orders.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает дневной накопитель продаж за период (по умолчанию — целиком)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from")
+        parser.add_argument("--to", dest="date_to")
+
+    def handle(self, *args, date_from, date_to, **options):
+        dates = []
+        for value in (date_from, date_to):
+            parsed = parse_date(value) if value else None
+            if value and parsed is None:
+                raise CommandError(f"Некорректная дата: {value}")
+            dates.append(parsed)
+
+        started = time.perf_counter()
+        rebuild_rollup(*dates)
+        self.stdout.write(
+            f"Строк в накопителе: {SalesRollup.objects.count()}, "
+            f"{time.perf_counter() - started:.1f} с"
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_orderitem_quantity_alter_order_amount_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'Итого'), ('genre', 'Жанр'), ('author', 'Автор'), ('condition', 'Состояние'), ('status', 'Статус книги'), ('publisher', 'Издательство')], max_length=10)),
+                ('key', models.BigIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='salesrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'dimension', 'key'), name='sales_rollup_unique'),
+        ),
+        # Накопитель заполняет 0007_salesrollup_stable_dimensions
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_salesrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('params', models.JSONField(default=dict)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('parquet', 'Parquet')], default='csv', max_length=10)),
+                ('status', models.CharField(choices=[('P', 'В очереди'), ('R', 'Выполняется'), ('D', 'Готов'), ('F', 'Ошибка')], default='P', max_length=1)),
+                ('analytics', models.JSONField(blank=True, null=True)),
+                ('file', models.CharField(blank=True, default='', max_length=255)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['P', 'R'])), fields=('user', 'fingerprint'), name='report_job_in_flight_unique'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+# Накопитель пересобирается целиком: остаются итог и издательство по текущим
+# свойствам книг. SQL повторяет orders/rollup.py на момент миграции
+REBUILD_SQL = """
+DELETE FROM orders_salesrollup;
+INSERT INTO orders_salesrollup (day, user_id, dimension, key, count, total)
+SELECT day, user_id, dimension, key, COUNT(*), SUM(price)
+FROM (
+    SELECT o.date AS day, o.user_id, 'total' AS dimension, 0::bigint AS key, oi.price
+    FROM orders_orderitem oi JOIN orders_order o ON o.id = oi.order_id
+    WHERE o.status = 'A'
+    UNION ALL
+    SELECT o.date, o.user_id, 'publisher', b.publisher_id, oi.price
+    FROM orders_orderitem oi
+    JOIN orders_order o ON o.id = oi.order_id
+    JOIN books_book b ON b.id = oi.book_id
+    WHERE o.status = 'A'
+) AS rows
+GROUP BY day, user_id, dimension, key;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_reportjob'),
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesrollup',
+            name='dimension',
+            field=models.CharField(choices=[('total', 'Итого'), ('publisher', 'Издательство')], max_length=10),
+        ),
+        migrations.RunSQL(REBUILD_SQL, migrations.RunSQL.noop),
+    ]
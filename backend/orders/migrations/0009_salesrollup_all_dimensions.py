@@ -0,0 +1,51 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:52
+
+from django.db import migrations, models
+
+# Накопитель пересобирается целиком: снова все разрезы отчёта по текущим
+# свойствам книг. SQL повторяет orders/rollup.py на момент миграции
+REBUILD_SQL = """
+DELETE FROM orders_salesrollup;
+WITH items AS (
+    SELECT oi.price, o.date AS day, o.user_id, b.id AS book_id,
+           b.publisher_id, b.status, b.condition
+    FROM orders_orderitem oi
+    JOIN orders_order o ON o.id = oi.order_id
+    JOIN books_book b ON b.id = oi.book_id
+    WHERE o.status = 'A'
+)
+INSERT INTO orders_salesrollup (day, user_id, dimension, key, count, total)
+SELECT day, user_id, dimension, key, COUNT(*), SUM(price)
+FROM (
+    SELECT day, user_id, 'total' AS dimension, 0::bigint AS key, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'publisher', publisher_id, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'status', status, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'condition', condition, price FROM items
+    UNION ALL
+    SELECT i.day, i.user_id, 'genre', COALESCE(bg.genre_id, 0), i.price
+    FROM items i LEFT JOIN books_book_genres bg ON bg.book_id = i.book_id
+    UNION ALL
+    SELECT i.day, i.user_id, 'author', COALESCE(ba.author_id, 0), i.price
+    FROM items i LEFT JOIN books_book_authors ba ON ba.book_id = i.book_id
+) AS rows
+GROUP BY day, user_id, dimension, key;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_reportjob_started_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesrollup',
+            name='dimension',
+            field=models.CharField(choices=[('total', 'Итого'), ('genre', 'Жанр'), ('author', 'Автор'), ('condition', 'Состояние'), ('status', 'Статус книги'), ('publisher', 'Издательство')], max_length=10),
+        ),
+        migrations.RunSQL(REBUILD_SQL, migrations.RunSQL.noop),
+    ]
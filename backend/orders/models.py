@@ -50,4 +50,82 @@ class OrderItem(models.Model):
         # Автоматически можно рассчитывать цену за все экземпляры
         if not self.price:
             self.price = self.book.price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+class SalesRollup(models.Model):
+    """
+    Продажи (оплаченные позиции) по дням в разрезах отчёта.
+    Ведётся сигналами из orders/signals.py при переходе заказа в статус
+    «Оплачен» и обратно и при смене свойств книги; пересобирается командой
+    rebuild_sales_rollup.
+    """
+    class Dimension(models.TextChoices):
+        TOTAL = "total", "Итого"
+        GENRE = "genre", "Жанр"
+        AUTHOR = "author", "Автор"
+        CONDITION = "condition", "Состояние"
+        STATUS = "status", "Статус книги"
+        PUBLISHER = "publisher", "Издательство"
+
+    day = models.DateField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    # id издательства, жанра, автора, код статуса или состояния книги
+    # (0 — для итога и для книг без жанров или авторов)
+    key = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day", "dimension", "key"], name="sales_rollup_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}={self.key}: {self.count} / {self.total}"
+
+
+class ReportJob(models.Model):
+    """
+    Фоновое построение отчёта по продажам: аналитика и файл позиций.
+    Файлы лежат в settings.REPORTS_ROOT и удаляются после expires_at.
+    """
+    class Status(models.TextChoices):
+        PENDING = "P", "В очереди"
+        RUNNING = "R", "Выполняется"
+        DONE = "D", "Готов"
+        FAILED = "F", "Ошибка"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        PARQUET = "parquet", "Parquet"
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="report_jobs")
+    params = models.JSONField(default=dict)
+    # Отпечаток фильтров и формата: одинаковые запросы не ставятся в очередь повторно
+    fingerprint = models.CharField(max_length=40)
+    format = models.CharField(max_length=10, choices=Format.choices, default=Format.CSV)
+    status = models.CharField(max_length=1, choices=Status.choices, default=Status.PENDING)
+    analytics = models.JSONField(null=True, blank=True)
+    file = models.CharField(max_length=255, blank=True, default="")
+    rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            # Не больше одной незавершённой задачи на одинаковый запрос
+            models.UniqueConstraint(
+                fields=["user", "fingerprint"],
+                condition=models.Q(status__in=["P", "R"]),
+                name="report_job_in_flight_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Отчёт {self.id} ({self.get_status_display()})"
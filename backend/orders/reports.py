@@ -0,0 +1,232 @@
+"""
+Аналитика отчёта по продажам одним SQL-запросом.
+
+Проданные позиции выбираются один раз (CTE), итоги и разрезы по статусу,
+состоянию и издательству считаются через GROUPING SETS, разрезы по жанрам и
+авторам (связи многие-ко-многим) — отдельными ветками UNION ALL над тем же CTE.
+Если заданы только даты, вся аналитика читается из накопителя SalesRollup.
+"""
+import logging
+
+from django.db import connections
+from django.utils.dateparse import parse_date
+
+from books.models import Book
+from .models import Order, OrderItem
+from .rollup import rollup_rows
+
+logger = logging.getLogger(__name__)
+
+# С такими фильтрами отчёт можно собрать из накопителя по дням
+ROLLUP_PARAMS = {"date_after", "date_before"}
+
+# Разрезы по жанрам и авторам над CTE sold
+M2M_SQL = """
+UNION ALL
+SELECT 'genre', g.id, g.name, COUNT(*), SUM(s.price)
+FROM sold s
+LEFT JOIN books_book_genres bg ON bg.book_id = s.book_id {genre_filter}
+LEFT JOIN books_genre g ON g.id = bg.genre_id
+GROUP BY g.id, g.name
+UNION ALL
+SELECT 'author', a.id, a.name, COUNT(*), SUM(s.price)
+FROM sold s
+LEFT JOIN books_book_authors ba ON ba.book_id = s.book_id {author_filter}
+LEFT JOIN books_author a ON a.id = ba.author_id
+GROUP BY a.id, a.name
+"""
+
+REPORT_SQL = """
+WITH sold AS MATERIALIZED (
+    SELECT oi.id, oi.price, b.id AS book_id, b.status, b.condition,
+           b.publisher_id, p.name AS publisher_name
+    FROM orders_orderitem oi
+    JOIN books_book b ON b.id = oi.book_id
+    JOIN books_publisher p ON p.id = b.publisher_id
+    WHERE oi.id IN ({filtered})
+)
+SELECT
+    CASE GROUPING(status, condition, publisher_id)
+        WHEN 7 THEN 'total' WHEN 3 THEN 'status' WHEN 5 THEN 'condition' ELSE 'publisher'
+    END,
+    COALESCE(status, condition, publisher_id), publisher_name,
+    COUNT(*), SUM(price)
+FROM sold
+GROUP BY GROUPING SETS ((), (status), (condition), (publisher_id, publisher_name))
+""" + M2M_SQL
+
+
+def _totals(count, total):
+    total = total or 0
+    return {"count": count, "total": float(total), "avg": float(total / count) if count else 0.0}
+
+
+def _by_total(entries):
+    return sorted(entries, key=lambda e: (-e["total"], str(e.get("id", e.get("status", e.get("condition"))))))
+
+
+def build_analytics(rows):
+    """Собирает JSON аналитики из строк (разрез, ключ, название, количество, сумма)."""
+    status_labels = dict(Book.STATUS_CHOICES)
+    condition_labels = dict(Book.CONDITION_CHOICES)
+    totals = _totals(0, 0)
+    by_genres, by_status, by_condition, by_authors, by_publishers = [], [], [], [], []
+    for dimension, key, name, count, total in rows:
+        values = _totals(count, total)
+        if dimension == "total":
+            totals = values
+        elif dimension == "status":
+            by_status.append({"status": key, "label": status_labels.get(key, str(key)), **values})
+        elif dimension == "condition":
+            by_condition.append({"condition": key, "label": condition_labels.get(key, str(key)), **values})
+        elif dimension == "genre":
+            by_genres.append({"id": key, "name": name or "", **values})
+        elif dimension == "author":
+            by_authors.append({"id": key, "name": name or "", **values})
+        elif dimension == "publisher":
+            by_publishers.append({"id": key, "name": name or "", **values})
+
+    return {
+        "total_sold_count": totals["count"],
+        "total_sales_amount": totals["total"],
+        "average_price": totals["avg"],
+        "by_genres": _by_total(by_genres),
+        "by_status": _by_total(by_status),
+        "by_condition": _by_total(by_condition),
+        "by_authors": _by_total(by_authors),
+        "by_publishers": _by_total(by_publishers),
+    }
+
+
+def _report_rows(template, sold_qs, genres=None, authors=None):
+    filtered_sql, filtered_params = sold_qs.order_by().values("pk").query.sql_with_params()
+    params = list(filtered_params)
+    genre_filter = author_filter = ""
+    if genres:
+        genre_filter = "AND bg.genre_id = ANY(%s)"
+        params.append(list(genres))
+    if authors:
+        author_filter = "AND ba.author_id = ANY(%s)"
+        params.append(list(authors))
+    sql = template.format(filtered=filtered_sql, genre_filter=genre_filter, author_filter=author_filter)
+
+    with connections[sold_qs.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def sales_analytics(sold_qs, genres=None, authors=None):
+    """
+    Итоги и разрезы по проданным позициям sold_qs (queryset OrderItem).
+    genres / authors — id из фильтра отчёта: как и раньше, в разрез попадают
+    только выбранные жанры и авторы.
+    """
+    return build_analytics(_report_rows(REPORT_SQL, sold_qs, genres, authors))
+
+
+def rollup_analytics(user, params):
+    """
+    Аналитика из накопителя, если фильтры это позволяют (только даты), иначе None.
+    Дата заказа — DateField, поэтому любой период состоит из целых дней.
+    """
+    used = {key for key, value in params.items() if value}
+    if not used <= ROLLUP_PARAMS:
+        return None
+    dates = {}
+    for key in ROLLUP_PARAMS & used:
+        dates[key] = parse_date(params[key])
+        if dates[key] is None:
+            return None
+    return build_analytics(rollup_rows(user, dates.get("date_after"), dates.get("date_before")))
+
+
+def parse_multi_param(params, name):
+    raw_list = params.getlist(name)
+    result = []
+    for entry in raw_list:
+        if not entry:
+            continue
+        parts = [p.strip() for p in entry.split(',') if p.strip()]
+        for p in parts:
+            try:
+                result.append(int(p))
+            except ValueError:
+                continue
+    return list(dict.fromkeys(result))
+
+
+def filter_report_items(user, params):
+    """OrderItem queryset с применёнными фильтрами отчёта (по user + параметрам)."""
+    qs = OrderItem.objects.select_related('order', 'book', 'book__publisher') \
+        .prefetch_related('book__authors', 'book__genres')
+
+    # показываем только свои заказы (при необходимости поменяйте)
+    qs = qs.filter(order__user=user)
+
+    # параметры
+    genre_list = parse_multi_param(params, 'genres')
+    author_list = parse_multi_param(params, 'authors')
+    publisher = params.get('publisher')
+    book_status = params.get('book_status')
+    book_condition = params.get('book_condition')
+    date_after = params.get('date_after')
+    date_before = params.get('date_before')
+    price_min = params.get('price_min')
+    price_max = params.get('price_max')
+
+    logger.debug("Report params: genres=%s authors=%s publisher=%s book_status=%s book_condition=%s date_after=%s date_before=%s price_min=%s price_max=%s",
+                 genre_list, author_list, publisher, book_status, book_condition, date_after, date_before, price_min, price_max)
+
+    if genre_list:
+        qs = qs.filter(book__genres__in=genre_list)
+    if author_list:
+        qs = qs.filter(book__authors__in=author_list)
+    if publisher:
+        try:
+            qs = qs.filter(book__publisher=int(publisher))
+        except ValueError:
+            pass
+    if book_status:
+        qs = qs.filter(book__status=book_status)
+    if book_condition:
+        qs = qs.filter(book__condition=book_condition)
+    if date_after:
+        qs = qs.filter(order__date__gte=date_after)
+    if date_before:
+        qs = qs.filter(order__date__lte=date_before)
+    if price_min:
+        qs = qs.filter(price__gte=price_min)
+    if price_max:
+        qs = qs.filter(price__lte=price_max)
+
+    return qs.distinct()
+
+
+def report_analytics(user, params):
+    """Блок analytics отчёта по продажам для фильтров params (QueryDict)."""
+    # считаем "проданные" — позиции, где заказ оплачен (Order.Status.ACCEPT -> "A")
+    sold_qs = filter_report_items(user, params).filter(order__status=Order.Status.ACCEPT)
+
+    # Итоги и все разрезы — из накопителя по дням или одним запросом по позициям
+    analytics = rollup_analytics(user, params)
+    if analytics is None:
+        analytics = sales_analytics(
+            sold_qs,
+            genres=parse_multi_param(params, 'genres'),
+            authors=parse_multi_param(params, 'authors'),
+        )
+
+    # Продажи за период: даты уже входят в фильтр, так что это те же итоги
+    date_after = params.get('date_after')
+    date_before = params.get('date_before')
+    period = {}
+    if date_after or date_before:
+        period = {
+            "start": date_after,
+            "end": date_before,
+            "count": analytics["total_sold_count"],
+            "total": analytics["total_sales_amount"],
+            "avg": analytics["average_price"],
+        }
+    analytics["period"] = period
+    return analytics
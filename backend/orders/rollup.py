@@ -0,0 +1,125 @@
+"""
+Инкрементальное ведение SalesRollup и чтение отчёта из него.
+
+Строки накопителя меняются одним INSERT ... ON CONFLICT DO UPDATE в той же
+транзакции, что и заказ. Разрезы (издательство, статус, состояние, жанры,
+авторы) всегда по текущим свойствам книги, как у расчёта по позициям: когда
+свойство меняется, оплаченные позиции книги вычитаются до изменения и
+прибавляются после (withdraw_books / apply_items, см. orders/signals.py и
+orders/checkout.py). Поэтому отмена заказа вычитает по тем же ключам, что
+лежат в накопителе.
+После массовых правок (queryset.update) накопитель пересобирается командой
+rebuild_sales_rollup.
+"""
+from django.db import connection, transaction
+
+from .models import Order, OrderItem, SalesRollup
+
+# Книга без жанров или авторов попадает в разрез с ключом 0 (в отчёте id=None)
+APPLY_SQL = """
+WITH items AS (
+    SELECT oi.price, o.date AS day, o.user_id, b.id AS book_id,
+           b.publisher_id, b.status, b.condition
+    FROM orders_orderitem oi
+    JOIN orders_order o ON o.id = oi.order_id
+    JOIN books_book b ON b.id = oi.book_id
+    WHERE {where}
+)
+INSERT INTO orders_salesrollup (day, user_id, dimension, key, count, total)
+SELECT day, user_id, dimension, key, %s * COUNT(*), %s * SUM(price)
+FROM (
+    SELECT day, user_id, 'total' AS dimension, 0::bigint AS key, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'publisher', publisher_id, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'status', status, price FROM items
+    UNION ALL
+    SELECT day, user_id, 'condition', condition, price FROM items
+    UNION ALL
+    SELECT i.day, i.user_id, 'genre', COALESCE(bg.genre_id, 0), i.price
+    FROM items i LEFT JOIN books_book_genres bg ON bg.book_id = i.book_id
+    UNION ALL
+    SELECT i.day, i.user_id, 'author', COALESCE(ba.author_id, 0), i.price
+    FROM items i LEFT JOIN books_book_authors ba ON ba.book_id = i.book_id
+) AS rows
+GROUP BY day, user_id, dimension, key
+ON CONFLICT (user_id, day, dimension, key) DO UPDATE
+SET count = orders_salesrollup.count + EXCLUDED.count,
+    total = orders_salesrollup.total + EXCLUDED.total
+"""
+
+READ_SQL = """
+SELECT r.dimension,
+       CASE WHEN r.dimension IN ('genre', 'author') THEN NULLIF(r.key, 0) ELSE r.key END,
+       COALESCE(p.name, g.name, a.name), SUM(r.count), SUM(r.total)
+FROM orders_salesrollup r
+LEFT JOIN books_publisher p ON r.dimension = 'publisher' AND p.id = r.key
+LEFT JOIN books_genre g ON r.dimension = 'genre' AND g.id = r.key
+LEFT JOIN books_author a ON r.dimension = 'author' AND a.id = r.key
+WHERE r.user_id = %s {where}
+GROUP BY r.dimension, r.key, p.name, g.name, a.name
+HAVING SUM(r.count) > 0
+"""
+
+
+def _apply(where, params, sign):
+    with connection.cursor() as cursor:
+        cursor.execute(APPLY_SQL.format(where=where), params + [sign, sign])
+
+
+def apply_order(order_id, sign):
+    """Добавляет (sign=1) или вычитает (sign=-1) все позиции заказа."""
+    _apply("oi.order_id = %s", [order_id], sign)
+
+
+def apply_items(item_ids, sign):
+    item_ids = list(item_ids)
+    if item_ids:
+        _apply("oi.id = ANY(%s)", [item_ids], sign)
+
+
+def withdraw_books(book_ids):
+    """
+    Вычитает оплаченные позиции книг перед изменением их свойств и возвращает
+    id позиций: после изменения их возвращают apply_items(ids, 1).
+    """
+    item_ids = list(
+        OrderItem.objects.filter(book_id__in=list(book_ids), order__status=Order.Status.ACCEPT)
+        .values_list("pk", flat=True)
+    )
+    apply_items(item_ids, -1)
+    return item_ids
+
+
+@transaction.atomic
+def rebuild_rollup(date_from=None, date_to=None):
+    """Пересчитывает накопитель за период (по умолчанию — целиком) из заказов."""
+    where, params = ["o.status = %s"], [Order.Status.ACCEPT]
+    rollup = SalesRollup.objects.all()
+    if date_from:
+        where.append("o.date >= %s")
+        params.append(date_from)
+        rollup = rollup.filter(day__gte=date_from)
+    if date_to:
+        where.append("o.date <= %s")
+        params.append(date_to)
+        rollup = rollup.filter(day__lte=date_to)
+    rollup.delete()
+    _apply(" AND ".join(where), params, 1)
+
+
+def rollup_rows(user, date_after=None, date_before=None):
+    """
+    Строки (разрез, ключ, название, количество, сумма) за период из накопителя —
+    в том же виде, что даёт сырой расчёт в orders.reports.
+    """
+    where, params = "", [user.pk]
+    if date_after:
+        where += " AND r.day >= %s"
+        params.append(date_after)
+    if date_before:
+        where += " AND r.day <= %s"
+        params.append(date_before)
+    with connection.cursor() as cursor:
+        cursor.execute(READ_SQL.format(where=where), params)
+        return cursor.fetchall()
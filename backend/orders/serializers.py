@@ -1,5 +1,9 @@
+from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
-from orders.models import Order, OrderItem
+from backend.cache import bump
+from orders.models import Order, OrderItem, ReportJob
+from orders.checkout import OutOfStock, reserve_books, unavailable_messages
 from books.models import Book
 from books.serializers import PublisherSerializer
 
@@ -96,49 +100,72 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         if not items:
             raise serializers.ValidationError("Корзина пуста.")
 
-        unavailable_books = []
-
+        # Одинаковые книги в корзине складываем в одну позицию
+        lines = {}
         for item in items:
-            book_id = item.get('id')
-            quantity_requested = int(item.get('quantity', 1))
-
             try:
-                book = Book.objects.get(pk=book_id)
-            except Book.DoesNotExist:
-                unavailable_books.append(f"id={book_id} (не существует)")
-                continue
-
-            if book.quantity < quantity_requested or book.status != 1:
-                unavailable_books.append(f"{book.title} (доступно {book.quantity})")
-
+                book_id = int(item.get('id'))
+                quantity_requested = int(item.get('quantity', 1))
+            except (AttributeError, TypeError, ValueError):
+                raise serializers.ValidationError("Некорректная позиция корзины.")
+            if quantity_requested < 1:
+                raise serializers.ValidationError("Количество должно быть положительным.")
+            lines[book_id] = lines.get(book_id, 0) + quantity_requested
+        return lines
+
+    def validate(self, data):
+        # Предварительная проверка без блокировок; окончательная — при списании
+        lines = data['items']
+        unavailable_books = unavailable_messages(lines, Book.objects.in_bulk(list(lines)))
         if unavailable_books:
             raise serializers.ValidationError({"unavailable_books": unavailable_books})
-
-        return items
+        return data
 
     def create(self, validated_data):
         user = self.context['request'].user
-        items_data = validated_data.pop('items')
+        lines = validated_data.pop('items')
         payment = validated_data.get('payment', 'H')
 
-        order = Order.objects.create(user=user, payment=payment, status=Order.Status.PENDING, amount=0)
-        total_amount = 0
+        try:
+            with transaction.atomic():
+                prices = reserve_books(lines)
+                if len(prices) != len(lines):
+                    # Кто-то успел купить раньше — откатываем всё списание
+                    raise OutOfStock()
+
+                order = Order.objects.create(
+                    user=user,
+                    payment=payment,
+                    status=Order.Status.PENDING,
+                    amount=sum(prices[book_id] * qty for book_id, qty in lines.items()),
+                )
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, book_id=book_id, price=prices[book_id], quantity=qty)
+                    for book_id, qty in lines.items()
+                ])
+                # update() и bulk_create() не шлют сигналы — сбрасываем кэш сами
+                bump("books", "auctions")
+        except OutOfStock:
+            unavailable_books = unavailable_messages(lines, Book.objects.in_bulk(list(lines)))
+            raise serializers.ValidationError({"unavailable_books": unavailable_books})
 
-        for item in items_data:
-            book = Book.objects.get(id=item['id'])
-            qty = int(item.get('quantity', 1))
+        return order
 
-            # Создаём OrderItem
-            OrderItem.objects.create(order=order, book=book, price=book.price, quantity=qty)
-            total_amount += book.price * qty
 
-            # Уменьшаем количество книг
-            book.quantity -= qty
-            if book.quantity <= 0:
-                book.quantity = 0
-                book.status = 2  # Продано
-            book.save(update_fields=['quantity', 'status'])
+class ReportJobSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'status', 'status_display', 'format', 'params', 'analytics',
+            'rows', 'error', 'created_at', 'finished_at', 'expires_at', 'download_url',
+        ]
 
-        order.amount = total_amount
-        order.save()
-        return order
\ No newline at end of file
+    def get_download_url(self, obj):
+        if obj.status != ReportJob.Status.DONE:
+            return None
+        url = reverse('report-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
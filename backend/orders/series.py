@@ -0,0 +1,126 @@
+"""
+Временные ряды продаж по дням, неделям или месяцам.
+
+Группировка по периодам выполняется в базе (date_trunc), в Python приходит
+по строке на непустой период. Пропуски, среднее, скользящее среднее и
+изменения к предыдущему периоду считаются векторно на массивах NumPy.
+"""
+import numpy as np
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import OrderItem, SalesRollup
+
+TRUNC = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+# Единица datetime64 и шаг оси для каждого периода (неделя — с понедельника)
+AXIS = {"day": ("D", 1), "week": ("D", 7), "month": ("M", 1)}
+MAX_BUCKETS = 3700
+MAX_WINDOW = 90
+
+
+def bucket_rows(sold_qs, granularity):
+    """(период, количество, сумма) по проданным позициям."""
+    trunc = TRUNC[granularity]
+    # pk__in убирает дубли строк из-за фильтров по жанрам/авторам
+    items = OrderItem.objects.filter(pk__in=sold_qs.order_by().values("pk"))
+    return (
+        items.annotate(bucket=trunc("order__date"))
+        .values("bucket")
+        .annotate(count=Count("id"), total=Sum("price"))
+        .order_by("bucket")
+        .values_list("bucket", "count", "total")
+    )
+
+
+def rollup_bucket_rows(user, granularity, start=None, end=None):
+    """То же из дневного накопителя — когда фильтры только по датам."""
+    rows = SalesRollup.objects.filter(user=user, dimension=SalesRollup.Dimension.TOTAL)
+    if start:
+        rows = rows.filter(day__gte=start)
+    if end:
+        rows = rows.filter(day__lte=end)
+    return (
+        rows.annotate(bucket=TRUNC[granularity]("day"))
+        .values("bucket")
+        .annotate(count=Sum("count"), total=Sum("total"))
+        .order_by("bucket")
+        .values_list("bucket", "count", "total")
+    )
+
+
+def _truncate(value, granularity):
+    unit, _ = AXIS[granularity]
+    day = np.datetime64(value, "D")
+    if granularity == "week":
+        # 1970-01-01 — четверг; сдвигаем к понедельнику
+        return day - ((day.astype(np.int64) + 3) % 7)
+    return day.astype(f"datetime64[{unit}]")
+
+
+def build_axis(granularity, start, end):
+    unit, step = AXIS[granularity]
+    first, last = _truncate(start, granularity), _truncate(end, granularity)
+    count = int((last - first).astype(np.int64)) // step + 1 if last >= first else 0
+    if count > MAX_BUCKETS:
+        raise ValueError(f"Слишком много периодов ({count}), максимум {MAX_BUCKETS}")
+    return first + np.arange(count) * step
+
+
+def _nullable(values):
+    return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+
+def moving_average(values, window):
+    """Скользящее среднее по window периодам; первые window-1 значений — NaN."""
+    result = np.full(values.shape, np.nan)
+    if window <= len(values):
+        cumsum = np.cumsum(np.insert(values, 0, 0.0))
+        result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def sales_series(rows, granularity, start=None, end=None, window=None, compare=False):
+    """
+    rows — (период, количество, сумма) по возрастанию периода.
+    Возвращает ряды одинаковой длины: пустые периоды заполнены нулями.
+    """
+    rows = list(rows)
+    if start is None and rows:
+        start = rows[0][0]
+    if end is None and rows:
+        end = rows[-1][0]
+    if start is None or end is None:
+        axis = np.array([], dtype="datetime64[D]")
+    else:
+        axis = build_axis(granularity, start, end)
+
+    count = np.zeros(len(axis))
+    total = np.zeros(len(axis))
+    if rows and len(axis):
+        buckets = np.array([_truncate(b, granularity) for b, _, _ in rows]).astype(axis.dtype)
+        positions = np.searchsorted(axis, buckets)
+        inside = (positions < len(axis)) & (axis[np.minimum(positions, len(axis) - 1)] == buckets)
+        count[positions[inside]] = np.array([c for _, c, _ in rows], dtype=float)[inside]
+        total[positions[inside]] = np.array([float(t or 0) for _, _, t in rows])[inside]
+
+    avg = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    series = {
+        "granularity": granularity,
+        "periods": [str(np.datetime64(p, "D")) for p in axis],
+        "count": count.astype(int).tolist(),
+        "total": _nullable(total),
+        "avg": _nullable(avg),
+    }
+
+    if window:
+        series["window"] = window
+        series["total_moving_avg"] = _nullable(moving_average(total, window))
+        series["count_moving_avg"] = _nullable(moving_average(count, window))
+
+    if compare:
+        previous = np.concatenate(([np.nan], total[:-1])) if len(total) else total
+        delta = total - previous
+        pct = np.divide(delta, previous, out=np.full_like(total, np.nan), where=previous > 0) * 100
+        series["total_delta"] = _nullable(delta)
+        series["total_delta_pct"] = _nullable(pct)
+    return series
@@ -0,0 +1,137 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from backend.cache import bump
+from books.models import Author, Book, Genre
+from .models import Order, OrderItem
+from .rollup import apply_items, apply_order, withdraw_books
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_history(sender, instance, **kwargs):
+    bump(f"orders:user:{instance.user_id}")
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_history(sender, instance, **kwargs):
+    user_id = Order.objects.filter(pk=instance.order_id).values_list("user_id", flat=True).first()
+    if user_id is not None:
+        bump(f"orders:user:{user_id}")
+
+
+# --- Накопитель продаж: учитываются только оплаченные заказы ---
+
+# Статус загруженного заказа неизвестен (поле отложено через only/defer)
+UNKNOWN_STATUS = object()
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    # __dict__: отложенное поле (only/defer) не должно вызывать запрос
+    if not instance.pk:
+        instance._loaded_status = None
+    else:
+        instance._loaded_status = instance.__dict__.get("status", UNKNOWN_STATUS)
+
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Без прежнего статуса переход не определить — не учитываем заказ повторно
+    if instance._loaded_status is not UNKNOWN_STATUS:
+        was_paid = instance._loaded_status == Order.Status.ACCEPT
+        is_paid = instance.status == Order.Status.ACCEPT
+        if is_paid != was_paid:
+            apply_order(instance.pk, 1 if is_paid else -1)
+    instance._loaded_status = instance.__dict__.get("status", UNKNOWN_STATUS)
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.order.status == Order.Status.ACCEPT:
+        apply_items([instance.pk], 1)
+
+
+@receiver(pre_delete, sender=OrderItem)
+def order_item_removed(sender, instance, **kwargs):
+    # До удаления: после него позицию уже не прочитать
+    if instance.order.status == Order.Status.ACCEPT:
+        apply_items([instance.pk], -1)
+
+
+# Смена свойств книги, входящих в разрезы накопителя, переносит её продажи:
+# вычитание — до изменения (в базе ещё прежние значения), сложение — после
+
+ROLLUP_BOOK_FIELDS = ("publisher_id", "status", "condition")
+
+
+@receiver(post_init, sender=Book)
+def remember_book_attributes(sender, instance, **kwargs):
+    # None — значение неизвестно (новая книга или отложенное поле)
+    instance._loaded_rollup = (
+        tuple(instance.__dict__.get(field) for field in ROLLUP_BOOK_FIELDS) if instance.pk else None
+    )
+
+
+def _attributes_changed(instance):
+    loaded = getattr(instance, "_loaded_rollup", None)
+    if loaded is None:
+        return False
+    current = tuple(getattr(instance, field) for field in ROLLUP_BOOK_FIELDS)
+    return any(old is not None and old != new for old, new in zip(loaded, current))
+
+
+@receiver(pre_save, sender=Book)
+def book_attributes_changing(sender, instance, raw=False, **kwargs):
+    instance._moved_items = []
+    if not raw and _attributes_changed(instance):
+        instance._moved_items = withdraw_books([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def book_attributes_changed(sender, instance, raw=False, **kwargs):
+    apply_items(getattr(instance, "_moved_items", []), 1)
+    instance._moved_items = []
+    instance._loaded_rollup = tuple(instance.__dict__.get(field) for field in ROLLUP_BOOK_FIELDS)
+
+
+def book_relations_changing(instance, action, reverse, pk_set):
+    """Жанры и авторы книги: pre_* вычитает её продажи, post_* возвращает."""
+    if action.startswith("post_"):
+        apply_items(getattr(instance, "_moved_items", []), 1)
+        instance._moved_items = []
+        return
+    if action == "pre_clear":
+        # book.genres.clear() или genre.books.clear()
+        book_ids = list(instance.books.values_list("pk", flat=True)) if reverse else [instance.pk]
+    elif pk_set:
+        book_ids = list(pk_set) if reverse else [instance.pk]
+    else:
+        book_ids = []
+    instance._moved_items = withdraw_books(book_ids) if book_ids else []
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_genres_changing(sender, instance, action, reverse, pk_set, **kwargs):
+    book_relations_changing(instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def book_authors_changing(sender, instance, action, reverse, pk_set, **kwargs):
+    book_relations_changing(instance, action, reverse, pk_set)
+
+
+# Удаление жанра или автора удаляет связи без m2m_changed
+@receiver(pre_delete, sender=Genre)
+@receiver(pre_delete, sender=Author)
+def book_relation_deleting(sender, instance, **kwargs):
+    instance._moved_items = withdraw_books(instance.books.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Author)
+def book_relation_deleted(sender, instance, **kwargs):
+    apply_items(getattr(instance, "_moved_items", []), 1)
@@ -0,0 +1,51 @@
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+
+from .jobs import IN_FLIGHT, delete_job_file, fail_stale_jobs, params_to_querydict, write_report_file
+from .models import ReportJob
+from .reports import filter_report_items, report_analytics
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_report_job(job_id):
+    # Захват задачи: повторная доставка того же сообщения ничего не сделает
+    if not ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.PENDING).update(
+        status=ReportJob.Status.RUNNING, started_at=timezone.now()
+    ):
+        return
+    job = ReportJob.objects.select_related("user").get(pk=job_id)
+    params = params_to_querydict(job.params)
+    try:
+        job.analytics = report_analytics(job.user, params)
+        job.file, job.rows = write_report_file(job, filter_report_items(job.user, params))
+        job.status = ReportJob.Status.DONE
+    except Exception as e:
+        logger.exception("Отчёт %s не построен", job_id)
+        job.status = ReportJob.Status.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    # Задачу, признанную потерянной (fail_stale_jobs), не перезаписываем
+    finished = ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.RUNNING).update(
+        status=job.status, analytics=job.analytics, file=job.file, rows=job.rows,
+        error=job.error, finished_at=job.finished_at,
+    )
+    if not finished:
+        delete_job_file(job)
+
+
+@shared_task
+def cleanup_report_jobs():
+    """Завершает потерянные задачи и удаляет истёкшие вместе с файлами."""
+    fail_stale_jobs()
+    # Файл выполняющейся задачи ещё пишется — её не трогаем
+    expired = ReportJob.objects.filter(expires_at__lte=timezone.now()).exclude(status__in=IN_FLIGHT)
+    removed = 0
+    for job in expired.iterator():
+        delete_job_file(job)
+        job.delete()
+        removed += 1
+    return removed
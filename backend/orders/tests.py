@@ -1,3 +1,565 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from threading import Barrier
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework import status
+from backend.celery import app as celery_app
+from backend.redis_client import get_redis
+from books.models import Author, Book, Genre, Publisher
+from users.models import CustomUser
+from .jobs import available_formats
+from .models import Order, OrderItem, ReportJob, SalesRollup
+from .reports import rollup_analytics
+from .tasks import cleanup_report_jobs
 
-# Create your tests here.
+
+class OrderTestMixin:
+
+    def create_user(self, email="user@mail.ru"):
+        return CustomUser.objects.create_user(
+            email=email, first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+
+    def create_book(self, title="Книга", price=100, quantity=1, **extra):
+        publisher, _ = Publisher.objects.get_or_create(name="Азбука")
+        fields = dict(
+            title=title, year=1990, publisher=publisher, condition=1,
+            description="", price=price, status=1, quantity=quantity,
+        )
+        fields.update(extra)
+        return Book.objects.create(**fields)
+
+
+class OrderHistoryConditionalTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.url = "/orders/history/"
+
+    def test_not_modified(self):
+        """Повторный запрос с If-None-Match отдаёт 304, новый заказ — 200"""
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        etag = first["ETag"]
+
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        order = Order.objects.create(user=self.user, payment=Order.Payment.CARD)
+        OrderItem.objects.create(order=order, book=self.create_book(), price=100)
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed["ETag"], etag)
+
+    def test_etag_is_per_user(self):
+        """ETag одного пользователя не подходит другому"""
+        etag = self.client.get(self.url)["ETag"]
+        self.client.force_authenticate(self.create_user("other@mail.ru"))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class OrderCreateTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.url = "/orders/create/"
+
+    def test_create_order(self):
+        """Заказ списывает экземпляры, одинаковые позиции складываются"""
+        first = self.create_book("Первая", price=100, quantity=3)
+        second = self.create_book("Вторая", price=250, quantity=1)
+        response = self.client.post(self.url, {
+            "payment": "C",
+            "items": [{"id": first.id, "quantity": 1}, {"id": second.id}, {"id": first.id, "quantity": 1}],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["amount"], "450.00")
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.quantity, first.status), (1, 1))
+        self.assertEqual((second.quantity, second.status), (0, 2))
+        self.assertEqual(OrderItem.objects.get(book=first).quantity, 2)
+
+    def test_unavailable_books(self):
+        """Недоступные книги возвращаются в unavailable_books, остатки не меняются"""
+        book = self.create_book("Редкая", quantity=1)
+        response = self.client.post(self.url, {
+            "payment": "C",
+            "items": [{"id": book.id, "quantity": 2}, {"id": 999999}],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data["unavailable_books"], ["Редкая (доступно 1)", "id=999999 (не существует)"]
+        )
+        book.refresh_from_db()
+        self.assertEqual(book.quantity, 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_invalid_quantity(self):
+        """Нулевое или отрицательное количество отклоняется"""
+        book = self.create_book()
+        response = self.client.post(self.url, {
+            "payment": "C", "items": [{"id": book.id, "quantity": -1}],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrderConcurrencyTests(OrderTestMixin, TransactionTestCase):
+    BUYERS = 8
+
+    def test_no_oversell(self):
+        """Параллельные покупки не продают больше, чем есть на складе"""
+        book = self.create_book("Последние экземпляры", quantity=3)
+        other = self.create_book("Соседняя", quantity=self.BUYERS)
+        users = [self.create_user(f"buyer{i}@mail.ru") for i in range(self.BUYERS)]
+        barrier = Barrier(self.BUYERS)
+
+        def buy(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            # Разный порядок позиций — проверка на дедлоки
+            items = [{"id": book.id}, {"id": other.id}]
+            if user.pk % 2:
+                items.reverse()
+            try:
+                barrier.wait()
+                return client.post("/orders/create/", {"payment": "C", "items": items}, format="json").status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.BUYERS) as pool:
+            codes = list(pool.map(buy, users))
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 3)
+        self.assertEqual(codes.count(status.HTTP_400_BAD_REQUEST), self.BUYERS - 3)
+        book.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((book.quantity, book.status), (0, 2))
+        self.assertEqual(other.quantity, self.BUYERS - 3)
+        self.assertEqual(OrderItem.objects.filter(book=book).count(), 3)
+
+
+class OrderReportTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.url = "/orders/report/items/"
+        self.prose = Genre.objects.create(name="Проза")
+        self.poetry = Genre.objects.create(name="Поэзия")
+        self.author = Author.objects.create(name="Пушкин")
+        self.novel = self.create_book("Роман", price=300, condition=2)
+        self.novel.genres.set([self.prose, self.poetry])
+        self.novel.authors.set([self.author])
+        self.verses = self.create_book("Стихи", price=100, status=3)
+        self.verses.genres.set([self.poetry])
+
+        paid = Order.objects.create(user=self.user, payment=Order.Payment.CARD, status=Order.Status.ACCEPT)
+        OrderItem.objects.create(order=paid, book=self.novel, price=300)
+        OrderItem.objects.create(order=paid, book=self.verses, price=100)
+        pending = Order.objects.create(user=self.user, payment=Order.Payment.CARD)
+        OrderItem.objects.create(order=pending, book=self.novel, price=300)
+
+    def test_analytics(self):
+        """Итоги и разрезы считаются по оплаченным позициям"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analytics = response.data["analytics"]
+        self.assertEqual(analytics["total_sold_count"], 2)
+        self.assertEqual(analytics["total_sales_amount"], 400.0)
+        self.assertEqual(analytics["average_price"], 200.0)
+        self.assertEqual(analytics["period"], {})
+        self.assertEqual(analytics["by_genres"], [
+            {"id": self.poetry.id, "name": "Поэзия", "count": 2, "total": 400.0, "avg": 200.0},
+            {"id": self.prose.id, "name": "Проза", "count": 1, "total": 300.0, "avg": 300.0},
+        ])
+        self.assertEqual(analytics["by_authors"], [
+            {"id": self.author.id, "name": "Пушкин", "count": 1, "total": 300.0, "avg": 300.0},
+            {"id": None, "name": "", "count": 1, "total": 100.0, "avg": 100.0},
+        ])
+        self.assertEqual(analytics["by_status"], [
+            {"status": 1, "label": "К продаже", "count": 1, "total": 300.0, "avg": 300.0},
+            {"status": 3, "label": "На аукционе", "count": 1, "total": 100.0, "avg": 100.0},
+        ])
+        self.assertEqual([c["condition"] for c in analytics["by_condition"]], [2, 1])
+        # Все позиции, включая неоплаченные
+        self.assertEqual(len(response.data["items"]), 3)
+
+    def test_filters_and_period(self):
+        """Фильтр по жанру сужает разрез, период совпадает с итогами"""
+        response = self.client.get(self.url, {"genres": str(self.prose.id), "date_after": "2000-01-01"})
+        analytics = response.data["analytics"]
+        self.assertEqual(analytics["total_sold_count"], 1)
+        self.assertEqual([g["id"] for g in analytics["by_genres"]], [self.prose.id])
+        self.assertEqual(analytics["period"], {
+            "start": "2000-01-01", "end": None, "count": 1, "total": 300.0, "avg": 300.0,
+        })
+
+    def test_single_analytics_query(self):
+        """Аналитика по позициям — один запрос независимо от числа разрезов"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {"price_min": 0})
+        self.assertEqual(sum("GROUPING SETS" in q["sql"] for q in queries.captured_queries), 1)
+        self.assertFalse(any("AVG" in q["sql"] and "GROUPING" not in q["sql"] for q in queries.captured_queries))
+
+
+class SalesRollupTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.genre = Genre.objects.create(name="Проза")
+        self.book = self.create_book("Роман", price=300)
+        self.book.genres.set([self.genre])
+        self.order = Order.objects.create(user=self.user, payment=Order.Payment.CARD)
+        OrderItem.objects.create(order=self.order, book=self.book, price=300)
+
+    def rollup(self, dimension, key):
+        row = SalesRollup.objects.filter(user=self.user, dimension=dimension, key=key).first()
+        return (row.count, row.total) if row else (0, 0)
+
+    def test_status_transitions(self):
+        """Оплата добавляет позиции заказа в накопитель, отмена — вычитает"""
+        self.assertEqual(self.rollup("total", 0), (0, 0))
+
+        self.order.status = Order.Status.ACCEPT
+        self.order.save(update_fields=["status"])
+        self.assertEqual(self.rollup("total", 0), (1, 300))
+        self.assertEqual(self.rollup("publisher", self.book.publisher_id), (1, 300))
+
+        # Позиция, добавленная в уже оплаченный заказ
+        OrderItem.objects.create(order=self.order, book=self.create_book("Другая", price=100), price=100)
+        self.assertEqual(self.rollup("total", 0), (2, 400))
+        self.assertEqual(self.rollup("publisher", self.book.publisher_id), (2, 400))
+
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = Order.Status.CANCELED
+        order.save()
+        self.assertEqual(self.rollup("total", 0), (0, 0))
+
+    def test_deferred_status(self):
+        """Сохранение заказа с отложенным статусом не учитывает его повторно"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        order = Order.objects.defer("status").get(pk=self.order.pk)
+        order.payment = Order.Payment.HANDS
+        order.save()
+        self.assertEqual(self.rollup("total", 0), (1, 300))
+
+    def test_report_matches_raw(self):
+        """Отчёт из накопителя совпадает с расчётом по позициям"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        today = str(self.order.date)
+
+        from_rollup = self.client.get("/orders/report/items/", {"date_after": today})
+        # Любой фильтр кроме дат — расчёт по позициям
+        from_raw = self.client.get("/orders/report/items/", {"date_after": today, "price_min": 0})
+        self.assertEqual(from_rollup.data["analytics"], from_raw.data["analytics"])
+        self.assertEqual(from_rollup.data["analytics"]["total_sold_count"], 1)
+
+        empty = self.client.get("/orders/report/items/", {"date_before": "2000-01-01"})
+        self.assertEqual(empty.data["analytics"]["total_sold_count"], 0)
+
+    def assert_matches_raw(self):
+        today = str(self.order.date)
+        from_rollup = self.client.get("/orders/report/items/", {"date_after": today})
+        # Любой фильтр кроме дат — расчёт по позициям
+        from_raw = self.client.get("/orders/report/items/", {"date_after": today, "price_min": 0})
+        self.assertEqual(from_rollup.data["analytics"], from_raw.data["analytics"])
+        return from_rollup.data["analytics"]
+
+    def test_all_dimensions_from_rollup(self):
+        """Отчёт только по датам читает все разрезы из накопителя, без запросов к позициям"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        self.book.authors.set([Author.objects.create(name="Гоголь")])
+        self.assertEqual(self.rollup("genre", self.genre.id), (1, 300))
+        self.assertEqual(self.rollup("condition", self.book.condition), (1, 300))
+        with CaptureQueriesContext(connection) as queries:
+            analytics = rollup_analytics(self.user, QueryDict(f"date_after={self.order.date}"))
+        self.assertEqual(len(queries), 1)
+        self.assertIn("orders_salesrollup", queries[0]["sql"])
+        self.assertEqual(analytics["by_authors"][0]["name"], "Гоголь")
+        self.assertEqual(analytics["by_genres"][0]["name"], "Проза")
+
+    def test_genre_changes_after_payment(self):
+        """Смена жанров книги после оплаты переносит её продажи в накопителе"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        poetry = Genre.objects.create(name="Поэзия")
+        self.book.genres.set([poetry])
+        self.assertEqual(self.rollup("genre", self.genre.id), (0, 0))
+        self.assertEqual(self.rollup("genre", poetry.id), (1, 300))
+        analytics = self.assert_matches_raw()
+        self.assertEqual([g["name"] for g in analytics["by_genres"]], ["Поэзия"])
+
+        # Со стороны жанра и удалением жанра
+        poetry.books.clear()
+        self.genre.books.add(self.book)
+        self.assertEqual(self.rollup("genre", self.genre.id), (1, 300))
+        self.genre.delete()
+        self.assertEqual(self.rollup("genre", 0), (1, 300))
+        analytics = self.assert_matches_raw()
+        self.assertEqual([g["id"] for g in analytics["by_genres"]], [None])
+
+    def test_book_changes_after_payment(self):
+        """Правка книги после оплаты: отчёт из накопителя совпадает с сырым, отмена не оставляет хвостов"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        self.book.genres.set([Genre.objects.create(name="Поэзия")])
+        self.book.authors.add(Author.objects.create(name="Гоголь"))
+        publisher = Publisher.objects.create(name="Наука")
+        self.book.publisher = publisher
+        self.book.status = 3
+        self.book.condition = 2
+        self.book.save()
+
+        analytics = self.assert_matches_raw()
+        self.assertEqual(analytics["by_publishers"][0]["id"], publisher.id)
+        self.assertEqual(analytics["by_status"][0]["status"], 3)
+
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = Order.Status.CANCELED
+        order.save()
+        self.assertFalse(SalesRollup.objects.exclude(count=0).exists())
+        self.assertFalse(SalesRollup.objects.filter(count__lt=0).exists())
+
+    def test_sold_out_at_checkout(self):
+        """Покупка последнего экземпляра меняет статус книги без сигналов — продажи переносятся"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        response = self.client.post(
+            "/orders/create/", {"payment": "C", "items": [{"id": self.book.id}]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rollup("status", 1), (0, 0))
+        self.assertEqual(self.rollup("status", 2), (1, 300))
+        self.assert_matches_raw()
+
+    def test_rebuild(self):
+        """Команда пересборки восстанавливает накопитель"""
+        self.order.status = Order.Status.ACCEPT
+        self.order.save()
+        SalesRollup.objects.all().delete()
+        call_command("rebuild_sales_rollup", stdout=StringIO())
+        self.assertEqual(self.rollup("total", 0), (1, 300))
+
+
+class OrderItemFeedTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.book = self.create_book("Роман, том 1", price=300)
+        for day in range(3):
+            order = Order.objects.create(user=self.user, payment=Order.Payment.CARD, status=Order.Status.ACCEPT)
+            Order.objects.filter(pk=order.pk).update(date=date(2024, 1, 1 + day))
+            OrderItem.objects.create(order=order, book=self.book, price=100 + day)
+        # Чужие заказы в отчёт не попадают
+        other = Order.objects.create(user=self.create_user("other@mail.ru"), payment=Order.Payment.CARD)
+        OrderItem.objects.create(order=other, book=self.book, price=999)
+
+    def test_cursor_feed(self):
+        """Лента по курсору отдаёт позиции по убыванию даты без повторов"""
+        url, prices = "/orders/report/items/feed/?page_size=2", []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            prices += [item["price"] for item in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(prices, ["102.00", "101.00", "100.00"])
+
+    def test_analytics_only(self):
+        """Аналитика отдаётся отдельно от позиций"""
+        response = self.client.get("/orders/report/analytics/", {"date_after": "2024-01-02"})
+        self.assertEqual(set(response.data), {"analytics"})
+        self.assertEqual(response.data["analytics"]["total_sold_count"], 2)
+
+    def test_csv_export(self):
+        """CSV выгружается потоком с подписями вместо кодов"""
+        response = self.client.get("/orders/report/items/export/csv/", {"date_before": "2024-01-02"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode("utf-8-sig").splitlines()))
+        self.assertEqual(rows[0][:3], ["id", "order_id", "order_date"])
+        self.assertEqual([row[2] for row in rows[1:]], ["2024-01-02", "2024-01-01"])
+        self.assertEqual(rows[1][7], "Роман, том 1")
+        self.assertEqual(rows[1][5], "Оплачен")
+
+    def test_ndjson_export(self):
+        """NDJSON — по объекту на строку"""
+        response = self.client.get("/orders/report/items/export/ndjson/")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["price"] for line in lines], ["102.00", "101.00", "100.00"])
+
+    def test_unknown_format(self):
+        """Неизвестный формат — 404"""
+        response = self.client.get("/orders/report/items/export/xml/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(REPORTS_ROOT=os.path.join(tempfile.gettempdir(), "rare_book_reports_test"))
+class ReportJobTests(OrderTestMixin, APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Задачи выполняются сразу, без брокера
+        celery_app.conf.task_always_eager = True
+
+    @classmethod
+    def tearDownClass(cls):
+        celery_app.conf.task_always_eager = False
+        shutil.rmtree(settings.REPORTS_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        order = Order.objects.create(user=self.user, payment=Order.Payment.CARD, status=Order.Status.ACCEPT)
+        for price in (100, 200):
+            OrderItem.objects.create(order=order, book=self.create_book(price=price), price=price)
+        self.url = "/orders/report/jobs/"
+
+    def test_job_lifecycle(self):
+        """Задача строит аналитику и файл, повторный запрос возвращает её же"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {"price_min": 50}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        job = self.client.get(f"{self.url}{response.data['id']}/").data
+        self.assertEqual(job["status"], ReportJob.Status.DONE)
+        self.assertEqual(job["rows"], 2)
+        self.assertEqual(job["analytics"]["total_sales_amount"], 300.0)
+
+        download = self.client.get(job["download_url"])
+        content = b"".join(download.streaming_content).decode("utf-8-sig")
+        self.assertEqual(len(content.splitlines()), 3)
+
+        again = self.client.post(self.url, {"price_min": "50"}, format="json")
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.data["id"], job["id"])
+
+    def test_parquet(self):
+        """Parquet читается обратно с теми же строками"""
+        if "parquet" not in available_formats():
+            self.skipTest("pyarrow не установлен")
+        import pyarrow.parquet
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {"format": "parquet"}, format="json")
+        job = ReportJob.objects.get(pk=response.data["id"])
+        table = pyarrow.parquet.read_table(job.file)
+        self.assertEqual(sorted(str(p) for p in table.column("price").to_pylist()), ["100.00", "200.00"])
+
+    def test_foreign_job(self):
+        """Чужая задача недоступна"""
+        with self.captureOnCommitCallbacks(execute=True):
+            job_id = self.client.post(self.url, {}, format="json").data["id"]
+        self.client.force_authenticate(self.create_user("other@mail.ru"))
+        self.assertEqual(self.client.get(f"{self.url}{job_id}/download/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cleanup(self):
+        """Истёкшие задачи удаляются вместе с файлом"""
+        with self.captureOnCommitCallbacks(execute=True):
+            job_id = self.client.post(self.url, {}, format="json").data["id"]
+        job = ReportJob.objects.get(pk=job_id)
+        ReportJob.objects.filter(pk=job_id).update(expires_at=timezone.now())
+        self.assertEqual(cleanup_report_jobs(), 1)
+        self.assertFalse(os.path.exists(job.file))
+        self.assertFalse(ReportJob.objects.exists())
+
+    def test_cleanup_keeps_in_flight(self):
+        """Истёкшая, но выполняющаяся задача не удаляется"""
+        job = ReportJob.objects.create(
+            user=self.user, fingerprint="x", status=ReportJob.Status.RUNNING,
+            started_at=timezone.now(), expires_at=timezone.now(),
+        )
+        self.assertEqual(cleanup_report_jobs(), 0)
+        self.assertTrue(ReportJob.objects.filter(pk=job.pk).exists())
+
+    def test_stale_job(self):
+        """Зависшая задача завершается ошибкой, и такой же запрос ставит новую"""
+        with self.captureOnCommitCallbacks(execute=False):
+            job_id = self.client.post(self.url, {}, format="json").data["id"]
+        stale = timezone.now() - settings.REPORT_JOB_STALE - timedelta(minutes=1)
+        ReportJob.objects.filter(pk=job_id).update(status=ReportJob.Status.RUNNING, started_at=stale)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(response.data["id"], job_id)
+        self.assertEqual(ReportJob.objects.get(pk=job_id).status, ReportJob.Status.FAILED)
+        self.assertEqual(ReportJob.objects.get(pk=response.data["id"]).status, ReportJob.Status.DONE)
+
+
+class SalesSeriesTests(OrderTestMixin, APITestCase):
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.client.force_authenticate(self.user)
+        self.genre = Genre.objects.create(name="Проза")
+        book = self.create_book(price=100)
+        book.genres.set([self.genre])
+        # 1, 2 и 5 января 2024 (понедельник — 1 января)
+        for day, price in ((1, 100), (2, 300), (5, 200), (5, 200), (15, 50)):
+            order = Order.objects.create(user=self.user, payment=Order.Payment.CARD, status=Order.Status.ACCEPT)
+            Order.objects.filter(pk=order.pk).update(date=date(2024, 1, day))
+            OrderItem.objects.create(order=order, book=book if day != 15 else self.create_book(), price=price)
+        self.url = "/orders/report/series/"
+
+    def test_daily_gap_filling(self):
+        """Дни без продаж заполняются нулями, скользящее среднее и изменения"""
+        response = self.client.get(self.url, {
+            "date_after": "2024-01-01", "date_before": "2024-01-06", "window": 2, "compare": 1,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data["periods"][0], "2024-01-01")
+        self.assertEqual(len(data["periods"]), 6)
+        self.assertEqual(data["count"], [1, 1, 0, 0, 2, 0])
+        self.assertEqual(data["total"], [100.0, 300.0, 0.0, 0.0, 400.0, 0.0])
+        self.assertEqual(data["avg"], [100.0, 300.0, 0.0, 0.0, 200.0, 0.0])
+        self.assertEqual(data["total_moving_avg"], [None, 200.0, 150.0, 0.0, 200.0, 200.0])
+        self.assertEqual(data["total_delta"], [None, 200.0, -300.0, 0.0, 400.0, -400.0])
+        self.assertEqual(data["total_delta_pct"], [None, 200.0, -100.0, None, None, -100.0])
+
+    def test_weekly_with_filter(self):
+        """Недели с понедельника; фильтр по жанру считается по позициям"""
+        response = self.client.get(self.url, {"granularity": "week", "genres": self.genre.id})
+        self.assertEqual(response.data["periods"], ["2024-01-01"])
+        self.assertEqual(response.data["total"], [800.0])
+
+        response = self.client.get(self.url, {"granularity": "week"})
+        self.assertEqual(response.data["periods"], ["2024-01-01", "2024-01-08", "2024-01-15"])
+        self.assertEqual(response.data["count"], [4, 0, 1])
+
+    def test_monthly(self):
+        """Месяцы без продаж до конца периода тоже попадают в ряд"""
+        response = self.client.get(self.url, {"granularity": "month", "date_before": "2024-03-31"})
+        self.assertEqual(response.data["periods"], ["2024-01-01", "2024-02-01", "2024-03-01"])
+        self.assertEqual(response.data["total"], [850.0, 0.0, 0.0])
+
+    def test_invalid_params(self):
+        """Неверный период или окно — 400"""
+        for params in ({"granularity": "year"}, {"window": "abc"}, {"date_after": "01.01.2024"}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,8 +1,20 @@
 from django.urls import path
-from .views import OrderItemReportView, OrderHistoryView, OrderCreateView
+from .views import (
+    OrderItemReportView, OrderHistoryView, OrderCreateView,
+    OrderReportAnalyticsView, OrderItemFeedView, OrderItemExportView,
+    ReportJobListCreateView, ReportJobDetailView, ReportJobDownloadView,
+    OrderSalesSeriesView,
+)
 
 urlpatterns = [
     path("history/", OrderHistoryView.as_view(), name="history"),
     path("create/", OrderCreateView.as_view(), name="order-create"),
     path("report/items/", OrderItemReportView.as_view(), name="orderitem-report"),  # <-- новый эндпоинт
+    path("report/analytics/", OrderReportAnalyticsView.as_view(), name="report-analytics"),
+    path("report/items/feed/", OrderItemFeedView.as_view(), name="orderitem-feed"),
+    path("report/items/export/<str:fmt>/", OrderItemExportView.as_view(), name="orderitem-export"),
+    path("report/series/", OrderSalesSeriesView.as_view(), name="report-series"),
+    path("report/jobs/", ReportJobListCreateView.as_view(), name="report-jobs"),
+    path("report/jobs/<int:pk>/", ReportJobDetailView.as_view(), name="report-job"),
+    path("report/jobs/<int:pk>/download/", ReportJobDownloadView.as_view(), name="report-job-download"),
 ]
\ No newline at end of file
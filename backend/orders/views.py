@@ -1,82 +1,52 @@
+import os
+from django.http import FileResponse
+from django.utils.dateparse import parse_date
 from rest_framework import generics, permissions
-from orders.models import Order, OrderItem
+from rest_framework.exceptions import NotFound, ValidationError
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import KeysetPagination
+from orders.models import Order, OrderItem, ReportJob
 from .serializers import OrderSerializer, OrderCreateSerializer
-from .serializers import OrderItemReportSerializer
-from django.db.models import Count, Sum, Avg, F, Q
+from .serializers import OrderItemReportSerializer, ReportJobSerializer
+from .reports import ROLLUP_PARAMS, filter_report_items, report_analytics
+from .export import FORMATS, streaming_export
+from .jobs import available_formats, find_or_create_job, params_to_dict
+from .series import MAX_WINDOW, TRUNC, bucket_rows, rollup_bucket_rows, sales_series
 from rest_framework.response import Response
-from books.models import Book, Genre, Author
 import logging
 from rest_framework import status
 
 
 logger = logging.getLogger(__name__)
 
-class OrderItemReportView(generics.ListAPIView):
-    permission_classes = [permissions.IsAuthenticated]
-    serializer_class = OrderItemReportSerializer
+class ReportItemPagination(KeysetPagination):
+    """Курсор по (дата заказа, id): глубокие страницы не дороже первой."""
+    page_size = 50
+    max_page_size = 500
+    ordering = ('-order__date',)
 
-    def parse_multi_param(self, request, name):
-        raw_list = request.query_params.getlist(name)
-        result = []
-        for entry in raw_list:
-            if not entry:
-                continue
-            parts = [p.strip() for p in entry.split(',') if p.strip()]
-            for p in parts:
-                try:
-                    result.append(int(p))
-                except ValueError:
-                    continue
-        return list(dict.fromkeys(result))
+
+class OrderItemReportMixin:
+    """Фильтры отчёта по продажам, общие для аналитики, ленты и выгрузки."""
+    permission_classes = [permissions.IsAuthenticated]
+    # Отчёт — десяток тяжёлых запросов: корзина расходуется быстрее (backend/throttling.py)
+    throttle_cost = 50
+    concurrency_class = "reports"
 
     def get_filtered_qs(self):
         """Возвращает OrderItem queryset с применёнными фильтрами (по user + параметрам)."""
-        user = self.request.user
-        params = self.request.query_params
-
-        qs = OrderItem.objects.select_related('order', 'book', 'book__publisher') \
-            .prefetch_related('book__authors', 'book__genres')
-
-        # показываем только свои заказы (при необходимости поменяйте)
-        qs = qs.filter(order__user=user)
-
-        # параметры
-        genre_list = self.parse_multi_param(self.request, 'genres')
-        author_list = self.parse_multi_param(self.request, 'authors')
-        publisher = params.get('publisher')
-        book_status = params.get('book_status')
-        book_condition = params.get('book_condition')
-        date_after = params.get('date_after')
-        date_before = params.get('date_before')
-        price_min = params.get('price_min')
-        price_max = params.get('price_max')
-
-        logger.debug("Report params: genres=%s authors=%s publisher=%s book_status=%s book_condition=%s date_after=%s date_before=%s price_min=%s price_max=%s",
-                     genre_list, author_list, publisher, book_status, book_condition, date_after, date_before, price_min, price_max)
-
-        if genre_list:
-            qs = qs.filter(book__genres__in=genre_list)
-        if author_list:
-            qs = qs.filter(book__authors__in=author_list)
-        if publisher:
-            try:
-                qs = qs.filter(book__publisher=int(publisher))
-            except ValueError:
-                pass
-        if book_status:
-            qs = qs.filter(book__status=book_status)
-        if book_condition:
-            qs = qs.filter(book__condition=book_condition)
-        if date_after:
-            qs = qs.filter(order__date__gte=date_after)
-        if date_before:
-            qs = qs.filter(order__date__lte=date_before)
-        if price_min:
-            qs = qs.filter(price__gte=price_min)
-        if price_max:
-            qs = qs.filter(price__lte=price_max)
-
-        return qs.distinct()
+        return filter_report_items(self.request.user, self.request.query_params)
+
+    def get_analytics(self):
+        return report_analytics(self.request.user, self.request.query_params)
+
+
+class OrderItemReportView(OrderItemReportMixin, generics.ListAPIView):
+    """
+    Аналитика и все позиции одним ответом (для старых клиентов).
+    Для больших периодов — report/analytics/, report/items/feed/ и report/items/export/.
+    """
+    serializer_class = OrderItemReportSerializer
 
     def list(self, request, *args, **kwargs):
         """
@@ -86,129 +56,145 @@ class OrderItemReportView(generics.ListAPIView):
           "items": [ ... serialized OrderItem ... ]
         }
         """
-        filtered_qs = self.get_filtered_qs()
-
-        # считаем "проданные" — позиции, где заказ оплачен (Order.Status.ACCEPT -> "A")
-        sold_qs = filtered_qs.filter(order__status=Order.Status.ACCEPT)
-
-        # 1) Количество проданных книг (экземпляров)
-        total_sold_count = sold_qs.count()
-
-        # 2) Общая сумма продаж
-        total_sales_amount = sold_qs.aggregate(total=Sum('price'))['total'] or 0
-
-        # 3) Средняя цена книги (по проданным)
-        avg_price = sold_qs.aggregate(avg=Avg('price'))['avg'] or 0
-
-        # 4) Продажи по жанрам
-        by_genres_qs = sold_qs.values('book__genres__id', 'book__genres__name') \
-            .annotate(count=Count('id'), total=Sum('price'), avg=Avg('price')) \
-            .order_by('-total')
-        by_genres = [
-            {
-                "id": g['book__genres__id'],
-                "name": g.get('book__genres__name') or "",
-                "count": g['count'],
-                "total": float(g['total'] or 0),
-                "avg": float(g['avg'] or 0)
-            }
-            for g in by_genres_qs
-        ]
-
-        # 5) Продажи по видам (поле book__status — используем display из модели Book)
-        by_status_qs = sold_qs.values('book__status').annotate(count=Count('id'), total=Sum('price'), avg=Avg('price')).order_by('-total')
-        # создаём отображение display -> значение
-        status_display_map = dict(Book.STATUS_CHOICES)
-        by_status = []
-        for s in by_status_qs:
-            key = s['book__status']
-            by_status.append({
-                "status": key,
-                "label": status_display_map.get(key, str(key)),
-                "count": s['count'],
-                "total": float(s['total'] or 0),
-                "avg": float(s['avg'] or 0)
-            })
-
-        # 6) Продажи по состояниям (book__condition)
-        condition_map = dict(Book.CONDITION_CHOICES)
-        by_condition_qs = sold_qs.values('book__condition').annotate(count=Count('id'), total=Sum('price'), avg=Avg('price')).order_by('-total')
-        by_condition = []
-        for c in by_condition_qs:
-            key = c['book__condition']
-            by_condition.append({
-                "condition": key,
-                "label": condition_map.get(key, str(key)),
-                "count": c['count'],
-                "total": float(c['total'] or 0),
-                "avg": float(c['avg'] or 0)
-            })
-
-        # 7) Продажи по авторам
-        by_authors_qs = sold_qs.values('book__authors__id', 'book__authors__name') \
-            .annotate(count=Count('id'), total=Sum('price'), avg=Avg('price')) \
-            .order_by('-total')
-        by_authors = [
-            {
-                "id": a['book__authors__id'],
-                "name": a.get('book__authors__name') or "",
-                "count": a['count'],
-                "total": float(a['total'] or 0),
-                "avg": float(a['avg'] or 0)
-            } for a in by_authors_qs
-        ]
-
-        # 8) Продажи за период: если указан date_after/date_before — пересчитаем для периода
-        params = request.query_params
-        date_after = params.get('date_after')
-        date_before = params.get('date_before')
-        period = {}
-        if date_after or date_before:
-            period_qs = sold_qs
-            if date_after:
-                period_qs = period_qs.filter(order__date__gte=date_after)
-            if date_before:
-                period_qs = period_qs.filter(order__date__lte=date_before)
-            period_count = period_qs.count()
-            period_total = period_qs.aggregate(total=Sum('price'))['total'] or 0
-            period_avg = period_qs.aggregate(avg=Avg('price'))['avg'] or 0
-            period = {
-                "start": date_after,
-                "end": date_before,
-                "count": period_count,
-                "total": float(period_total),
-                "avg": float(period_avg)
-            }
-
-        analytics = {
-            "total_sold_count": total_sold_count,
-            "total_sales_amount": float(total_sales_amount),
-            "average_price": float(avg_price),
-            "by_genres": by_genres,
-            "by_status": by_status,
-            "by_condition": by_condition,
-            "by_authors": by_authors,
-            "period": period,
-        }
+        analytics = self.get_analytics()
 
         # Сериализуем позиции (фильтрованные, не только проданные)
-        serializer = self.get_serializer(filtered_qs.order_by('-order__date'), many=True)
+        serializer = self.get_serializer(self.get_filtered_qs().order_by('-order__date'), many=True)
 
         return Response({
             "analytics": analytics,
             "items": serializer.data
         })
 
-class OrderHistoryView(generics.ListAPIView):
+
+class OrderReportAnalyticsView(OrderItemReportMixin, generics.GenericAPIView):
+    """Только аналитика отчёта по продажам"""
+
+    def get(self, request, *args, **kwargs):
+        return Response({"analytics": self.get_analytics()})
+
+
+class OrderItemFeedView(OrderItemReportMixin, generics.ListAPIView):
+    """Позиции отчёта страницами по курсору (новые заказы первыми)"""
+    serializer_class = OrderItemReportSerializer
+    pagination_class = ReportItemPagination
+    # Страница по курсору дешёвая — как обычный запрос
+    throttle_cost = 1
+
+    def get_queryset(self):
+        return self.get_filtered_qs()
+
+
+class OrderItemExportView(OrderItemReportMixin, generics.GenericAPIView):
+    """Потоковая выгрузка позиций отчёта: report/items/export/csv/ или .../ndjson/"""
+
+    def get(self, request, fmt, *args, **kwargs):
+        if fmt not in FORMATS:
+            raise NotFound(f"Формат {fmt} не поддерживается")
+        return streaming_export(self.get_filtered_qs(), fmt, "sales_report")
+
+
+class OrderSalesSeriesView(OrderItemReportMixin, generics.GenericAPIView):
+    """
+    Ряды продаж (количество, сумма, средняя цена) по периодам:
+    ?granularity=day|week|month, те же фильтры, что у отчёта,
+    ?window=N — скользящее среднее, ?compare=1 — изменение к прошлому периоду.
+    """
+
+    def parse_date_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValidationError({name: "Ожидается дата в формате ГГГГ-ММ-ДД"})
+        return parsed
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        granularity = params.get('granularity', 'day')
+        if granularity not in TRUNC:
+            raise ValidationError({"granularity": f"Допустимо: {', '.join(TRUNC)}"})
+        try:
+            window = int(params.get('window') or 0)
+        except ValueError:
+            raise ValidationError({"window": "Ожидается число"})
+        if not 0 <= window <= MAX_WINDOW:
+            raise ValidationError({"window": f"От 0 до {MAX_WINDOW}"})
+        start, end = self.parse_date_param('date_after'), self.parse_date_param('date_before')
+
+        # Фильтры только по датам — ряд собирается из дневного накопителя
+        ignored = {'granularity', 'window', 'compare'}
+        if {key for key, value in params.items() if value} - ignored <= ROLLUP_PARAMS:
+            rows = rollup_bucket_rows(request.user, granularity, start, end)
+        else:
+            sold_qs = self.get_filtered_qs().filter(order__status=Order.Status.ACCEPT)
+            rows = bucket_rows(sold_qs, granularity)
+
+        try:
+            series = sales_series(
+                rows, granularity, start, end, window=window or None,
+                compare=params.get('compare') in ('1', 'true'),
+            )
+        except ValueError as e:
+            raise ValidationError({"granularity": str(e)})
+        return Response(series)
+
+
+class ReportJobListCreateView(generics.ListCreateAPIView):
+    """
+    Фоновые отчёты. POST с теми же фильтрами, что у report/items/, и format
+    (csv или parquet) ставит задачу; одинаковый запрос вернёт уже существующую.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReportJobSerializer
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        fmt = request.data.get('format') or ReportJob.Format.CSV
+        if fmt not in available_formats():
+            raise ValidationError({"format": f"Доступные форматы: {', '.join(available_formats())}"})
+        job, created = find_or_create_job(request.user, params_to_dict(request.data), fmt)
+        serializer = self.get_serializer(job)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class ReportJobDetailView(generics.RetrieveAPIView):
+    """Статус фонового отчёта (опрашивается клиентом)"""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = ReportJobSerializer
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user)
+
+
+class ReportJobDownloadView(ReportJobDetailView):
+    """Файл готового отчёта"""
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != ReportJob.Status.DONE or not os.path.exists(job.file):
+            raise NotFound("Отчёт ещё не готов или уже удалён")
+        return FileResponse(open(job.file, "rb"), as_attachment=True, filename=os.path.basename(job.file))
+
+
+class OrderHistoryView(ConditionalGetMixin, generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderSerializer
 
+    def get_etag_namespaces(self):
+        # books — в позициях отдаётся текущее количество книги
+        return (f"orders:user:{self.request.user.pk}", "books")
+
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).prefetch_related('items__book').order_by('-date')
 
 
 class OrderCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    concurrency_class = "checkout"
     serializer_class = OrderCreateSerializer
 
     def post(self, request, *args, **kwargs):
@@ -0,0 +1,71 @@
+"""
+JWT-аутентификация без запроса пользователя к базе.
+
+Права берутся из подписанных данных токена (tokens.py), отзыв — по поколению
+токенов (revocation.py). request.user — экземпляр CustomUser, у которого
+загружены только id и поля из токена: его можно передавать в фильтры и внешние
+ключи, остальные поля подгружаются из базы при обращении.
+
+Токены без данных (выданные до перехода) и запросы при недоступном Redis
+проверяются прежним способом — чтением пользователя из базы.
+"""
+import logging
+
+import redis
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from backend import metrics
+from .models import CustomUser
+from .revocation import current_epoch
+from .tokens import CLAIM_FIELDS, EPOCH_CLAIM
+
+logger = logging.getLogger(__name__)
+
+BLOCKED = 2
+
+
+def check_user(user):
+    if user.status == BLOCKED:
+        raise AuthenticationFailed("Аккаунт заблокирован", code="user_blocked")
+    if not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if EPOCH_CLAIM not in validated_token or any(f not in validated_token for f in CLAIM_FIELDS):
+            return self.get_db_user(validated_token)
+        try:
+            epoch = current_epoch(user_id)
+        except redis.RedisError:
+            logger.warning("Поколение токенов недоступно, проверяем пользователя по базе", exc_info=True)
+            return self.get_db_user(validated_token)
+
+        if epoch is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if validated_token[EPOCH_CLAIM] < epoch:
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+
+        # from_db ждёт значения в порядке полей модели; незагруженные поля — отложенные
+        claims = {"id": user_id, **{field: validated_token[field] for field in CLAIM_FIELDS}}
+        names = [f.attname for f in CustomUser._meta.concrete_fields if f.attname in claims]
+        user = CustomUser.from_db(CustomUser.objects.db, names, [claims[name] for name in names])
+        check_user(user)
+        return user
+
+    def get_db_user(self, validated_token):
+        metrics.incr("auth_db_lookups_total")
+        user = super().get_user(validated_token)
+        check_user(user)
+        if validated_token.get(EPOCH_CLAIM, user.token_epoch) < user.token_epoch:
+            raise AuthenticationFailed("Токен отозван", code="token_revoked")
+        return user
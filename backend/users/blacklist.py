@@ -0,0 +1,84 @@
+"""
+Чёрный список refresh-токенов в Redis.
+
+Отозванный jti хранится ключом auth:blacklist:<jti> ровно до истечения
+токена, поэтому проверка при обновлении — один GET, сколько бы токенов ни
+было выдано. Таблицы token_blacklist остаются журналом: из них список
+восстанавливается, если Redis потерял данные (нет ключа-маркера), и по ним
+проверяем при недоступном Redis. Загружает список один процесс, остальные
+на это время проверяют по базе. Истёкшие строки удаляет prune_token_tables.
+"""
+import logging
+import time
+
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY = "auth:blacklist:{}"
+# Есть, пока список в Redis полный; пропал (сброс, потеря данных) — загружаем из базы
+LOADED_KEY = "auth:blacklist:loaded"
+LOADING_KEY = "auth:blacklist:loading"
+LOAD_BATCH = 5000
+# Не дольше этого держится блокировка загрузки, если процесс упал посреди неё
+LOAD_LOCK_TIMEOUT = 60
+
+
+def _ttl(exp):
+    return max(int(exp - time.time()), 1)
+
+
+def add(jti, exp):
+    """Отзывает jti до момента exp (секунды эпохи)."""
+    get_redis().set(BLACKLIST_KEY.format(jti), 1, ex=_ttl(exp))
+
+
+def is_blacklisted(jti):
+    """
+    None — список загружает другой процесс, Redis недоступен — RedisError:
+    в обоих случаях проверять по базе.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.exists(LOADED_KEY)
+    pipe.exists(BLACKLIST_KEY.format(jti))
+    loaded, listed = pipe.execute()
+    if not loaded:
+        if load() is None:
+            return None
+        listed = get_redis().exists(BLACKLIST_KEY.format(jti))
+    return bool(listed)
+
+
+def load():
+    """
+    Переносит в Redis неистёкшие отозванные токены из базы. Возвращает их
+    число или None, если список уже загружает другой процесс.
+    """
+    client = get_redis()
+    if not client.set(LOADING_KEY, 1, nx=True, ex=LOAD_LOCK_TIMEOUT):
+        return None
+    try:
+        return _load(client)
+    finally:
+        client.delete(LOADING_KEY)
+
+
+def _load(client):
+    rows = (
+        BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        .values_list("token__jti", "token__expires_at")
+    )
+    pipe = client.pipeline(transaction=False)
+    loaded = 0
+    for jti, expires_at in rows.iterator(chunk_size=LOAD_BATCH):
+        pipe.set(BLACKLIST_KEY.format(jti), 1, ex=_ttl(expires_at.timestamp()))
+        loaded += 1
+        if loaded % LOAD_BATCH == 0:
+            pipe.execute()
+    pipe.set(LOADED_KEY, 1)
+    pipe.execute()
+    logger.info("Чёрный список токенов загружен из базы: %s", loaded)
+    return loaded
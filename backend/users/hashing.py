@@ -0,0 +1,137 @@
+"""
+Хэширование паролей в отдельном пуле процессов.
+
+PBKDF2 занимает процесс на десятки миллисекунд. Пока он считался в воркере
+запроса, всплеск входов перед крупным аукционом занимал все воркеры, и
+вставали ставки и каталог. Теперь хэши считает пул из PASSWORD_HASH_WORKERS
+процессов, а ждать в очереди могут не больше PASSWORD_HASH_QUEUE задач:
+сверх этого запрос сразу получает 429 (HashingBusy) вместо ожидания.
+
+CustomUser.set_password/check_password (models.py) идут через этот модуль,
+поэтому authenticate(), регистрация и смена пароля используют пул без
+изменений в представлениях. При PASSWORD_HASH_WORKERS = 0 хэш считается
+в процессе запроса, как раньше.
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import Throttled
+
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+
+
+class HashingBusy(Throttled):
+    default_detail = "Сервер перегружен, повторите попытку позже"
+    default_code = "hashing_busy"
+
+
+def _init_worker():
+    django.setup()
+
+
+def _verify(raw_password, encoded):
+    return hashers.verify_password(raw_password, encoded)
+
+
+def _get_pool():
+    global _pool, _slots
+    with _lock:
+        if _pool is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            # spawn: дочерним процессам не достаются соединения с базой и Redis родителя
+            _pool = ProcessPoolExecutor(
+                workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+            )
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_QUEUE)
+        return _pool, _slots
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _discard(pool):
+    # Процесс пула упал — следующий вызов создаст пул заново. Сбрасываем
+    # только этот пул: другой поток мог уже создать новый. Без ожидания —
+    # вызывается и из потока самого пула
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    logger.error("Пул хэширования паролей сломан, будет создан заново")
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(fn, *args):
+    """Ставит задачу в пул; если свободных мест нет или пул сломан — HashingBusy."""
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        metrics.incr("password_hash_rejected_total")
+        raise HashingBusy(wait=settings.PASSWORD_HASH_RETRY_AFTER)
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _discard(pool)
+        raise HashingBusy(wait=settings.PASSWORD_HASH_RETRY_AFTER)
+
+    def done(future):
+        slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            _discard(pool)
+
+    future.add_done_callback(done)
+    return future
+
+
+def run(fn, *args):
+    if not settings.PASSWORD_HASH_WORKERS:
+        return fn(*args)
+    try:
+        return submit(fn, *args).result()
+    except BrokenProcessPool:
+        raise HashingBusy(wait=settings.PASSWORD_HASH_RETRY_AFTER)
+
+
+async def arun(fn, *args):
+    """Для асинхронного кода: ожидание результата не занимает цикл событий."""
+    if not settings.PASSWORD_HASH_WORKERS:
+        return fn(*args)
+    try:
+        return await asyncio.wrap_future(submit(fn, *args))
+    except BrokenProcessPool:
+        raise HashingBusy(wait=settings.PASSWORD_HASH_RETRY_AFTER)
+
+
+def make_password(raw_password):
+    return run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """(верен ли пароль, нужно ли пересчитать хэш) — как hashers.verify_password."""
+    return run(_verify, raw_password, encoded)
+
+
+async def amake_password(raw_password):
+    return await arun(hashers.make_password, raw_password)
+
+
+async def averify_password(raw_password, encoded):
+    return await arun(_verify, raw_password, encoded)
@@ -0,0 +1,123 @@
+"""
+Всплеск входов на веб-процесс с ограниченным числом потоков: сколько входов
+проходит, сколько получает 429 и насколько при этом замедляется остальной
+трафик (список книг).
+
+    python manage.py bench_login --threads 8 --clients 32 --readers 2 --duration 10
+    python manage.py bench_login --inline     # хэш в потоке запроса, без пула
+    python manage.py bench_login --cleanup
+
+Данные создаются с префиксом bench-login и только для разработческой базы.
+"""
+import contextlib
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from users import hashing
+from users.models import CustomUser
+
+BENCH_PREFIX = "bench-login"
+PASSWORD = "benchPass123"
+
+
+def quantile(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0
+
+
+def login(email):
+    response = Client(HTTP_HOST="localhost").post("/users/login/", {"email": email, "password": PASSWORD})
+    return response.status_code, float(response.get("Retry-After", 0))
+
+
+def read_books():
+    return Client(HTTP_HOST="localhost").get("/books/").status_code, 0
+
+
+class Command(BaseCommand):
+    help = "Пропускная способность входа и задержка остального трафика при всплеске входов"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Потоков веб-процесса")
+        parser.add_argument("--clients", type=int, default=32, help="Параллельных клиентов входа")
+        parser.add_argument("--readers", type=int, default=2, help="Параллельных клиентов списка книг")
+        parser.add_argument("--duration", type=float, default=10, help="Секунд на прогон")
+        parser.add_argument("--inline", action="store_true", help="Считать хэш в потоке запроса")
+        parser.add_argument("--cleanup", action="store_true", help="Удалить тестовые данные")
+
+    def handle(self, *args, threads, clients, readers, duration, inline, cleanup, **options):
+        if cleanup:
+            CustomUser.objects.filter(email__startswith=f"{BENCH_PREFIX}-").delete()
+            self.stdout.write("Тестовые данные удалены")
+            return
+
+        # 429 пишутся в лог django.request предупреждениями — в замере они не нужны
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        emails = [self.get_user(i).email for i in range(clients)]
+        mode = "в потоке запроса" if inline else "пул процессов"
+        self.stdout.write(f"{threads} потоков, {clients} клиентов входа, {duration:g} с, хэширование: {mode}")
+
+        if not inline:
+            # Запуск процессов пула в замер не входит
+            hashing.make_password(PASSWORD)
+        with override_settings(PASSWORD_HASH_WORKERS=0) if inline else contextlib.nullcontext():
+            logins, reads, elapsed = self.run(emails, threads, readers, duration)
+
+        ok = [latency for status, latency in logins if status == 200]
+        busy = sum(1 for status, _ in logins if status == 429)
+        latencies = sorted(latency for _, latency in logins)
+        reads = sorted(reads)
+        self.stdout.write(
+            f"Входов: {len(ok)} ({len(ok) / elapsed:.1f}/с), 429: {busy}, "
+            f"прочих ошибок: {len(logins) - len(ok) - busy}"
+        )
+        self.stdout.write(
+            f"Ответ на вход: медиана {statistics.median(latencies) * 1000:.0f} мс, "
+            f"p95 {quantile(latencies, 0.95) * 1000:.0f} мс"
+        )
+        if reads:
+            self.stdout.write(
+                f"Список книг во время всплеска: {len(reads)} запросов, медиана "
+                f"{statistics.median(reads) * 1000:.0f} мс, p95 {quantile(reads, 0.95) * 1000:.0f} мс"
+            )
+        hashing.shutdown()
+
+    def run(self, emails, threads, readers, duration):
+        # Потоки сервера: запрос ждёт свободный поток, как в gunicorn gthread
+        server = ThreadPoolExecutor(threads)
+        logins, reads = [], []
+        lock = threading.Lock()
+        deadline = time.monotonic() + duration
+
+        def client(fn, arg, results):
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                status, retry_after = server.submit(fn, *arg).result()
+                with lock:
+                    results.append((status, time.perf_counter() - started))
+                # Клиент, получивший 429, ждёт Retry-After, как фронтенд
+                time.sleep(retry_after)
+
+        workers = [threading.Thread(target=client, args=(login, (email,), logins)) for email in emails]
+        workers += [threading.Thread(target=client, args=(read_books, (), reads)) for _ in range(readers)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        return logins, [latency for _, latency in reads], elapsed
+
+    def get_user(self, index):
+        email = f"{BENCH_PREFIX}-{index}@example.com"
+        user = CustomUser.objects.filter(email=email).first()
+        return user or CustomUser.objects.create_user(
+            email=email, first_name="Бенч", last_name="Вход", password=PASSWORD
+        )
+
@@ -0,0 +1,125 @@
+"""
+Отзыв JWT без запроса к базе на каждый запрос.
+
+У пользователя есть поколение токенов token_epoch; токен несёт поколение,
+на момент выдачи (claim "ep"), и действителен, пока оно не меньше текущего.
+Блокировка, смена прав, email или пароля увеличивают поколение (signals.py).
+
+Текущее поколение читается из небольшого LRU в памяти процесса (живёт
+AUTH_REVOCATION_CACHE_TTL секунд — за это время отзыв доходит до всех
+процессов), за ним — Redis, за ним — база, которая и хранит значение.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from backend.redis_client import get_redis
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+EPOCH_KEY = "auth:epoch:{}"
+# Redis — только кэш базы: значение, которое не удалось обновить при отзыве,
+# проживёт не дольше этого времени
+EPOCH_TTL = 10 * 60
+PUBLISH_ATTEMPTS = 2
+LOCAL_SIZE = 10000
+
+
+class EpochCache:
+    """LRU с временем жизни записей; потокобезопасный."""
+
+    def __init__(self, size=LOCAL_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            epoch, expires = entry
+            if expires < time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return epoch
+
+    def set(self, user_id, epoch):
+        with self.lock:
+            self.entries[user_id] = (epoch, time.monotonic() + settings.AUTH_REVOCATION_CACHE_TTL)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_epochs = EpochCache()
+
+
+def current_epoch(user_id):
+    """Текущее поколение или None, если пользователя нет. Redis недоступен — RedisError."""
+    epoch = local_epochs.get(user_id)
+    if epoch is not None:
+        return epoch
+    client = get_redis()
+    value = client.get(EPOCH_KEY.format(user_id))
+    if value is None:
+        epoch = CustomUser.objects.filter(pk=user_id).values_list("token_epoch", flat=True).first()
+        if epoch is None:
+            return None
+        client.set(EPOCH_KEY.format(user_id), epoch, ex=EPOCH_TTL, nx=True)
+    else:
+        epoch = int(value)
+    local_epochs.set(user_id, epoch)
+    return epoch
+
+
+def _publish_epoch(user_id, epoch):
+    key = EPOCH_KEY.format(user_id)
+    for _ in range(PUBLISH_ATTEMPTS):
+        try:
+            get_redis().set(key, epoch, ex=EPOCH_TTL)
+            return
+        except redis.RedisError:
+            logger.warning("Не удалось записать поколение токенов пользователя %s", user_id, exc_info=True)
+    # Прежнее поколение в Redis оставлять нельзя — с ним отозванные токены действительны.
+    # Без ключа поколение перечитается из базы; без Redis проверка и так идёт по базе
+    try:
+        get_redis().delete(key)
+    except redis.RedisError:
+        logger.error(
+            "Поколение токенов пользователя %s в Redis устарело до %s с", user_id, EPOCH_TTL, exc_info=True
+        )
+
+
+def revoke(user):
+    """Отзывает все токены пользователя; user.token_epoch обновляется на месте."""
+    CustomUser.objects.filter(pk=user.pk).update(token_epoch=F("token_epoch") + 1)
+    user.token_epoch = CustomUser.objects.filter(pk=user.pk).values_list("token_epoch", flat=True).get()
+    epoch = user.token_epoch
+    local_epochs.discard(user.pk)
+    transaction.on_commit(lambda: _publish_epoch(user.pk, epoch))
+
+
+def forget(user_id):
+    """Удалённый пользователь: поколение перечитается из базы и не найдётся."""
+    local_epochs.discard(user_id)
+    try:
+        get_redis().delete(EPOCH_KEY.format(user_id))
+    except redis.RedisError:
+        logger.warning("Не удалось удалить поколение токенов пользователя %s", user_id, exc_info=True)
@@ -8,7 +8,7 @@ class CustomUserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CustomUser
-        exclude = ["password"]
+        exclude = ["password", "token_epoch"]
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser
+from .revocation import forget, revoke
+from .tokens import CLAIM_FIELDS
+
+# Изменение этих полей отзывает выданные токены: данные в них устарели или сменился пароль
+REVOKING_FIELDS = CLAIM_FIELDS + ("password",)
+
+
+def token_state(instance):
+    # Только загруженные поля: отложенное (пользователь из токена, only/defer) не должно вызывать запрос
+    return {name: instance.__dict__[name] for name in REVOKING_FIELDS if name in instance.__dict__}
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_token_state(sender, instance, **kwargs):
+    instance._token_state = token_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_changed_tokens(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        instance._token_state = token_state(instance)
+        return
+    loaded, current = instance._token_state, token_state(instance)
+    instance._token_state = current
+    if loaded is None:
+        revoke(instance)
+        return
+    changed = {name for name, value in loaded.items() if current.get(name, value) != value}
+    # Новый хэш без нового пароля (_password не задан) — пересчёт при входе, не смена пароля
+    if instance._password is None:
+        changed.discard("password")
+    if changed:
+        revoke(instance)
+
+
+@receiver(post_delete, sender=CustomUser)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget(instance.pk)
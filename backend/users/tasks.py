@@ -0,0 +1,30 @@
+from celery import shared_task
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from . import blacklist
+
+PRUNE_BATCH = 5000
+
+
+@shared_task
+def prune_token_tables(batch_size=PRUNE_BATCH):
+    """
+    Удаляет истёкшие токены из таблиц token_blacklist пачками —
+    короткие транзакции без долгих блокировок. Возвращает число удалённых.
+    """
+    now = aware_utcnow()
+    removed = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lte=now)
+            .order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        BlacklistedToken.objects.filter(token_id__in=ids).delete()
+        OutstandingToken.objects.filter(id__in=ids).delete()
+        removed += len(ids)
+    # Страховка на случай, если запись в Redis при отзыве не удалась
+    blacklist.load()
+    return removed
@@ -1,7 +1,24 @@
+import os
+import threading
+from datetime import timedelta
+from unittest import mock
+
+import redis
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
+from backend.redis_client import get_redis
+from . import hashing
+from .blacklist import BLACKLIST_KEY, LOADED_KEY, LOADING_KEY
 from .models import CustomUser
+from .revocation import EPOCH_KEY, local_epochs
+from .tasks import prune_token_tables
+from .tokens import UserRefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
@@ -121,3 +138,210 @@ class UserTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIn("detail", response.data)
+
+
+class TokenClaimsTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="bidder@mail.ru", first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+        self.admin = CustomUser.objects.create_superuser(
+            email="admin@mail.ru", first_name="Админ", last_name="Админов", password="securePass123"
+        )
+        for user in (self.user, self.admin):
+            get_redis().delete(EPOCH_KEY.format(user.pk))
+        local_epochs.clear()
+        self.token = self.login(self.user)
+
+    def login(self, user):
+        response = self.client.post(reverse("login"), {"email": user.email, "password": "securePass123"})
+        return response.data["access"]
+
+    def get(self, url, token):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_no_user_query(self):
+        """Запрос с токеном не читает пользователя из базы"""
+        self.get("/auctions/bids/history/", self.token)
+        with self.assertNumQueries(1):
+            response = self.get("/auctions/bids/history/", self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_blocked_user(self):
+        """Блокировка из панели отзывает токены и в других процессах"""
+        self.get("/auctions/bids/history/", self.token)
+        admin_token = self.login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/dashboard/users/{self.user.pk}/", {"status": 2}, HTTP_AUTHORIZATION=f"Bearer {admin_token}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Другой процесс узнаёт о блокировке, когда истечёт его локальная копия
+        local_epochs.clear()
+        response = self.get("/auctions/bids/history/", self.token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data["code"], "token_revoked")
+
+    def test_password_change(self):
+        """После смены пароля старый токен отозван, новый приходит в ответе"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse("profile"), {"password": "newSecure123"}, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get(reverse("profile"), self.token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(reverse("profile"), response.data["access"]).status_code, status.HTTP_200_OK)
+
+    def test_name_change_keeps_token(self):
+        """Смена имени не затрагивает данные токена и не отзывает его"""
+        response = self.client.put(
+            reverse("profile"), {"first_name": "Пётр"}, HTTP_AUTHORIZATION=f"Bearer {self.token}"
+        )
+        self.assertEqual(response.data["first_name"], "Пётр")
+        self.assertEqual(self.get(reverse("profile"), self.token).status_code, status.HTTP_200_OK)
+
+    def test_publish_failure(self):
+        """Не удалось записать новое поколение — старое из Redis удаляется"""
+        self.get("/auctions/bids/history/", self.token)
+        self.assertTrue(get_redis().exists(EPOCH_KEY.format(self.user.pk)))
+        with mock.patch.object(get_redis(), "set", side_effect=redis.ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.status = 2
+                self.user.save()
+        self.assertFalse(get_redis().exists(EPOCH_KEY.format(self.user.pk)))
+        local_epochs.clear()
+        response = self.get("/auctions/bids/history/", self.token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_redis_unavailable(self):
+        """Без Redis пользователь проверяется по базе"""
+        with mock.patch("users.authentication.current_epoch", side_effect=redis.ConnectionError):
+            with self.assertNumQueries(2):
+                response = self.get("/auctions/bids/history/", self.token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class RefreshBlacklistTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="reader@mail.ru", first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+        client = get_redis()
+        client.delete(
+            LOADED_KEY, LOADING_KEY, EPOCH_KEY.format(self.user.pk), *client.keys(BLACKLIST_KEY.format("*"))
+        )
+        local_epochs.clear()
+        self.refresh = UserRefreshToken.for_user(self.user)
+
+    def post_refresh(self, token):
+        self.client.cookies["refresh"] = str(token)
+        return self.client.post(reverse("token_refresh"))
+
+    def test_rotation(self):
+        """Обновление выдаёт новый refresh, старый больше не принимается"""
+        response = self.post_refresh(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        new_refresh = response.cookies["refresh"].value
+        self.assertNotEqual(new_refresh, str(self.refresh))
+        self.assertTrue(get_redis().exists(BLACKLIST_KEY.format(self.refresh["jti"])))
+
+        self.assertEqual(self.post_refresh(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.post_refresh(new_refresh).status_code, status.HTTP_200_OK)
+
+    def test_check_without_tables(self):
+        """Проверка отзыва не обращается к таблицам token_blacklist"""
+        self.refresh.blacklist()
+        UserRefreshToken.for_user(self.user).check_blacklist()  # первая проверка загружает список
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                UserRefreshToken(str(self.refresh))
+
+    def test_reload_after_redis_loss(self):
+        """Потерянный список восстанавливается из базы"""
+        self.refresh.blacklist()
+        get_redis().delete(LOADED_KEY, BLACKLIST_KEY.format(self.refresh["jti"]))
+        with self.assertRaises(TokenError):
+            UserRefreshToken(str(self.refresh))
+        self.assertTrue(get_redis().exists(LOADED_KEY))
+
+    def test_load_in_progress(self):
+        """Пока список загружает другой процесс, отзыв проверяется по базе без повторной загрузки"""
+        self.refresh.blacklist()
+        get_redis().delete(LOADED_KEY, BLACKLIST_KEY.format(self.refresh["jti"]))
+        get_redis().set(LOADING_KEY, 1)
+        with self.assertRaises(TokenError):
+            UserRefreshToken(str(self.refresh))
+        self.assertFalse(get_redis().exists(LOADED_KEY))
+
+    def test_redis_unavailable(self):
+        """Без Redis отзыв проверяется по базе"""
+        self.refresh.blacklist()
+        with mock.patch("users.blacklist.get_redis", side_effect=redis.ConnectionError):
+            with self.assertRaises(TokenError):
+                UserRefreshToken(str(self.refresh))
+
+    def test_prune(self):
+        """Истёкшие токены удаляются из базы вместе с отметками об отзыве"""
+        self.refresh.blacklist()
+        expired = OutstandingToken.objects.get(jti=self.refresh["jti"])
+        expired.expires_at = timezone.now() - timedelta(minutes=1)
+        expired.save()
+        alive = UserRefreshToken.for_user(self.user)
+
+        self.assertEqual(prune_token_tables(batch_size=1), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(list(OutstandingToken.objects.values_list("jti", flat=True)), [alive["jti"]])
+
+
+class PasswordHashingTests(APITestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="hasher@mail.ru", first_name="Иван", last_name="Иванов", password="securePass123"
+        )
+
+    def login(self, password="securePass123"):
+        return self.client.post(reverse("login"), {"email": self.user.email, "password": password})
+
+    def test_pool(self):
+        """Пароль проверяется в пуле процессов"""
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login("wrongPass123").status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_saturated(self):
+        """Пул и очередь заняты — 429 с Retry-After, хэш не считается"""
+        pool = mock.Mock()
+        with mock.patch("users.hashing._get_pool", return_value=(pool, threading.Semaphore(0))):
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "1")
+        pool.submit.assert_not_called()
+
+    def test_broken_pool(self):
+        """Упавший процесс пула — HashingBusy, следующий вход создаёт пул заново"""
+        with self.assertRaises(hashing.HashingBusy):
+            hashing.run(os._exit, 1)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASH_WORKERS=0)
+    def test_inline(self):
+        """Без пула хэш считается в процессе запроса, как раньше"""
+        with mock.patch("users.hashing.submit") as submit:
+            self.user.set_password("otherPass123")
+            self.user.save()
+            self.assertEqual(self.login("otherPass123").status_code, status.HTTP_200_OK)
+        submit.assert_not_called()
+
+    def test_rehash_outdated(self):
+        """Хэш со старыми параметрами пересчитывается при входе"""
+        hasher = PBKDF2PasswordHasher()
+        self.user.password = hasher.encode("securePass123", hasher.salt(), iterations=1000)
+        self.user.save()
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(hasher.decode(self.user.password)["iterations"], hasher.iterations)
+        # Пересчёт хэша — не смена пароля: выданные токены не отзываются
+        self.assertEqual(self.user.token_epoch, 0)
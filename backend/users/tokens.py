@@ -0,0 +1,59 @@
+"""
+Токены с данными пользователя: ClaimsJWTAuthentication (authentication.py)
+проверяет права по ним, не читая пользователя из базы. Отзыв refresh-токенов
+проверяется по чёрному списку в Redis (blacklist.py).
+"""
+import logging
+
+import redis
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import blacklist
+
+logger = logging.getLogger(__name__)
+
+# Поля пользователя в токене; их изменение отзывает выданные токены (signals.py)
+CLAIM_FIELDS = ("email", "status", "is_active", "is_staff", "is_admin", "is_superuser")
+EPOCH_CLAIM = "ep"
+
+
+def add_claims(token, user):
+    for field in CLAIM_FIELDS:
+        token[field] = getattr(user, field)
+    token[EPOCH_CLAIM] = user.token_epoch
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    RefreshToken, в который (и в его access-токены) вписаны CLAIM_FIELDS и поколение.
+    Чёрный список — в Redis; таблицы token_blacklist только пополняются.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        add_claims(token, user)
+        return token
+
+    def check_blacklist(self):
+        try:
+            listed = blacklist.is_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        except redis.RedisError:
+            logger.warning("Чёрный список токенов недоступен, проверяем по базе", exc_info=True)
+            return super().check_blacklist()
+        if listed is None:
+            # Список загружается из базы — пока проверяем по ней
+            return super().check_blacklist()
+        if listed:
+            raise TokenError("Token is blacklisted")
+
+    def blacklist(self):
+        result = super().blacklist()
+        try:
+            blacklist.add(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        except redis.RedisError:
+            # Строка в базе есть; в Redis токен попадёт при следующей загрузке списка
+            logger.warning("Не удалось добавить токен в чёрный список Redis", exc_info=True)
+        return result
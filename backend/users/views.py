@@ -1,12 +1,27 @@
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.utils.timezone import now
 from rest_framework.views import APIView
 from datetime import timedelta
 
+from .authentication import check_user
 from .models import CustomUser
 from .serializers import RegisterSerializer, LoginSerializer, CustomUserSerializer
+from .tokens import EPOCH_CLAIM, UserRefreshToken, add_claims
+
+
+def set_refresh_cookie(response, refresh):
+    # refresh токен в HttpOnly cookie
+    response.set_cookie(
+        key="refresh",
+        value=str(refresh),
+        httponly=True,
+        secure=True,
+        samesite="Strict",
+        expires=now() + timedelta(days=7),
+    )
 
 
 class RegisterView(generics.CreateAPIView):
@@ -33,18 +48,9 @@ class LoginView(generics.GenericAPIView):
         if not user.is_active:
             return Response({"detail": "Пользователь неактивен"}, status=status.HTTP_403_FORBIDDEN)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = UserRefreshToken.for_user(user)
         response = Response({"access": str(refresh.access_token)})
-
-        # refresh токен в HttpOnly cookie
-        response.set_cookie(
-            key="refresh",
-            value=str(refresh),
-            httponly=True,
-            secure=True,
-            samesite="Strict",
-            expires=now() + timedelta(days=7),
-        )
+        set_refresh_cookie(response, refresh)
         return response
 
 
@@ -56,10 +62,33 @@ class RefreshView(APIView):
         if not refresh_token:
             return Response({"detail": "Refresh token missing"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            refresh = RefreshToken(refresh_token)
-            return Response({"access": str(refresh.access_token)})
+            # Проверка чёрного списка — по Redis (users/blacklist.py)
+            refresh = UserRefreshToken(refresh_token)
         except Exception:
             return Response({"detail": "Invalid refresh token"}, status=status.HTTP_401_UNAUTHORIZED)
+        # Обновление редкое — здесь пользователь читается из базы: блокировка и отзыв
+        # проверяются сразу, а в access попадают актуальные данные
+        user = CustomUser.objects.filter(pk=refresh.get(jwt_settings.USER_ID_CLAIM)).first()
+        try:
+            if user is None:
+                raise AuthenticationFailed("User not found")
+            check_user(user)
+            if refresh.get(EPOCH_CLAIM, user.token_epoch) < user.token_epoch:
+                raise AuthenticationFailed("Токен отозван")
+        except AuthenticationFailed as e:
+            return Response({"detail": e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+        if not jwt_settings.ROTATE_REFRESH_TOKENS:
+            access = refresh.access_token
+            add_claims(access, user)
+            return Response({"access": str(access)})
+
+        # Ротация: старый refresh отзывается, клиент получает новый в cookie
+        if jwt_settings.BLACKLIST_AFTER_ROTATION:
+            refresh.blacklist()
+        refresh = UserRefreshToken.for_user(user)
+        response = Response({"access": str(refresh.access_token)})
+        set_refresh_cookie(response, refresh)
+        return response
 
 
 class ProfileView(generics.RetrieveUpdateAPIView):
@@ -67,7 +96,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user собран из токена (users/authentication.py) — профиль целиком из базы
+        return CustomUser.objects.get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         user = self.get_object()
@@ -76,8 +106,15 @@ class ProfileView(generics.RetrieveUpdateAPIView):
             user.first_name = data['first_name']
         if 'last_name' in data:
             user.last_name = data['last_name']
-        if 'password' in data and data['password']:
+        password_changed = 'password' in data and data['password']
+        if password_changed:
             user.set_password(data['password'])  # хэшируем пароль
         user.save()
         serializer = self.get_serializer(user)
-        return Response(serializer.data)
+        if not password_changed:
+            return Response(serializer.data)
+        # Смена пароля отозвала все токены (users/signals.py) — этому клиенту выдаём новые
+        refresh = UserRefreshToken.for_user(user)
+        response = Response({**serializer.data, "access": str(refresh.access_token)})
+        set_refresh_cookie(response, refresh)
+        return response
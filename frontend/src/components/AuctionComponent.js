@@ -1,5 +1,6 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "../utils/axios";
+import { subscribeAuctionEvents } from "../utils/events";
 import { Card, Button, InputNumber, Modal, Table, message, Tag, Descriptions, Statistic, Space, Empty, Spin, Typography } from "antd";
 import { ClockCircleOutlined, TrophyOutlined, DollarOutlined, FireOutlined } from "@ant-design/icons";
 import moment from "moment";
@@ -7,16 +8,46 @@ import moment from "moment";
 const { Title, Text } = Typography;
 const { Countdown } = Statistic;
 
+const minBidFor = (auction) =>
+  Math.max(auction.starting_price, Number(auction.current_bid) + Number(auction.bid_step));
+
+// Применяет событие из потока к аукциону
+const patchAuction = (auction, type, data) => {
+  switch (type) {
+    case "bid-placed":
+      return { ...auction, current_bid: data.amount };
+    case "auction-started":
+      return { ...auction, status: 2, status_display: "Активен", is_active_now: true, end_time: data.end_time };
+    case "auction-extended":
+      return { ...auction, end_time: data.end_time };
+    case "auction-closed":
+      return {
+        ...auction,
+        status: data.status,
+        status_display: data.status === 4 ? "Отменён" : "Завершён",
+        is_active_now: false,
+        current_bid: data.current_bid,
+      };
+    default:
+      return auction;
+  }
+};
+
 const AuctionComponent = () => {
   const [auctions, setAuctions] = useState([]);
   const [selectedAuction, setSelectedAuction] = useState(null);
   const [bids, setBids] = useState([]);
+  const [bidsTotal, setBidsTotal] = useState(0);
+  const [bidsLoaded, setBidsLoaded] = useState(0);
+  const [bidsNext, setBidsNext] = useState(null);
   const [bidAmount, setBidAmount] = useState(null);
   const [loading, setLoading] = useState(false);
   const [loadingBids, setLoadingBids] = useState(false);
   const [modalVisible, setModalVisible] = useState(false);
   const [submittingBid, setSubmittingBid] = useState(false);
   const [currentUser, setCurrentUser] = useState(null);
+  const selectedIdRef = useRef(null);
+  const selectedBidStepRef = useRef(0);
 
   // Получаем текущего пользователя
   useEffect(() => {
@@ -39,12 +70,15 @@ const AuctionComponent = () => {
     }
   };
 
-  // Получаем список ставок для конкретного аукциона
-  const fetchBids = async (auctionId) => {
+  // Ставки аукциона страницами по курсору: первая — с общим числом, следующие — по next
+  const fetchBids = async (auctionId, next = null) => {
     setLoadingBids(true);
     try {
-      const res = await axios.get(`auctions/${auctionId}/bids/`);
-      setBids(res.data);
+      const res = await axios.get(next || `auctions/${auctionId}/bids/?total=estimate`);
+      setBids((prev) => (next ? [...prev, ...res.data.results] : res.data.results));
+      setBidsLoaded((prev) => (next ? prev : 0) + res.data.results.length);
+      setBidsNext(res.data.next);
+      if (!next) setBidsTotal(res.data.count);
     } catch (err) {
       message.error("Ошибка при загрузке ставок");
       console.error(err);
@@ -53,15 +87,43 @@ const AuctionComponent = () => {
     }
   };
 
+  // Ставка в таблицу открытого аукциона (из ответа на POST или из потока — без дублей).
+  // Суммы ставок аукциона растут строго, поэтому сумма однозначно определяет ставку,
+  // даже если id ещё нет (ставка принята в Redis и не записана в базу)
+  const addBid = (bid) => {
+    setBids((prev) => (prev.some((b) => Number(b.amount) === Number(bid.amount)) ? prev : [bid, ...prev]));
+  };
+
+  // Число с сервера плюс ставки, пришедшие после загрузки
+  const totalBids = bidsTotal + bids.length - bidsLoaded;
+
+  const applyEvent = (type, data) => {
+    if (type === "open") {
+      // Переподключились — перечитываем то, что могли пропустить
+      fetchAuctions();
+      if (selectedIdRef.current) fetchBids(selectedIdRef.current);
+      return;
+    }
+    setAuctions((prev) => prev.map((a) => (a.id === data.auction ? patchAuction(a, type, data) : a)));
+    if (data.auction !== selectedIdRef.current) return;
+    setSelectedAuction((prev) => prev && patchAuction(prev, type, data));
+    if (type === "bid-placed") {
+      addBid({ id: data.bid, user_email: data.user_email, amount: data.amount, created_at: data.created_at });
+      setBidAmount((prev) => Math.max(prev || 0, Number(data.amount) + Number(selectedBidStepRef.current)));
+    }
+  };
+
   useEffect(() => {
     fetchAuctions();
-    // Обновляем данные каждые 30 секунд
-    const interval = setInterval(fetchAuctions, 30000);
-    return () => clearInterval(interval);
+    // Цены и статусы приходят событиями вместо опроса раз в 30 секунд
+    return subscribeAuctionEvents([], applyEvent);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
   // Открыть модальное окно с деталями аукциона
   const openAuctionDetails = async (auction) => {
+    selectedIdRef.current = auction.id;
+    selectedBidStepRef.current = auction.bid_step;
     setSelectedAuction(auction);
     setModalVisible(true);
     setBidAmount(null);
@@ -69,17 +131,15 @@ const AuctionComponent = () => {
     await fetchBids(auction.id);
     
     // Устанавливаем минимальную ставку
-    const minBid = Math.max(
-      auction.starting_price,
-      Number(auction.current_bid) + Number(auction.bid_step)
-    );
-    setBidAmount(minBid);
+    setBidAmount(minBidFor(auction));
   };
 
   const closeModal = () => {
+    selectedIdRef.current = null;
     setModalVisible(false);
     setSelectedAuction(null);
     setBids([]);
+    setBidsNext(null);
     setBidAmount(null);
   };
 
@@ -92,30 +152,15 @@ const AuctionComponent = () => {
 
     setSubmittingBid(true);
     try {
-      await axios.post("auctions/bids/", {
+      const res = await axios.post("auctions/bids/", {
         auction: selectedAuction.id,
         amount: bidAmount,
       });
       
       message.success("Ставка успешно сделана!");
       
-      // Обновляем данные
-      const [auctionRes, bidsRes, auctionsRes] = await Promise.all([
-        axios.get(`auctions/${selectedAuction.id}/`),
-        axios.get(`auctions/${selectedAuction.id}/bids/`),
-        axios.get("auctions/history/")
-      ]);
-      
-      setSelectedAuction(auctionRes.data);
-      setBids(bidsRes.data);
-      setAuctions(auctionsRes.data);
-      
-      // Обновляем минимальную ставку
-      const minBid = Math.max(
-        auctionRes.data.starting_price,
-        Number(auctionRes.data.current_bid) + Number(auctionRes.data.bid_step)
-      );
-      setBidAmount(minBid);
+      // Остальные увидят ставку из потока событий; себе применяем ответ сразу
+      applyEvent("bid-placed", { ...res.data, bid: res.data.id });
     } catch (err) {
       console.error(err);
       const errorMsg = err.response?.data?.non_field_errors?.[0] || 
@@ -350,7 +395,7 @@ const AuctionComponent = () => {
               </Descriptions.Item>
               
               <Descriptions.Item label="Всего ставок">
-                {bids.length}
+                {totalBids}
               </Descriptions.Item>
               
               <Descriptions.Item label="Начало аукциона">
@@ -408,7 +453,7 @@ const AuctionComponent = () => {
                       style={{ width: '100%', marginTop: 8 }}
                       value={bidAmount}
                       onChange={setBidAmount}
-                      min={Math.max(selectedAuction.starting_price, Number(selectedAuction.current_bid) + Number(selectedAuction.bid_step))}
+                      min={minBidFor(selectedAuction)}
                       step={selectedAuction.bid_step}
                       formatter={value => `${value} ₽`}
                       parser={value => value.replace(' ₽', '')}
@@ -437,8 +482,8 @@ const AuctionComponent = () => {
             )}
 
             {/* История ставок */}
-            <Title level={5}>История ставок ({bids.length})</Title>
-            {loadingBids ? (
+            <Title level={5}>История ставок ({totalBids})</Title>
+            {loadingBids && !bids.length ? (
               <div style={{ textAlign: 'center', padding: 40 }}>
                 <Spin size="large" />
               </div>
@@ -446,12 +491,17 @@ const AuctionComponent = () => {
               <Table
                 columns={bidColumns}
                 dataSource={bids}
-                rowKey="id"
+                rowKey={(bid) => bid.id ?? `pending-${bid.amount}`}
                 size="small"
                 pagination={false}
                 locale={{
                   emptyText: <Empty description="Пока нет ставок" />
                 }}
+                footer={bidsNext ? () => (
+                  <Button block loading={loadingBids} onClick={() => fetchBids(selectedAuction.id, bidsNext)}>
+                    Показать ещё
+                  </Button>
+                ) : undefined}
               />
             )}
           </div>
@@ -389,6 +389,7 @@ const fetchBooks = async () => {
           <Select.Option value="-price">По цене (высокая первая)</Select.Option>
           <Select.Option value="year">По году (старые первые)</Select.Option>
           <Select.Option value="-year">По году (новые первые)</Select.Option>
+          <Select.Option value="-relevance">По релевантности</Select.Option>
         </Select>
       </div>
 
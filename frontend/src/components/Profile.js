@@ -16,7 +16,9 @@ const Profile = () => {
   const [loadingOrders, setLoadingOrders] = useState(true);
 
   const [bids, setBids] = useState([]);
+  const [bidsNext, setBidsNext] = useState(null);
   const [loadingBids, setLoadingBids] = useState(true);
+  const [snapshots, setSnapshots] = useState({});
 
   const [selectedRecord, setSelectedRecord] = useState(null);
   const [isRecordModalOpen, setIsRecordModalOpen] = useState(false);
@@ -101,6 +103,8 @@ const Profile = () => {
       if (values.password) payload.password = values.password;
 
       const res = await axios.put("users/profile/", payload);
+      // После смены пароля прежние токены отозваны — сервер выдаёт новый
+      if (res.data.access) localStorage.setItem("accessToken", res.data.access);
       setUser(res.data);
       setIsEditModalOpen(false);
       message.success("Профиль успешно обновлён");
@@ -126,12 +130,45 @@ const Profile = () => {
       .finally(() => setLoadingOrders(false));
   }, []);
 
+  // Сводки аукционов одним запросом: состояние, лидер и лучшие ставки
+  const loadSnapshots = (ids) => {
+    const params = { top: 50 };
+    if (ids) params.ids = ids.join(",");
+    return axios.get("auctions/snapshot/", { params }).then(res => {
+      const loaded = {};
+      res.data.forEach(item => { loaded[item.auction.id] = item; });
+      setSnapshots(prev => ({ ...prev, ...loaded }));
+      return loaded;
+    });
+  };
+
+  const applySnapshot = (snapshot) => {
+    setSelectedAuction(snapshot.auction);
+    setAuctionBids(snapshot.top_bids);
+    // Устанавливаем минимальную ставку
+    const minBid = Math.max(
+      snapshot.auction.starting_price,
+      Number(snapshot.auction.current_bid) + Number(snapshot.auction.bid_step)
+    );
+    setBidAmount(minBid);
+  };
+
+  // История ставок страницами по курсору: без next — первая страница заново
+  const loadBids = (next = null) => {
+    setLoadingBids(true);
+    return axios.get(next || "auctions/bids/history/?page_size=50")
+      .then(res => {
+        setBids(prev => (next ? [...prev, ...res.data.results] : res.data.results));
+        setBidsNext(res.data.next);
+      })
+      .finally(() => setLoadingBids(false));
+  };
+
   // Получение истории ставок
   useEffect(() => {
-    axios.get("auctions/bids/history/")
-      .then(res => setBids(res.data))
-      .catch(err => console.error(err))
-      .finally(() => setLoadingBids(false));
+    loadBids().catch(err => console.error(err));
+    loadSnapshots().catch(err => console.error(err));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
   // Открытие модалки заказа
@@ -154,20 +191,10 @@ const Profile = () => {
     setLoadingAuctionBids(true);
 
     try {
-      const [auctionRes, bidsRes] = await Promise.all([
-        axios.get(`auctions/${bid.auction}/`),
-        axios.get(`auctions/${bid.auction}/bids/`)
-      ]);
-      
-      setSelectedAuction(auctionRes.data);
-      setAuctionBids(bidsRes.data);
-      
-      // Устанавливаем минимальную ставку
-      const minBid = Math.max(
-        auctionRes.data.starting_price,
-        Number(auctionRes.data.current_bid) + Number(auctionRes.data.bid_step)
-      );
-      setBidAmount(minBid);
+      // Показываем загруженную сводку сразу и обновляем её одним запросом
+      if (snapshots[bid.auction]) applySnapshot(snapshots[bid.auction]);
+      const loaded = await loadSnapshots([bid.auction]);
+      applySnapshot(loaded[bid.auction]);
     } catch (err) {
       console.error(err);
       message.error("Ошибка загрузки данных аукциона");
@@ -195,22 +222,12 @@ const Profile = () => {
       message.success("Ставка успешно сделана!");
       
       // Обновляем данные
-      const [auctionRes, bidsRes, userBidsRes] = await Promise.all([
-        axios.get(`auctions/${selectedAuction.id}/`),
-        axios.get(`auctions/${selectedAuction.id}/bids/`),
-        axios.get("auctions/bids/history/")
+      const [loaded] = await Promise.all([
+        loadSnapshots([selectedAuction.id]),
+        loadBids()
       ]);
-      
-      setSelectedAuction(auctionRes.data);
-      setAuctionBids(bidsRes.data);
-      setBids(userBidsRes.data);
-      
-      // Обновляем минимальную ставку
-      const minBid = Math.max(
-        auctionRes.data.starting_price,
-        Number(auctionRes.data.current_bid) + Number(auctionRes.data.bid_step)
-      );
-      setBidAmount(minBid);
+
+      applySnapshot(loaded[selectedAuction.id]);
     } catch (err) {
       console.error(err);
       const errorMsg = err.response?.data?.non_field_errors?.[0] || "Ошибка при размещении ставки";
@@ -341,8 +358,13 @@ const Profile = () => {
     return <Table rowKey="id"           pagination={{
             defaultPageSize: 5,
             showSizeChanger: true,
-            showTotal: (total) => `Всего ставок: ${total}`,
-          }} tableLayout="auto" dataSource={bids} columns={columns} loading={loadingBids} />;
+            showTotal: (total) => `Загружено ставок: ${total}`,
+          }} tableLayout="auto" dataSource={bids} columns={columns} loading={loadingBids}
+          footer={bidsNext ? () => (
+            <Button block onClick={() => loadBids(bidsNext).catch(err => console.error(err))}>
+              Загрузить ещё
+            </Button>
+          ) : undefined} />;
   };
 
   // Таблица всех ставок в модалке аукциона
@@ -9,6 +9,9 @@ const { Option } = Select;
 
 const SalesReport = () => {
   const [orders, setOrders] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [exporting, setExporting] = useState(false);
   const [analytics, setAnalytics] = useState(null);
   const [authors, setAuthors] = useState([]);
   const [genres, setGenres] = useState([]);
@@ -52,8 +55,7 @@ const SalesReport = () => {
     }
   };
 
-const fetchOrders = async () => {
-  try {
+const buildParams = () => {
     const params = {};
 
     if (filters.authors && filters.authors.length) params['authors'] = filters.authors.join(',');
@@ -66,16 +68,64 @@ const fetchOrders = async () => {
       params['date_after'] = filters.dateRange[0].format("YYYY-MM-DD");
       params['date_before'] = filters.dateRange[1].format("YYYY-MM-DD");
     }
+    return params;
+};
 
-    const res = await axios.get("orders/report/items/", { params });
-    // Ожидаем { analytics, items }
-    setAnalytics(res.data.analytics || null);
-    setOrders(res.data.items || []);
+const fetchOrders = async () => {
+  try {
+    const params = buildParams();
+    // Аналитика и первая страница позиций — отдельными запросами
+    const [analyticsRes, itemsRes] = await Promise.all([
+      axios.get("orders/report/analytics/", { params }),
+      axios.get("orders/report/items/feed/", { params }),
+    ]);
+    setAnalytics(analyticsRes.data.analytics || null);
+    setOrders(itemsRes.data.results || []);
+    setNextPage(itemsRes.data.next);
   } catch (err) {
     message.error("Ошибка при загрузке данных отчёта");
   }
 };
 
+const loadMore = async () => {
+  if (!nextPage) return;
+  setLoadingMore(true);
+  try {
+    const res = await axios.get(nextPage);
+    setOrders(prev => [...prev, ...res.data.results]);
+    setNextPage(res.data.next);
+  } catch (err) {
+    message.error("Ошибка при загрузке позиций");
+  } finally {
+    setLoadingMore(false);
+  }
+};
+
+// Все позиции за период: отчёт строится в фоне, клиент опрашивает статус
+const handleExportItems = async () => {
+  setExporting(true);
+  try {
+    let { data: job } = await axios.post("orders/report/jobs/", { ...buildParams(), format: "csv" });
+    while (job.status === "P" || job.status === "R") {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      job = (await axios.get(`orders/report/jobs/${job.id}/`)).data;
+    }
+    if (job.status !== "D") {
+      message.error(job.error || "Ошибка при построении отчёта");
+      return;
+    }
+    const res = await axios.get(job.download_url, { responseType: "blob" });
+    const link = document.createElement("a");
+    link.href = URL.createObjectURL(res.data);
+    link.download = `sales_items_${dayjs().format("YYYYMMDD")}.csv`;
+    link.click();
+  } catch (err) {
+    message.error("Ошибка при выгрузке позиций");
+  } finally {
+    setExporting(false);
+  }
+};
+
   useEffect(() => {
     fetchFilters();
   }, []);
@@ -301,6 +351,7 @@ const handleExportCSV = () => {
 
               <Button type="primary" onClick={fetchOrders} block>Применить</Button>
               <Button icon={<DownloadOutlined />} onClick={handleExportCSV} block>Экспорт CSV</Button>
+              <Button icon={<DownloadOutlined />} onClick={handleExportItems} loading={exporting} block>Все позиции (CSV)</Button>
             </Space>
           </Card>
         </Col>
@@ -308,6 +359,9 @@ const handleExportCSV = () => {
 
         <Col xs={24} sm={24} md={18}>
           <Table rowKey="id" columns={columns} dataSource={orders} />
+          {nextPage && (
+            <Button onClick={loadMore} loading={loadingMore} block>Загрузить ещё</Button>
+          )}
         </Col>
 
 
@@ -45,6 +45,20 @@ axiosInstance.interceptors.response.use(
       }
     }
 
+    // 429/503: чтение повторяем один раз после Retry-After; ставки и прочие изменения — нет
+    const retryAfter = Number(error.response?.headers?.["retry-after"]);
+    if (
+      [429, 503].includes(error.response?.status) &&
+      originalRequest.method === "get" &&
+      !originalRequest._throttleRetry &&
+      retryAfter > 0 &&
+      retryAfter <= 10
+    ) {
+      originalRequest._throttleRetry = true;
+      await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000));
+      return axiosInstance(originalRequest);
+    }
+
     return Promise.reject(error);
   }
 );
@@ -0,0 +1,22 @@
+// Поток событий аукционов (SSE) с ASGI-сервера
+const EVENTS_URL = "http://localhost:8001/auctions/events/";
+
+const EVENT_TYPES = ["bid-placed", "auction-started", "auction-extended", "auction-closed"];
+
+// ids — список аукционов или пусто для всех. onEvent(type, data);
+// после (пере)подключения вызывается onEvent("open") — пропущенное за время
+// обрыва нужно перечитать обычным запросом. Возвращает функцию отписки.
+export const subscribeAuctionEvents = (ids, onEvent) => {
+  const query = ids && ids.length ? `?ids=${ids.join(",")}` : "";
+  const source = new EventSource(`${EVENTS_URL}${query}`);
+  let opened = false;
+
+  source.onopen = () => {
+    if (opened) onEvent("open");
+    opened = true;
+  };
+  EVENT_TYPES.forEach((type) =>
+    source.addEventListener(type, (e) => onEvent(type, JSON.parse(e.data)))
+  );
+  return () => source.close();
+};